@@ -1,19 +1,16 @@
-# Parche de compatibilidad para Experta con Python 3.10+
-# Experta usa collections.Mapping que fue movido a collections.abc
-import collections
-import collections.abc
-if not hasattr(collections, "Mapping"):
-    collections.Mapping = collections.abc.Mapping
-if not hasattr(collections, "MutableMapping"):
-    collections.MutableMapping = collections.abc.MutableMapping
-if not hasattr(collections, "Sequence"):
-    collections.Sequence = collections.abc.Sequence
+import time
+
+# Inicio del arranque: se informa junto con el estado del modo de diagnóstico
+_BOOT_STARTED = time.perf_counter()
 
 # Importaciones de Flask para crear la API REST
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, request, render_template, stream_with_context
+import functools
 import logging
-# Servicio que ejecuta el sistema experto
+# Rutas de la API (compartidas con asgi.py) y servicio que ejecuta el sistema experto
 from services.diagnosis_service import DiagnosisService
+from services.history_service import HistoryService
+from services.http_api import ROUTES, ApiRequest
 
 # Inicialización de la aplicación Flask
 app = Flask(__name__)
@@ -21,10 +18,6 @@ app = Flask(__name__)
 logging.basicConfig(level=logging.INFO)
 app.logger.setLevel(logging.INFO)
 
-# Valores válidos para validación de entrada
-VALID_BROWSERS = {"Chrome", "Firefox", "Edge", "Safari", "IE", "Other"}
-VALID_CONNECTIONS = {"wifi", "ethernet", "cellular", "slow_wifi"}
-
 # ========== ENDPOINTS ==========
 
 @app.route("/")
@@ -32,86 +25,40 @@ def index():
     """Ruta principal que sirve la interfaz web del sistema experto."""
     return render_template("index.html")
 
-@app.post("/api/diagnose")
-def diagnose():
-    """
-    Endpoint principal para ejecutar el diagnóstico del sistema experto.
-    
-    Recibe:
-        JSON con estructura:
-        {
-            "symptoms": [{"type": "login", "description": "cannot_login", ...}],
-            "system_info": {"browser": "Chrome", "connection_type": "wifi", ...},
-            "server_status": {"is_online": true, ...}
-        }
-    
-    Retorna:
-        JSON con el diagnóstico:
-        {
-            "diagnosis": "login",
-            "cause": "browser",
-            "solution": "...",
-            "confidence": 0.95
-        }
-    """
-    try:
-        # 1. Obtener datos JSON de la petición
-        data = request.get_json(silent=True)
-        
-        # 2. Validar que existan los campos obligatorios
-        if not data or "symptoms" not in data:
-            return jsonify({"error": "Debe enviar 'symptoms' y 'system_info'"}), 400
-
-        # 3. Extraer síntomas e información del sistema
-        symptoms = data.get("symptoms")
-        sysinfo = data.get("system_info", {})
-        
-        # 4. Validar que symptoms sea una lista no vacía
-        if not isinstance(symptoms, list) or not symptoms:
-            return jsonify({"error": "'symptoms' debe ser lista no vacía"}), 400
-
-        # 5. Validar navegador y tipo de conexión
-        browser = sysinfo.get("browser")
-        conn = sysinfo.get("connection_type")
-        if browser not in VALID_BROWSERS:
-            return jsonify({"error": f"Navegador inválido: {browser}", "allowed": sorted(VALID_BROWSERS)}), 400
-        if conn not in VALID_CONNECTIONS:
-            return jsonify({"error": f"Conexión inválida: {conn}", "allowed": sorted(VALID_CONNECTIONS)}), 400
-
-        # 6. Ejecutar el sistema experto y guardar en historial
-        result = DiagnosisService.run(data, persist=True)
+def _flask_response(result):
+    """Traduce el ``ApiResponse`` de un handler a una respuesta de Flask."""
+    if result.stream is not None:
+        body = stream_with_context(result.stream)
+    elif isinstance(result.body, (str, bytes)):
+        body = result.body
+    else:
+        # Mismo formato que ``jsonify``
+        body = app.json.response(result.body).get_data()
+    return app.response_class(body, status=result.status, mimetype=result.mimetype, headers=result.headers)
 
-        # 7. Log del resultado para depuración
-        print(result)
-        
-        # 8. Retornar diagnóstico en formato JSON
-        return jsonify(result), 200
+def _view(handler):
+    """Vista de Flask para un handler de ``services.http_api``."""
+    @functools.wraps(handler)
+    def view(**params):
+        api_request = ApiRequest(request.method, request.args, request.headers, request.stream, params)
+        return _flask_response(handler(api_request))
+    return view
 
-    except Exception as e:
-        # Manejo de errores: log y respuesta HTTP 500
-        app.logger.exception("Error en /api/diagnose")
-        return jsonify({"error": str(e)}), 500
+# Rutas de la API: ver la documentación de cada handler en services/http_api.py
+_views = {}
+for _rule, _methods, _handler, _ in ROUTES:
+    if _handler not in _views:
+        _views[_handler] = _view(_handler)
+    app.add_url_rule(_rule, view_func=_views[_handler], methods=list(_methods))
 
-@app.get("/api/diagnosis")
-def get_history():
-    """
-    Endpoint para obtener el historial de diagnósticos previos.
-    
-    Retorna:
-        JSON con lista de diagnósticos anteriores:
-        [
-            {"diagnosis": "login", "cause": "browser", "timestamp": "...", ...},
-            {"diagnosis": "video", "cause": "network", "timestamp": "...", ...}
-        ]
-    """
-    try:
-        # Obtener historial desde el servicio
-        diagnosis_history = DiagnosisService.history()
-        return jsonify(diagnosis_history), 200
-    except Exception as e:
-        # Manejo de errores
-        app.logger.exception("Error al obtener historial")
-        return jsonify({"error": str(e)}), 500
+# Carga la tabla de decisión (modo "table") antes de la primera petición
+_startup = DiagnosisService.warm_up()
+app.logger.info(
+    "Arranque en %.1f ms (%s)", (time.perf_counter() - _BOOT_STARTED) * 1000,
+    DiagnosisService.describe_startup(_startup),
+)
+# Escritura diferida del historial (HISTORY_WRITE_BEHIND): lo pendiente se escribe al recibir SIGTERM
+HistoryService.start_writer()
 
 # Punto de entrada de la aplicación
 if __name__ == '__main__':
@@ -0,0 +1,231 @@
+"""
+Punto de entrada ASGI del sistema experto.
+
+Sirve la interfaz web y las mismas rutas de la API que ``app.py``: ambos
+registran los handlers de ``services.http_api.ROUTES``, así que validan y
+responden igual. Este módulo sólo traduce peticiones y respuestas ASGI. La
+inferencia y la E/S del historial se ejecutan en pools de hilos para no
+bloquear el event loop, de modo que miles de clientes lentos no ocupan un
+hilo cada uno: el cuerpo de la petición se recibe antes de llamar al
+handler (salvo NDJSON, que se lee de a partes) y las respuestas en
+streaming se producen de a una parte por vez.
+
+Ejecución (con cualquier servidor ASGI, por ejemplo uvicorn):
+    uvicorn asgi:app --workers 2
+"""
+import asyncio
+import functools
+import json
+import logging
+import mimetypes
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+_BOOT_STARTED = time.perf_counter()
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+from werkzeug.datastructures import Headers, MultiDict
+from werkzeug.utils import get_content_type
+
+from services.diagnosis_service import DiagnosisService
+from services.history_service import HistoryService
+from services.http_api import NDJSON_MIMETYPES, ROUTES, ApiRequest, ApiResponse
+
+logger = logging.getLogger(__name__)
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+_STATIC_DIR = os.path.join(_BASE_DIR, "static")
+
+# Hilos para la inferencia (uno por motor del pool) y para la E/S del historial
+_INFERENCE_THREADS = int(os.environ.get("ASGI_INFERENCE_THREADS", os.environ.get("ENGINE_POOL_SIZE", "4")))
+_IO_THREADS = int(os.environ.get("ASGI_IO_THREADS", "4"))
+# Tamaño máximo del cuerpo de una petición (salvo NDJSON, que se lee de a partes)
+_MAX_BODY_SIZE = 1024 * 1024
+
+_inference = ThreadPoolExecutor(_INFERENCE_THREADS, thread_name_prefix="inference")
+_io = ThreadPoolExecutor(_IO_THREADS, thread_name_prefix="history-io")
+_pools = {"inference": _inference, "io": _io}
+_templates = Environment(
+    loader=FileSystemLoader(os.path.join(_BASE_DIR, "templates")),
+    autoescape=select_autoescape(["html"]),
+)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, body):
+        super().__init__(body)
+        self.status = status
+        self.body = body
+
+
+async def _in_thread(executor, func, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+async def _read_body(receive):
+    chunks, size = [], 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            raise HTTPError(400, {"error": "El cliente cerró la conexión"})
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > _MAX_BODY_SIZE:
+            raise HTTPError(413, {"error": "Cuerpo de la petición demasiado grande"})
+        chunks.append(chunk)
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+def _body_stream(receive, loop):
+    """Cuerpo recibido de a partes desde un hilo del pool (el handler lo lee a medida que llega)."""
+    while True:
+        message = asyncio.run_coroutine_threadsafe(receive(), loop).result()
+        if message["type"] == "http.disconnect":
+            return
+        chunk = message.get("body", b"")
+        if chunk:
+            yield chunk
+        if not message.get("more_body", False):
+            return
+
+
+async def _request(scope, receive, params):
+    headers = Headers([(k.decode("latin-1"), v.decode("latin-1")) for k, v in scope["headers"]])
+    args = MultiDict(parse_qsl(scope.get("query_string", b"").decode("latin-1"), keep_blank_values=True))
+    if headers.get("Content-Type", "").split(";")[0].strip().lower() in NDJSON_MIMETYPES:
+        body = _body_stream(receive, asyncio.get_running_loop())
+    else:
+        body = [await _read_body(receive)]
+    return ApiRequest(scope["method"], args, headers, body, params)
+
+
+def _encode(result):
+    """Cuerpo y headers ASGI de un ``ApiResponse`` (mismo formato que ``jsonify``)."""
+    body = result.body
+    if result.stream is None and not isinstance(body, (str, bytes)):
+        body = json.dumps(body, sort_keys=True, separators=(",", ":")) + "\n"
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    headers = list(result.headers)
+    if result.mimetype:
+        headers.insert(0, ("Content-Type", get_content_type(result.mimetype, "utf-8")))
+    return body, [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers]
+
+
+async def _send(send, result, executor):
+    body, headers = _encode(result)
+    if result.stream is None:
+        headers.append((b"content-length", str(len(body)).encode("ascii")))
+        await send({"type": "http.response.start", "status": result.status, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+        return
+
+    # Cada parte se produce en el pool de la ruta: puede diagnosticar o leer el cuerpo
+    chunks = iter(result.stream)
+    await send({"type": "http.response.start", "status": result.status, "headers": headers})
+    try:
+        while True:
+            chunk = await _in_thread(executor, next, chunks, None)
+            if chunk is None:
+                break
+            await send({"type": "http.response.body", "body": chunk.encode("utf-8"), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        close = getattr(chunks, "close", None)
+        if close is not None:
+            await _in_thread(executor, close)
+
+
+def _text(text, status, headers=()):
+    return ApiResponse(text, status=status, mimetype="text/plain", headers=headers)
+
+
+# ========== INTERFAZ WEB ==========
+
+def index(request):
+    """Ruta principal que sirve la interfaz web del sistema experto."""
+    return ApiResponse(_templates.get_template("index.html").render(), mimetype="text/html")
+
+
+def static_file(request):
+    path = os.path.normpath(os.path.join(_STATIC_DIR, request.params["path"]))
+    if os.path.commonpath([path, _STATIC_DIR]) != _STATIC_DIR or not os.path.isfile(path):
+        return _text("Not Found", 404)
+    with open(path, "rb") as f:
+        content = f.read()
+    mimetype = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    return ApiResponse(content, mimetype=mimetype, headers=[("Cache-Control", "no-cache")])
+
+
+# ========== RUTAS ==========
+
+def _compile(rule):
+    """Regla con la sintaxis de Flask (``/api/sessions/<session_id>``) a expresión regular."""
+    pattern = re.sub(r"<(\w+)>", r"(?P<\1>[^/]+)", rule)
+    return re.compile(pattern + r"\Z")
+
+
+_ROUTES = [(re.compile(r"/\Z"), {"GET": index}, "io"),
+           (re.compile(r"/static/(?P<path>.+)\Z"), {"GET": static_file}, "io")]
+for _rule, _methods, _handler, _pool in ROUTES:
+    _ROUTES.append((_compile(_rule), dict.fromkeys(_methods, _handler), _pool))
+
+
+def _route(path, method):
+    """``(handler, parámetros, pool)``; sin ruta, un handler que responde 404 o 405."""
+    allowed = set()
+    for pattern, methods, pool in _ROUTES:
+        match = pattern.match(path)
+        if match is None:
+            continue
+        handler = methods.get(method)
+        if handler is not None:
+            return handler, match.groupdict(), _pools[pool]
+        allowed.update(methods)
+    if allowed:
+        allow = [("Allow", ", ".join(sorted(allowed)))]
+        return lambda request: _text("Method Not Allowed", 405, allow), {}, _io
+    return lambda request: _text("Not Found", 404), {}, _io
+
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Carga la tabla de decisión (modo "table") antes de aceptar peticiones
+            report = await _in_thread(_inference, DiagnosisService.warm_up)
+            logger.info(
+                "Arranque en %.1f ms (%s)", (time.perf_counter() - _BOOT_STARTED) * 1000,
+                DiagnosisService.describe_startup(report),
+            )
+            # En el hilo principal, para que SIGTERM escriba el historial pendiente
+            HistoryService.start_writer()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            _inference.shutdown(wait=False, cancel_futures=True)
+            _io.shutdown(wait=True)
+            await asyncio.get_running_loop().run_in_executor(None, HistoryService.flush)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    """Aplicación ASGI 3."""
+    if scope["type"] == "lifespan":
+        await _lifespan(receive, send)
+        return
+    if scope["type"] != "http":
+        raise RuntimeError(f"Tipo de conexión no soportado: {scope['type']}")
+
+    handler, params, executor = _route(scope["path"], scope["method"])
+    try:
+        request = await _request(scope, receive, params)
+        response = await _in_thread(executor, handler, request)
+    except HTTPError as e:
+        response = ApiResponse(e.body, status=e.status)
+    await _send(send, response, executor)
@@ -0,0 +1,159 @@
+"""
+Benchmarks del sistema experto.
+
+Uso:
+    python -m benchmarks run [--suites engine,history,http] [--output reporte.json]
+    python -m benchmarks compare base.json actual.json [--metric p50] [--threshold 0.10]
+    python -m benchmarks replay [--target service|app|URL] [--concurrency 8] [--rate 200]
+
+``compare`` sale con código 1 si algún benchmark empeoró más que el umbral;
+``replay`` vuelve a enviar los casos del historial y sale con código 1 si
+algún diagnóstico cambió respecto del registrado.
+"""
+import argparse
+import json
+import os
+import sys
+
+SUITES = ("engine", "history", "http")
+
+
+def _csv(value):
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
+def run(args):
+    # Sin caché de resultados por defecto: se mide la inferencia, no la caché
+    os.environ.setdefault("RESULT_CACHE_SIZE", "1024" if args.cache else "0")
+
+    from benchmarks import core, suites
+
+    results = []
+    for name in args.suites:
+        if name not in SUITES:
+            raise SystemExit(f"Suite desconocida: {name} (disponibles: {', '.join(SUITES)})")
+        print(f"== {name}", file=sys.stderr)
+        if name == "engine":
+            results += suites.engine_suite(args.repeat)
+        elif name == "history":
+            sizes = [int(s) for s in args.history_sizes]
+            results += suites.history_suite(args.repeat, sizes, args.backends, args.fsync)
+        elif name == "http":
+            results += suites.http_suite(args.repeat, args.concurrency, args.fsync)
+
+    core.print_table(results, out=sys.stderr)
+    payload = core.report(results, {k: v for k, v in vars(args).items() if k != "func"})
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2)
+        print(f"Reporte guardado en {args.output}", file=sys.stderr)
+    else:
+        json.dump(payload, sys.stdout, indent=2)
+        print()
+    return 0
+
+
+def compare(args):
+    from benchmarks import core
+
+    rows = core.compare(core.load(args.baseline), core.load(args.current), args.metric, args.threshold)
+    regressions = 0
+    for name, base, current, change, regression in rows:
+        flag = "REGRESIÓN" if regression else ""
+        regressions += regression
+        print(f"{name:<40} {base:>11.1f} {current:>11.1f} {change:>+8.1%} {flag}")
+    print(f"{len(rows)} benchmarks comparados ({args.metric}), {regressions} regresiones")
+    return 1 if regressions else 0
+
+
+def replay(args):
+    # Sin caché de resultados por defecto: cada caso repetido pasa por el motor
+    os.environ.setdefault("RESULT_CACHE_SIZE", "1024" if args.cache else "0")
+
+    from benchmarks import core
+    from benchmarks import replay as rp
+
+    if args.history:
+        from services.history_store import JsonLinesHistoryStore
+
+        records = JsonLinesHistoryStore(args.history).records()
+    else:
+        from services.history_service import HistoryService
+
+        records = HistoryService.records()
+    cases, skipped = rp.recorded_cases(records, args.limit)
+    if not cases:
+        print(f"El historial no tiene casos para repetir ({skipped} registros sin caso de entrada)",
+              file=sys.stderr)
+        return 2
+
+    if args.target == "service":
+        call, context = rp.service_target()
+    elif args.target == "app":
+        call, context = rp.app_target()
+    else:
+        call, context = rp.url_target(args.target)
+    requests = args.requests or len(cases)
+    print(f"== replay: {requests} peticiones de {len(cases)} casos contra {args.target} "
+          f"(concurrencia {args.concurrency}, {args.rate or 'sin límite de'} peticiones/s)", file=sys.stderr)
+    with context:
+        samples, changes, errors, wall = rp.replay(cases, call, requests, args.concurrency, args.rate)
+
+    result = rp.summary(f"replay[{args.target}]", samples, changes, errors, wall, skipped)
+    core.print_table([result], out=sys.stderr)
+    rp.print_histogram(rp.histogram(samples), out=sys.stderr)
+    print(f"{len(samples)} respuestas en {wall:.2f} s ({result['ops_per_sec'] or 0:.1f}/s), "
+          f"{len(errors)} errores, {result['changed_requests']} diagnósticos cambiados "
+          f"en {len(changes)} casos distintos", file=sys.stderr)
+    for change in result["changes"][:10]:
+        print(json.dumps(change, ensure_ascii=False), file=sys.stderr)
+
+    payload = core.report([result], {k: v for k, v in vars(args).items() if k != "func"})
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(payload, f, indent=2, ensure_ascii=False)
+        print(f"Reporte guardado en {args.output}", file=sys.stderr)
+    return 1 if changes else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="ejecutar benchmarks")
+    p.add_argument("--suites", type=_csv, default=list(SUITES))
+    p.add_argument("--repeat", type=int, default=500, help="mediciones por benchmark")
+    p.add_argument("--history-sizes", type=_csv, default=["1000", "100000", "1000000"])
+    p.add_argument("--backends", type=_csv, default=["jsonl", "sqlite"])
+    p.add_argument("--fsync", choices=("always", "never"), default="always")
+    p.add_argument("--concurrency", type=int, default=1, help="hilos para la suite http")
+    p.add_argument("--cache", action="store_true", help="medir con la caché de resultados activa")
+    p.add_argument("--output", help="archivo JSON del reporte (por defecto, stdout)")
+    p.set_defaults(func=run)
+
+    p = sub.add_parser("compare", help="comparar dos reportes")
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument("--metric", default="p50", choices=("mean", "p50", "p95", "p99"))
+    p.add_argument("--threshold", type=float, default=0.10)
+    p.set_defaults(func=compare)
+
+    p = sub.add_parser("replay", help="repetir los casos registrados en el historial")
+    p.add_argument("--target", default="service",
+                   help="service (DiagnosisService.run), app (Flask en este proceso) o la URL de un servidor")
+    p.add_argument("--history", help="historial JSON Lines a repetir (por defecto, el configurado)")
+    p.add_argument("--limit", type=int, help="repetir sólo los N casos más recientes")
+    p.add_argument("--requests", type=int, help="peticiones a enviar (por defecto, una por caso)")
+    p.add_argument("--concurrency", type=int, default=1, help="hilos que envían peticiones")
+    p.add_argument("--rate", type=float, default=0.0, help="peticiones por segundo en total (0: sin límite)")
+    p.add_argument("--cache", action="store_true", help="con la caché de resultados activa (service/app)")
+    p.add_argument("--output", help="archivo JSON del reporte (comparable con 'compare')")
+    p.set_defaults(func=replay)
+
+    args = parser.parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
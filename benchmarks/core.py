@@ -0,0 +1,123 @@
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+FORMAT_VERSION = 1
+
+
+def percentile(sorted_values, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(name, samples, unit="us", wall=None, **extra):
+    """
+    Resumen de una lista de duraciones en segundos, expresado en ``unit``.
+
+    ``wall`` es el tiempo total transcurrido cuando las muestras se tomaron en
+    paralelo; si no se indica, el rendimiento se calcula sobre su suma.
+    """
+    scale = {"s": 1.0, "ms": 1e3, "us": 1e6}[unit]
+    values = sorted(s * scale for s in samples)
+    total = wall if wall is not None else sum(samples)
+    result = {
+        "name": name,
+        "unit": unit,
+        "n": len(values),
+        "mean": sum(values) / len(values) if values else None,
+        "min": values[0] if values else None,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": values[-1] if values else None,
+        "ops_per_sec": len(samples) / total if total else None,
+    }
+    result.update(extra)
+    return result
+
+
+def measure(func, repeat, warmup=0):
+    """Duración en segundos de cada una de ``repeat`` llamadas a ``func``."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    clock = time.perf_counter
+    for _ in range(repeat):
+        start = clock()
+        func()
+        samples.append(clock() - start)
+    return samples
+
+
+def _git_revision():
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def report(results, args):
+    return {
+        "version": FORMAT_VERSION,
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "python": sys.version.split()[0],
+            "implementation": platform.python_implementation(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": args,
+        },
+        "results": results,
+    }
+
+
+def print_table(results, out=sys.stdout):
+    header = f"{'benchmark':<40} {'n':>7} {'p50':>11} {'p95':>11} {'p99':>11} {'ops/s':>11}"
+    print(header, file=out)
+    print("-" * len(header), file=out)
+    for r in results:
+        def fmt(v):
+            return f"{v:>9.1f}{r['unit']:>2}" if v is not None else f"{'-':>11}"
+
+        ops = f"{r['ops_per_sec']:>11.1f}" if r["ops_per_sec"] else f"{'-':>11}"
+        print(f"{r['name']:<40} {r['n']:>7} {fmt(r['p50'])} {fmt(r['p95'])} {fmt(r['p99'])} {ops}", file=out)
+
+
+def load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("version") != FORMAT_VERSION:
+        raise ValueError(f"{path}: versión de reporte no soportada")
+    return data
+
+
+def compare(baseline, current, metric="p50", threshold=0.10):
+    """
+    Compara dos reportes benchmark por benchmark.
+
+    Devuelve ``[(nombre, valor_base, valor_actual, cambio_relativo, regresión)]``;
+    una regresión es un aumento de ``metric`` mayor que ``threshold``.
+    """
+    base = {r["name"]: r for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        b = base.get(r["name"])
+        if b is None or not b.get(metric) or r.get(metric) is None:
+            continue
+        change = r[metric] / b[metric] - 1.0
+        rows.append((r["name"], b[metric], r[metric], change, change > threshold))
+    return rows
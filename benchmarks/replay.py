@@ -0,0 +1,241 @@
+"""
+Repetición del tráfico real registrado en el historial.
+
+Cada registro del historial guarda el caso de entrada canónico que lo
+produjo; ``replay`` vuelve a enviar esos casos a un destino y compara cada
+respuesta con el diagnóstico registrado:
+
+    service   ``DiagnosisService.run`` en este proceso (sin guardar en el historial)
+    app       la aplicación Flask en este proceso (POST /api/diagnose con el
+              historial en un directorio temporal)
+    URL       un servidor en ejecución, por ejemplo http://localhost:5000
+              (cada petición se guarda en el historial de ese servidor)
+
+Con ``rate`` los envíos siguen un calendario fijo (``rate`` peticiones por
+segundo en total) y la latencia se mide desde el momento programado, así un
+servidor saturado no esconde la espera en la cola del generador.
+"""
+import contextlib
+import http.client
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from benchmarks.core import percentile, summarize
+
+# Límites superiores (en ms) de los intervalos del histograma de latencias
+LATENCY_BUCKETS_MS = (0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500)
+
+# Diagnósticos cambiados que se incluyen en el reporte (uno por caso distinto)
+MAX_REPORTED_CHANGES = 50
+
+
+def _expected(record):
+    return {
+        "diagnosis": record.diagnosis,
+        "cause": record.cause,
+        "solution_id": record.solution_id,
+        "confidence": record.confidence,
+    }
+
+
+def recorded_cases(records, limit=None):
+    """
+    ``(casos, sin_caso)``: los registros con caso de entrada como ``(caso
+    compacto, diagnóstico registrado)``, los ``limit`` más recientes si se
+    indica, y cuántos registros no tenían caso (anteriores a que se guardara).
+    """
+    from services.history_record import DiagnosisRecord
+
+    cases = deque(maxlen=limit) if limit else []
+    skipped = 0
+    for record in records:
+        if isinstance(record, DiagnosisRecord) and record.case is not None:
+            cases.append((record.case, _expected(record)))
+        else:
+            skipped += 1
+    return list(cases), skipped
+
+
+def _referenced(result):
+    """Resultado de /api/diagnose con ``solution_id`` en lugar del texto (como el historial)."""
+    if result is None:
+        return None
+    from knowledge_base.solutions import solutions
+
+    result = dict(result)
+    if "solution" in result:
+        solution = result.pop("solution")
+        result["solution_id"] = solutions.intern(solution) if solution is not None else None
+    return result
+
+
+def service_target():
+    from services.diagnosis_service import DiagnosisService
+
+    def call(data):
+        return _referenced(DiagnosisService.run(data, persist=False))
+
+    return call, contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def _temporary_history():
+    from services.history_service import HistoryService
+    from services.history_store import JsonLinesHistoryStore
+
+    directory = tempfile.mkdtemp(prefix="replay-")
+    try:
+        HistoryService.configure(JsonLinesHistoryStore(os.path.join(directory, "responses.jsonl"),
+                                                       fsync="never"))
+        yield
+    finally:
+        HistoryService.flush()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def app_target():
+    from app import app
+
+    local = threading.local()
+
+    def call(data):
+        # El test client no es thread-safe: uno por hilo
+        client = getattr(local, "client", None)
+        if client is None:
+            client = local.client = app.test_client()
+        response = client.post("/api/diagnose?solutions=id", json=data)
+        if response.status_code != 200:
+            raise RuntimeError(f"/api/diagnose respondió {response.status_code}")
+        return response.get_json()
+
+    return call, _temporary_history()
+
+
+def url_target(url, timeout=30.0):
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    path = (parts.path.rstrip("/") or "") + "/api/diagnose?solutions=id"
+    local = threading.local()
+
+    def call(data):
+        # Una conexión persistente por hilo (se reabre sola si el servidor la cierra)
+        conn = getattr(local, "conn", None)
+        if conn is None:
+            conn = local.conn = connection_class(parts.netloc, timeout=timeout)
+        body = json.dumps(data).encode("utf-8")
+        try:
+            conn.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+            response = conn.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            local.conn = None
+            raise
+        if response.status != 200:
+            raise RuntimeError(f"{url}/api/diagnose respondió {response.status}")
+        return json.loads(payload)
+
+    return call, contextlib.nullcontext()
+
+
+def replay(cases, call, requests=None, concurrency=1, rate=0.0):
+    """
+    Envía ``requests`` casos (por defecto, cada uno una vez; se recorren en
+    ciclo si se piden más) con ``concurrency`` hilos y, si ``rate`` no es 0,
+    a ``rate`` peticiones por segundo en total.
+
+    Devuelve ``(latencias en segundos, cambios, errores, duración total)``;
+    ``cambios`` es ``{caso: (registrado, actual, veces)}``.
+    """
+    from services.history_record import case_data
+
+    total = len(cases) if requests is None else requests
+    payloads = [case_data(case) for case, _ in cases]
+    lock = threading.Lock()
+    counter = iter(range(total))
+    samples = []
+    changes = {}
+    errors = []
+    start = time.perf_counter()
+
+    def worker():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            case, expected = cases[i % len(cases)]
+            scheduled = start + i / rate if rate else None
+            if scheduled is not None:
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            sent = time.perf_counter()
+            try:
+                result = call(payloads[i % len(cases)])
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            elapsed = time.perf_counter() - (scheduled if scheduled is not None else sent)
+            with lock:
+                samples.append(elapsed)
+                if result != expected:
+                    _, _, count = changes.get(case, (None, None, 0))
+                    changes[case] = (expected, result, count + 1)
+
+    with ThreadPoolExecutor(max(1, concurrency)) as pool:
+        for _ in range(max(1, concurrency)):
+            pool.submit(worker)
+    return samples, changes, errors, time.perf_counter() - start
+
+
+def histogram(samples, buckets=LATENCY_BUCKETS_MS):
+    """``[(límite en ms, cantidad)]`` de las latencias en segundos; el último límite es None (resto)."""
+    counts = [0] * (len(buckets) + 1)
+    for sample in samples:
+        ms = sample * 1000
+        for i, bound in enumerate(buckets):
+            if ms <= bound:
+                counts[i] += 1
+                break
+        else:
+            counts[-1] += 1
+    return list(zip(list(buckets) + [None], counts))
+
+
+def print_histogram(rows, out):
+    total = sum(count for _, count in rows) or 1
+    for bound, count in rows:
+        label = f"<= {bound:g} ms" if bound is not None else f"> {rows[-2][0]:g} ms"
+        bar = "#" * round(40 * count / total)
+        print(f"{label:>14} {count:>8} {bar}", file=out)
+
+
+def summary(name, samples, changes, errors, wall, skipped):
+    """Resultado en el formato de ``benchmarks.core`` más errores, cambios e histograma."""
+    from services.history_record import case_data
+
+    result = summarize(name, samples, unit="ms", wall=wall)
+    ordered = sorted(samples)
+    result.update({
+        "p999": percentile([s * 1000 for s in ordered], 99.9),
+        "errors": len(errors),
+        "error_samples": sorted(set(errors))[:10],
+        "skipped_records": skipped,
+        "changed_cases": len(changes),
+        "changed_requests": sum(count for _, _, count in changes.values()),
+        "histogram_ms": [[bound, count] for bound, count in histogram(samples)],
+        "changes": [
+            {"case": case_data(case), "recorded": recorded, "current": current, "requests": count}
+            for case, (recorded, current, count) in list(changes.items())[:MAX_REPORTED_CHANGES]
+        ],
+    })
+    return result
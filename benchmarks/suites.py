@@ -0,0 +1,212 @@
+"""
+Suites de benchmarks: motor de inferencia, historial y API HTTP.
+
+Los servicios se importan dentro de cada suite para que ``__main__`` pueda
+fijar antes las variables de entorno (caché, modo de diagnóstico, etc.).
+"""
+import itertools
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.core import measure, summarize
+
+BROWSERS = ("Chrome", "Firefox", "Edge", "Safari", "IE", "Other")
+CONNECTIONS = ("wifi", "ethernet", "cellular", "slow_wifi")
+
+
+def _families():
+    from knowledge_base.facts import CHAT_SYMPTOMS, CONTENT_SYMPTOMS, LOGIN_SYMPTOMS, VIDEO_SYMPTOMS
+
+    return {
+        "login": LOGIN_SYMPTOMS,
+        "video": VIDEO_SYMPTOMS,
+        "chat": CHAT_SYMPTOMS,
+        "content": CONTENT_SYMPTOMS,
+    }
+
+
+def _case(symptoms, browser, connection):
+    return {
+        "symptoms": [{"type": t, "description": d} for t, d in symptoms],
+        "system_info": {"browser": browser, "connection_type": connection},
+    }
+
+
+def single_symptom_cases(family=None):
+    """Todos los casos de un síntoma (de una familia, o de todas)."""
+    families = _families()
+    names = [family] if family else list(families)
+    return [
+        _case([(name, desc)], browser, connection)
+        for name in names
+        for desc in families[name]
+        for browser in BROWSERS
+        for connection in CONNECTIONS
+    ]
+
+
+def multi_symptom_cases(size=3, limit=2000):
+    """Casos con ``size`` síntomas de familias distintas, en orden determinista."""
+    families = _families()
+    symptoms = [(name, desc) for name, descs in families.items() for desc in descs]
+    cases = []
+    for combo in itertools.combinations(symptoms, size):
+        if len({t for t, _ in combo}) < size:
+            continue
+        i = len(cases)
+        cases.append(_case(combo, BROWSERS[i % len(BROWSERS)], CONNECTIONS[i % len(CONNECTIONS)]))
+        if len(cases) >= limit:
+            break
+    return cases
+
+
+def _cycle(cases):
+    it = itertools.cycle(cases)
+    return lambda: next(it)
+
+
+# ========== MOTOR ==========
+# "engine.*" sin sufijo usa el motor completo (todas las familias de reglas)
+
+def engine_suite(repeat):
+    from knowledge_base.expert_system import EdTechExpertSystem, engine_class
+
+    results = []
+    samples = measure(EdTechExpertSystem, max(5, repeat // 20), warmup=1)
+    results.append(summarize("engine.construct", samples, unit="ms"))
+    for family in _families():
+        samples = measure(engine_class({family}), max(5, repeat // 20), warmup=1)
+        results.append(summarize(f"engine.construct[{family}]", samples, unit="ms"))
+
+    engine = EdTechExpertSystem()
+    results.append(summarize("engine.reset", measure(engine.reset, repeat, warmup=10)))
+
+    for family in _families():
+        next_case = _cycle(single_symptom_cases(family))
+        samples = measure(lambda: engine.diagnose(next_case()), repeat, warmup=10)
+        results.append(summarize(f"engine.diagnose[{family}]", samples))
+
+        # Motor con sólo las reglas de la familia, como lo usa DiagnosisService
+        family_engine = engine_class({family})()
+        samples = measure(lambda: family_engine.diagnose(next_case()), repeat, warmup=10)
+        results.append(summarize(f"engine.diagnose[{family},family-engine]", samples))
+
+    next_case = _cycle(multi_symptom_cases())
+    samples = measure(lambda: engine.diagnose(next_case()), repeat, warmup=10)
+    results.append(summarize("engine.diagnose[multi]", samples))
+    return results
+
+
+# ========== HISTORIAL ==========
+
+_SAMPLE_ENTRY = {
+    "diagnosis": "login",
+    "cause": "browser",
+    "solution": "Actualizá el navegador o probá con otro compatible (Chrome, Firefox o Edge).",
+    "confidence": 0.9,
+    "timestamp": "2024-01-01T00:00:00+00:00",
+}
+
+
+def _make_store(backend, directory, fsync):
+    if backend == "jsonl":
+        from services.history_store import JsonLinesHistoryStore
+
+        return JsonLinesHistoryStore(os.path.join(directory, "responses.jsonl"), fsync=fsync)
+    if backend == "sqlite":
+        from services.sqlite_history_store import SqliteHistoryStore
+
+        return SqliteHistoryStore(os.path.join(directory, "history.sqlite3"), fsync=fsync)
+    raise ValueError(f"Backend de historial inválido: {backend}")
+
+
+def _prefill(store, size, chunk=10000):
+    for start in range(0, size, chunk):
+        store.append_many([_SAMPLE_ENTRY] * min(chunk, size - start))
+
+
+def history_suite(repeat, sizes, backends, fsync):
+    from services.history_service import HistoryService
+
+    results = []
+    for backend in backends:
+        for size in sizes:
+            directory = tempfile.mkdtemp(prefix="bench-history-")
+            try:
+                store = _make_store(backend, directory, fsync)
+                _prefill(store, size)
+                HistoryService.configure(store)
+                label = f"{backend},n={size}"
+
+                # Primera consulta del dashboard: lee el historial completo
+                start = time.perf_counter()
+                HistoryService.stats()
+                results.append(summarize(f"history.stats_load[{label}]", [time.perf_counter() - start], unit="ms"))
+
+                # Con las estadísticas cargadas, cada append las actualiza como en el servidor
+                entry = {k: v for k, v in _SAMPLE_ENTRY.items() if k != "timestamp"}
+                samples = measure(lambda: HistoryService.append(entry), repeat, warmup=5)
+                results.append(summarize(f"history.append[{label}]", samples, fsync=fsync))
+            finally:
+                if hasattr(store, "close"):
+                    store.close()
+                shutil.rmtree(directory, ignore_errors=True)
+    return results
+
+
+# ========== HTTP ==========
+
+def http_suite(repeat, concurrency, fsync):
+    from app import app
+
+    directory = tempfile.mkdtemp(prefix="bench-http-")
+    try:
+        return _http_benchmarks(app, repeat, concurrency, directory, fsync)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def _http_benchmarks(app, repeat, concurrency, directory, fsync):
+    from services.history_service import HistoryService
+
+    results = []
+    HistoryService.configure(_make_store("jsonl", directory, fsync))
+    client = app.test_client()
+    payloads = {"single": single_symptom_cases(), "multi": multi_symptom_cases()}
+    for label, cases in payloads.items():
+        next_case = _cycle(cases)
+
+        def call():
+            response = client.post("/api/diagnose", json=next_case())
+            if response.status_code != 200:
+                raise RuntimeError(f"/api/diagnose respondió {response.status_code}")
+
+        for _ in range(10):
+            call()
+        if concurrency <= 1:
+            samples = measure(call, repeat)
+            results.append(summarize(f"http.diagnose[{label}]", samples, unit="ms"))
+            continue
+
+        # El test client no es thread-safe: uno por tarea
+        def timed(case):
+            local = app.test_client()
+            start = time.perf_counter()
+            response = local.post("/api/diagnose", json=case)
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                raise RuntimeError(f"/api/diagnose respondió {response.status_code}")
+            return elapsed
+
+        batch = [next_case() for _ in range(repeat)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            samples = list(pool.map(timed, batch))
+        wall = time.perf_counter() - start
+        results.append(summarize(
+            f"http.diagnose[{label},c={concurrency}]", samples, unit="ms", wall=wall
+        ))
+    return results
@@ -0,0 +1,10 @@
+# Parche de compatibilidad para Experta con Python 3.10+
+# Experta usa collections.Mapping que fue movido a collections.abc
+import collections
+import collections.abc
+if not hasattr(collections, "Mapping"):
+    collections.Mapping = collections.abc.Mapping
+if not hasattr(collections, "MutableMapping"):
+    collections.MutableMapping = collections.abc.MutableMapping
+if not hasattr(collections, "Sequence"):
+    collections.Sequence = collections.abc.Sequence
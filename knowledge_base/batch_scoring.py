@@ -0,0 +1,353 @@
+"""
+Diagnóstico vectorizado de muchos tickets de un síntoma con NumPy.
+
+La entrada es columnar: un arreglo por campo (tipo de síntoma, descripción,
+navegador y tipo de conexión), una fila por ticket. Cada columna se
+factoriza en valores distintos + códigos; las condiciones de cada regla se
+evalúan una sola vez por valor distinto y se convierten en máscaras
+booleanas sobre las filas indexando con los códigos. La resolución de
+conflictos (``resolve_agenda``: primero las reglas que usan SystemInfo,
+después el fallback ``NOT(Diagnosis(...))`` si ninguna diagnosticó su tipo,
+después las de sólo síntoma; gana la primera de mayor confianza) también se
+hace con operaciones sobre arreglos.
+
+    scorer = BatchScorer()
+    result = scorer.score(types, descriptions, browsers, connections)
+    result["problem_type"], result["cause"], result["solution_id"], result["confidence"]
+
+Prueba diferencial contra el motor experta y puntaje de un CSV:
+    python -m knowledge_base.batch_scoring verify [--rows N]
+    python -m knowledge_base.batch_scoring score tickets.csv [--output resultado.csv]
+"""
+import argparse
+import csv
+import json
+import random
+import sys
+import time
+
+import numpy as np
+
+from .decision_table import CompileError, _CompiledRule, _field_matches
+from .solutions import solution_id
+
+# Columnas de la entrada: (campo de la regla, obligatorio)
+COLUMNS = (
+    ("type", True),
+    ("description", True),
+    ("browser", False),
+    ("connection_type", False),
+)
+# Columnas del resultado
+RESULT_COLUMNS = ("problem_type", "cause", "solution_id", "confidence")
+
+
+class _Column:
+    """Columna factorizada: ``values`` distintos (None = campo ausente) y el código de cada fila."""
+
+    def __init__(self, name, data, mandatory):
+        data = np.asarray(data, dtype=object)
+        if data.ndim != 1:
+            raise ValueError(f"'{name}' debe ser un arreglo de una dimensión")
+        missing = np.equal(data, None)
+        if mandatory and missing.any():
+            raise ValueError(f"'{name}' es obligatorio en todas las filas")
+        present = data[~missing]
+        if not all(isinstance(v, str) for v in set(present.tolist())):
+            raise ValueError(f"'{name}' sólo admite textos")
+        uniques, inverse = np.unique(present.astype(str), return_inverse=True)
+        self.name = name
+        self.values = uniques.tolist() + [None]
+        self.codes = np.full(len(data), len(uniques), dtype=np.intp)
+        self.codes[~missing] = inverse.reshape(-1)
+
+    def __len__(self):
+        return len(self.values)
+
+
+class BatchScorer:
+    """
+    Reglas del motor compiladas a máscaras sobre columnas (ver el docstring
+    del módulo). Da el mismo mejor diagnóstico que
+    ``EdTechExpertSystem.diagnose`` para un caso con un solo síntoma.
+    """
+
+    def __init__(self, engine_cls=None):
+        if engine_cls is None:
+            from .expert_system import EdTechExpertSystem as engine_cls
+
+        rules = sorted((_CompiledRule(r) for r in engine_cls().get_rules()), key=lambda r: r.name)
+        # Orden de la agenda para un síntoma: (SystemInfo, síntoma) > fallback > sólo síntoma
+        self._groups = (
+            [r for r in rules if r.fallback_for is None and r.uses_sysinfo],
+            [r for r in rules if r.fallback_for is not None],
+            [r for r in rules if r.fallback_for is None and not r.uses_sysinfo],
+        )
+        self._diagnoses = []
+        self._diagnosis_index = {}
+        self._fired = {}
+
+    def _intern(self, result):
+        key = (result["diagnosis"], result["cause"], result["solution"], result["confidence"])
+        idx = self._diagnosis_index.get(key)
+        if idx is None:
+            idx = self._diagnosis_index[key] = len(self._diagnoses)
+            self._diagnoses.append(result)
+        return idx
+
+    @staticmethod
+    def _patterns(rule):
+        """``[(columna, restricción)]`` del lado izquierdo de ``rule``."""
+        fields = [(field, constraint) for field, constraint in rule.symptom.items()]
+        for pattern in rule.sysinfo:
+            fields.extend(pattern.items())
+        return fields
+
+    @staticmethod
+    def _combinations(columns, rows):
+        """Códigos de la combinación de valores de ``columns`` en cada fila de ``rows``."""
+        if not columns:
+            return np.zeros(int(rows.sum()), dtype=np.intp)
+        return np.ravel_multi_index(tuple(c.codes[rows] for c in columns), tuple(len(c) for c in columns))
+
+    def _rule_index(self, rule, columns):
+        """Índice del diagnóstico que declara ``rule`` en cada fila (-1 si no se activa)."""
+        rows = np.ones(len(columns["type"].codes), dtype=bool)
+        bound = {}
+        for field, constraint in self._patterns(rule):
+            column = columns[field]
+            # La restricción se evalúa una vez por valor distinto de la columna
+            lookup = np.empty(len(column), dtype=bool)
+            for i, value in enumerate(column.values):
+                bindings = {}
+                lookup[i] = _field_matches(constraint, value is not None, value, bindings)
+                bound.update(dict.fromkeys(bindings, column))
+            rows &= lookup[column.codes]
+
+        for test in rule.tests:
+            names = test.__code__.co_varnames[: test.__code__.co_argcount]
+            used = [bound[n] for n in names]
+            combos = self._combinations(used, rows)
+            distinct, inverse = np.unique(combos, return_inverse=True)
+            passed = np.empty(len(distinct), dtype=bool)
+            for i, combo in enumerate(distinct):
+                codes = np.unravel_index(combo, tuple(len(c) for c in used))
+                passed[i] = bool(test(**{n: c.values[k] for n, c, k in zip(names, used, codes)}))
+            selected = np.flatnonzero(rows)
+            rows[selected[~passed[inverse.reshape(-1)]]] = False
+
+        # El lado derecho se ejecuta una vez por combinación distinta de variables ligadas
+        result = np.full(len(rows), -1, dtype=np.intp)
+        if not rows.any():
+            return result
+        names = sorted(bound)
+        used = [bound[n] for n in names]
+        combos = self._combinations(used, rows)
+        distinct, inverse = np.unique(combos, return_inverse=True)
+        indexes = np.empty(len(distinct), dtype=np.intp)
+        for i, combo in enumerate(distinct):
+            codes = np.unravel_index(combo, tuple(len(c) for c in used)) if used else ()
+            bindings = {n: c.values[k] for n, c, k in zip(names, used, codes)}
+            key = (rule.name, tuple(sorted(bindings.items())))
+            idx = self._fired.get(key)
+            if idx is None:
+                idx = self._fired[key] = self._intern(rule.fire(bindings))
+            indexes[i] = idx
+        result[rows] = indexes[inverse.reshape(-1)]
+        return result
+
+    @staticmethod
+    def _check_unambiguous(group_index, idx, rule):
+        """Dos reglas con la misma clave de agenda no pueden dar diagnósticos distintos en una fila."""
+        active = idx >= 0
+        conflict = active & (group_index >= 0) & (group_index != idx)
+        if conflict.any():
+            raise CompileError(f"{rule.name}: resolución de conflictos ambigua en "
+                               f"{int(conflict.sum())} filas")
+        group_index[active & (group_index < 0)] = idx[active & (group_index < 0)]
+
+    def score(self, types, descriptions, browsers=None, connections=None):
+        """
+        Mejor diagnóstico de cada fila. ``browsers`` / ``connections`` pueden
+        faltar o tener None (campo ausente en SystemInfo).
+
+        Devuelve ``{"problem_type", "cause", "solution_id", "confidence"}``
+        con un arreglo por columna; las filas sin diagnóstico tienen None y
+        confianza NaN.
+        """
+        n = len(types)
+        if browsers is None:
+            browsers = [None] * n
+        if connections is None:
+            connections = [None] * n
+        data = (types, descriptions, browsers, connections)
+        if any(len(column) != n for column in data):
+            raise ValueError("Todas las columnas deben tener la misma cantidad de filas")
+        columns = {name: _Column(name, values, mandatory)
+                   for (name, mandatory), values in zip(COLUMNS, data)}
+
+        sysinfo_rules, fallback_rules, symptom_rules = self._groups
+        contributions = []
+        sysinfo_index = np.full(n, -1, dtype=np.intp)
+        sysinfo_found = []
+        for rule in sysinfo_rules:
+            idx = self._rule_index(rule, columns)
+            self._check_unambiguous(sysinfo_index, idx, rule)
+            sysinfo_found.append(idx)
+            contributions.append(idx)
+
+        fallback = np.full(n, -1, dtype=np.intp)
+        for rule in fallback_rules:
+            idx = self._rule_index(rule, columns)
+            if ((idx >= 0) & (fallback >= 0)).any():
+                raise CompileError(f"{rule.name}: más de un fallback para un mismo síntoma")
+            fallback = np.where(idx >= 0, idx, fallback)
+
+        symptom_index = np.full(n, -1, dtype=np.intp)
+        symptom_found = []
+        for rule in symptom_rules:
+            idx = self._rule_index(rule, columns)
+            self._check_unambiguous(symptom_index, idx, rule)
+            symptom_found.append(idx)
+
+        # Tipo de problema de cada diagnóstico como código entero (-1: sin diagnóstico)
+        kinds = {}
+        kind_codes = np.array([kinds.setdefault(d["diagnosis"], len(kinds)) for d in self._diagnoses] + [-1],
+                              dtype=np.intp)
+        confidences = np.array([d["confidence"] for d in self._diagnoses] + [np.nan])
+
+        # El fallback no se dispara si una regla con SystemInfo ya diagnosticó su tipo
+        fallback_kind = kind_codes[fallback]
+        seen = np.zeros(n, dtype=bool)
+        for idx in sysinfo_found:
+            seen |= (idx >= 0) & (kind_codes[idx] == fallback_kind)
+        contributions.append(np.where(seen, -1, fallback))
+        contributions.extend(symptom_found)
+
+        # Gana el primero de mayor confianza, en el orden de la agenda
+        best = np.full(n, -1, dtype=np.intp)
+        best_confidence = np.full(n, -np.inf)
+        for idx in contributions:
+            better = (idx >= 0) & (confidences[idx] > best_confidence)
+            best[better] = idx[better]
+            best_confidence[better] = confidences[idx][better]
+
+        table = self._diagnoses
+        problem_types = np.array([d["diagnosis"] for d in table] + [None], dtype=object)
+        causes = np.array([d["cause"] for d in table] + [None], dtype=object)
+        solution_ids = np.array([solution_id(d["solution"]) if d["solution"] is not None else None
+                                 for d in table] + [None], dtype=object)
+        return {
+            "problem_type": problem_types[best],
+            "cause": causes[best],
+            "solution_id": solution_ids[best],
+            "confidence": confidences[best],
+        }
+
+
+# ========== VERIFICACIÓN DIFERENCIAL ==========
+
+def _expected(engine, symptom_type, description, browser, connection):
+    system_info = {k: v for k, v in (("browser", browser), ("connection_type", connection)) if v is not None}
+    diagnoses = engine.diagnose({"symptoms": [{"type": symptom_type, "description": description}],
+                                 "system_info": system_info})
+    best = max(diagnoses, key=lambda d: d["confidence"], default=None)
+    if best is None:
+        return (None, None, None, None)
+    return (best["diagnosis"], best["cause"], solution_id(best["solution"]), best["confidence"])
+
+
+def _rows(rows=0, seed=0):
+    """Todas las combinaciones de entrada que distinguen las reglas y ``rows`` filas al azar entre ellas."""
+    from .decision_table import _input_space, compile_table
+
+    space = []
+    for case in _input_space(compile_table()):
+        if len(case["symptoms"]) != 1:
+            continue
+        symptom = case["symptoms"][0]
+        sysinfo = case.get("system_info", {})
+        space.append((symptom["type"], symptom["description"],
+                      sysinfo.get("browser"), sysinfo.get("connection_type")))
+    sample = random.Random(seed).choices(space, k=rows) if rows else []
+    return space + sample
+
+
+def verify(rows=0, seed=0):
+    """
+    Compara ``BatchScorer`` con el motor experta fila por fila: todo el
+    espacio de entradas y ``rows`` filas adicionales al azar (con valores
+    repetidos, como en un lote real). Devuelve ``(filas, diferencias,
+    segundos del lote, segundos del motor)``.
+    """
+    from .expert_system import EdTechExpertSystem
+
+    data = _rows(rows, seed)
+    columns = list(zip(*data))
+    start = time.perf_counter()
+    result = BatchScorer().score(*columns)
+    batch_seconds = time.perf_counter() - start
+
+    engine = EdTechExpertSystem()
+    expected = {}
+    start = time.perf_counter()
+    for row in set(data):
+        expected[row] = _expected(engine, *row)
+    engine_seconds = (time.perf_counter() - start) * len(data) / len(expected)
+
+    mismatches = []
+    for i, row in enumerate(data):
+        got = tuple(result[c][i] for c in RESULT_COLUMNS)
+        got = got[:3] + (None if np.isnan(got[3]) else float(got[3]),)
+        if got != expected[row]:
+            mismatches.append({"row": row, "engine": expected[row], "batch": got})
+    return len(data), mismatches, batch_seconds, engine_seconds
+
+
+def score_csv(path, output):
+    """Puntúa un CSV con columnas type, description, browser y connection_type (vacío = ausente)."""
+    with open(path, newline="", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    columns = [[row.get(name) or None for row in rows] for name, _ in COLUMNS]
+    result = BatchScorer().score(*columns)
+    fieldnames = list(rows[0].keys()) + list(RESULT_COLUMNS) if rows else list(RESULT_COLUMNS)
+    writer = csv.DictWriter(output, fieldnames=fieldnames)
+    writer.writeheader()
+    for i, row in enumerate(rows):
+        confidence = result["confidence"][i]
+        writer.writerow(dict(row, problem_type=result["problem_type"][i], cause=result["cause"][i],
+                             solution_id=result["solution_id"][i],
+                             confidence="" if np.isnan(confidence) else float(confidence)))
+    return len(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("verify", help="compara el lote vectorizado con el motor experta")
+    check.add_argument("--rows", type=int, default=100000, help="filas al azar además del espacio de entradas")
+    check.add_argument("--seed", type=int, default=0)
+    score = sub.add_parser("score", help="puntúa un CSV (type, description, browser, connection_type)")
+    score.add_argument("input")
+    score.add_argument("--output", help="CSV de salida (por defecto, stdout)")
+    args = parser.parse_args(argv)
+
+    if args.command == "score":
+        if args.output:
+            with open(args.output, "w", newline="", encoding="utf-8") as out:
+                count = score_csv(args.input, out)
+        else:
+            count = score_csv(args.input, sys.stdout)
+        print(f"{count} filas puntuadas", file=sys.stderr)
+        return 0
+
+    checked, mismatches, batch_seconds, engine_seconds = verify(args.rows, args.seed)
+    for m in mismatches[:20]:
+        print(json.dumps(m, ensure_ascii=False))
+    print(f"{checked} filas verificadas, {len(mismatches)} diferencias "
+          f"(lote: {checked / batch_seconds:,.0f} filas/s; motor: {checked / engine_seconds:,.0f} filas/s)")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,524 @@
+"""
+Tabla de decisión precompilada a partir de las reglas de la base de conocimiento.
+
+Todas las reglas de ``knowledge_base/rules`` dependen únicamente de
+(tipo de síntoma, descripción, navegador, tipo de conexión) y declaran un
+``Diagnosis`` con confianza fija. El compilador analiza el lado izquierdo de
+cada regla (literales, ``MATCH`` + ``TEST(lambda ...)`` y los fallbacks
+``NOT(Diagnosis(...))``), ejecuta el lado derecho en un contexto que sólo
+registra las declaraciones y reproduce la resolución de conflictos de
+experta (``DepthStrategy``) para obtener exactamente la misma salida que
+``EdTechExpertSystem.diagnose``.
+
+Uso offline:
+    python -m knowledge_base.decision_table build      # genera el artefacto
+    python -m knowledge_base.decision_table verify     # prueba diferencial vs Rete
+"""
+import argparse
+import glob
+import hashlib
+import itertools
+import json
+import os
+import sys
+
+_KB_DIR = os.path.dirname(os.path.abspath(__file__))
+
+DEFAULT_PATH = "data/decision_table.json"
+FORMAT_VERSION = 1
+
+# Representa "cualquier valor que ninguna regla menciona"
+OTHER = "__other__"
+
+_SYMPTOM_FIELDS = ("type", "description")
+_SYSINFO_FIELDS = ("browser", "connection_type")
+
+_TYPE_NAMES = {str: "str", int: "int", bool: "bool", float: "float"}
+_TYPES = {name: tp for tp, name in _TYPE_NAMES.items()}
+
+
+class CompileError(Exception):
+    """La base de reglas usa una construcción que la tabla no puede representar."""
+
+
+def rules_fingerprint():
+    """Hash de las fuentes de la base de conocimiento (hechos, motor y reglas)."""
+    paths = [
+        os.path.join(_KB_DIR, "facts.py"),
+        os.path.join(_KB_DIR, "expert_system.py"),
+        *sorted(glob.glob(os.path.join(_KB_DIR, "rules", "*.py"))),
+    ]
+    digest = hashlib.sha256()
+    for path in paths:
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+# ========== COMPILACIÓN ==========
+
+class _RecordingEngine:
+    """Sustituto de ``self`` que registra los hechos declarados por una regla."""
+
+    def __init__(self):
+        self.declared = []
+
+    def declare(self, *facts):
+        self.declared.extend(facts)
+
+
+def _field_matches(constraint, present, value, bindings):
+    from experta.fieldconstraint import ANDFC, L, NOTFC, ORFC, P, W
+
+    if isinstance(constraint, W):
+        ok = present
+    elif isinstance(constraint, L):
+        ok = present and value == constraint.value
+    elif isinstance(constraint, P):
+        ok = present and bool(constraint.match(value))
+    elif isinstance(constraint, ANDFC):
+        return all(_field_matches(c, present, value, bindings) for c in constraint)
+    elif isinstance(constraint, ORFC):
+        return any(_field_matches(c, present, value, bindings) for c in constraint)
+    elif isinstance(constraint, NOTFC):
+        return not _field_matches(constraint[0], present, value, bindings)
+    else:
+        return present and value == constraint
+
+    bind = getattr(constraint, "__bind__", None)
+    if ok and bind is not None:
+        bindings[bind] = value
+    return ok
+
+
+def _pattern_values(constraint):
+    """Constantes que un patrón o predicado distingue (literales y tuplas de TEST)."""
+    from experta.fieldconstraint import FieldConstraint, L, P
+
+    if isinstance(constraint, L):
+        yield constraint.value
+    elif isinstance(constraint, P):
+        yield from _code_constants(constraint.match)
+    elif isinstance(constraint, FieldConstraint):
+        for inner in constraint:
+            yield from _pattern_values(inner)
+    elif isinstance(constraint, str):
+        yield constraint
+
+
+def _code_constants(func):
+    if isinstance(func, frozenset):
+        # Predicado de pertenencia de knowledge_base.rule_index (TEST compilado)
+        yield from (c for c in func if isinstance(c, str))
+        return
+    consts = getattr(getattr(func, "__code__", None), "co_consts", ())
+    for const in consts:
+        if isinstance(const, str):
+            yield const
+        elif isinstance(const, (tuple, frozenset)):
+            yield from (c for c in const if isinstance(c, str))
+    for cell in getattr(func, "__closure__", None) or ():
+        contents = cell.cell_contents
+        if isinstance(contents, (set, frozenset, tuple)):
+            yield from (c for c in contents if isinstance(c, str))
+
+
+class _CompiledRule:
+    """Lado izquierdo de una regla reducido a condiciones sobre las cuatro entradas."""
+
+    def __init__(self, rule):
+        from experta import NOT, TEST
+        from .facts import Diagnosis, Symptom, SystemInfo
+
+        self.rule = rule
+        self.name = rule._wrapped.__name__
+        self.symptom = None
+        self.sysinfo = []
+        self.tests = []
+        self.fallback_for = None
+
+        if getattr(rule, "salience", 0):
+            raise CompileError(f"{self.name}: salience distinta de 0 no soportada")
+
+        for ce in rule:
+            if isinstance(ce, Symptom):
+                if self.symptom is not None:
+                    raise CompileError(f"{self.name}: más de un patrón Symptom")
+                if set(ce) - set(_SYMPTOM_FIELDS) or "type" not in ce:
+                    raise CompileError(f"{self.name}: patrón Symptom no soportado")
+                self.symptom = dict(ce)
+            elif isinstance(ce, SystemInfo):
+                if set(ce) - set(_SYSINFO_FIELDS):
+                    raise CompileError(f"{self.name}: campo de SystemInfo no soportado")
+                self.sysinfo.append(dict(ce))
+            elif isinstance(ce, TEST):
+                self.tests.append(ce[0])
+            elif isinstance(ce, NOT) and len(ce) == 1 and isinstance(ce[0], Diagnosis):
+                self.fallback_for = ce[0].get("problem_type")
+            else:
+                raise CompileError(f"{self.name}: elemento condicional no soportado: {ce!r}")
+
+        if self.symptom is None:
+            raise CompileError(f"{self.name}: toda regla debe tener un patrón Symptom")
+        if self.fallback_for is not None and (
+            self.sysinfo or self.tests or self.fallback_for != self.symptom.get("type")
+        ):
+            raise CompileError(f"{self.name}: forma de fallback no soportada")
+
+    @property
+    def uses_sysinfo(self):
+        return bool(self.sysinfo)
+
+    def match(self, symptom, sysinfo):
+        """Devuelve los bindings si la regla se activa para la celda, o None."""
+        bindings = {}
+        for field, constraint in self.symptom.items():
+            if not _field_matches(constraint, True, symptom[field], bindings):
+                return None
+        for pattern in self.sysinfo:
+            for field, constraint in pattern.items():
+                present = field in sysinfo
+                if not _field_matches(constraint, present, sysinfo.get(field), bindings):
+                    return None
+        for test in self.tests:
+            names = test.__code__.co_varnames[: test.__code__.co_argcount]
+            if not test(**{n: bindings[n] for n in names}):
+                return None
+        return bindings
+
+    def fire(self, bindings):
+        from .facts import Diagnosis
+
+        recorder = _RecordingEngine()
+        self.rule._wrapped(recorder, **bindings)
+        if len(recorder.declared) != 1 or not isinstance(recorder.declared[0], Diagnosis):
+            raise CompileError(f"{self.name}: la regla debe declarar exactamente un Diagnosis")
+        d = recorder.declared[0]
+        return {
+            "diagnosis": d.get("problem_type"),
+            "cause": d.get("cause"),
+            "solution": d.get("solution"),
+            "confidence": float(d.get("confidence") or 0.0),
+        }
+
+
+def _fact_schema(fact_cls):
+    schema = {}
+    for name, field in fact_cls.__fields__.items():
+        tp = _TYPE_NAMES.get(field.validator._schema)
+        if tp is None:
+            raise CompileError(f"{fact_cls.__name__}.{name}: tipo de campo no soportado")
+        schema[name] = [tp, bool(field.mandatory)]
+    return schema
+
+
+def compile_table(engine_cls=None):
+    """Compila las reglas de ``engine_cls`` (por defecto el sistema experto) en una tabla."""
+    from .facts import ServerStatus, Symptom, SystemInfo
+
+    if engine_cls is None:
+        from .expert_system import EdTechExpertSystem as engine_cls
+
+    rules = [_CompiledRule(r) for r in engine_cls().get_rules()]
+    rules.sort(key=lambda r: r.name)
+
+    # Dominio de cada entrada: los valores que alguna regla distingue + OTHER
+    descriptions = {}
+    browsers, connections = set(), set()
+    for r in rules:
+        descs = descriptions.setdefault(r.symptom["type"], set())
+        if "description" in r.symptom:
+            descs.update(_pattern_values(r.symptom["description"]))
+        for pattern in r.sysinfo:
+            browsers.update(_pattern_values(pattern.get("browser")))
+            connections.update(_pattern_values(pattern.get("connection_type")))
+        for test in r.tests:
+            names = set(test.__code__.co_varnames[: test.__code__.co_argcount])
+            values = set(_code_constants(test))
+            for pattern in r.sysinfo:
+                for field, constraint in pattern.items():
+                    if getattr(constraint, "__bind__", None) in names:
+                        (browsers if field == "browser" else connections).update(values)
+
+    symptom_keys = [(OTHER, OTHER)]
+    for stype in sorted(descriptions):
+        symptom_keys += [(stype, d) for d in sorted(descriptions[stype])] + [(stype, OTHER)]
+    browser_dom = sorted(browsers) + [OTHER]
+    conn_dom = sorted(connections) + [OTHER]
+
+    diagnoses, diag_index = [], {}
+
+    def intern(result):
+        key = json.dumps(result, sort_keys=True)
+        if key not in diag_index:
+            diag_index[key] = len(diagnoses)
+            diagnoses.append(result)
+        return diag_index[key]
+
+    cells = []
+    for (stype, desc), br, ct in itertools.product(symptom_keys, browser_dom, conn_dom):
+        symptom = {"type": stype, "description": desc}
+        sysinfo = {k: v for k, v in (("browser", br), ("connection_type", ct)) if v != OTHER}
+        activations, fallback = [], None
+        for r in rules:
+            bindings = r.match(symptom, sysinfo)
+            if bindings is None:
+                continue
+            idx = intern(r.fire(bindings))
+            if r.fallback_for is not None:
+                if fallback is not None:
+                    raise CompileError(f"Más de un fallback para el tipo {stype!r}")
+                fallback = idx
+            else:
+                activations.append([idx, int(r.uses_sysinfo)])
+        _check_unambiguous(activations, diagnoses, (stype, desc, br, ct))
+        cells.append([stype, desc, br, ct, activations, fallback])
+
+    return DecisionTable({
+        "version": FORMAT_VERSION,
+        "fingerprint": rules_fingerprint(),
+        "schema": {
+            "symptom": _fact_schema(Symptom),
+            "system_info": _fact_schema(SystemInfo),
+            "server_status": _fact_schema(ServerStatus),
+        },
+        "diagnoses": diagnoses,
+        "cells": cells,
+    })
+
+
+def resolve_agenda(agenda, problem_type):
+    """
+    Reproduce la agenda de experta (DepthStrategy) para reglas de la forma
+    que acepta el compilador. ``agenda`` es una lista de ``(clave, es_fallback,
+    diagnóstico)`` donde la clave son los IDs de los hechos de la activación
+    de mayor a menor: se dispara primero la activación cuyos hechos son más
+    recientes y, ante igualdad, el fallback ``NOT(Diagnosis(...))``. Un
+    fallback se descarta si ya hay un diagnóstico de su tipo y un
+    diagnóstico repetido no se vuelve a declarar. Devuelve los diagnósticos
+    en el orden en que quedarían en la memoria de trabajo.
+    """
+    agenda = sorted(agenda, key=lambda a: (a[0], a[1]), reverse=True)
+    declared, types_seen = [], set()
+    for _, is_fallback, diagnosis in agenda:
+        kind = problem_type(diagnosis)
+        if is_fallback and kind in types_seen:
+            continue
+        types_seen.add(kind)
+        if diagnosis not in declared:
+            declared.append(diagnosis)
+    return declared
+
+
+def _check_unambiguous(activations, diagnoses, cell):
+    """Dos activaciones con la misma clave de agenda dependen del orden interno de experta."""
+    seen = {}
+    for idx, uses_sysinfo in activations:
+        other = seen.setdefault(uses_sysinfo, idx)
+        if diagnoses[other] != diagnoses[idx]:
+            raise CompileError(f"Resolución de conflictos ambigua en la celda {cell}")
+
+
+# ========== TABLA ==========
+
+class DecisionTable:
+    """Tabla hash (síntoma, navegador, conexión) -> diagnósticos, sin experta."""
+
+    def __init__(self, payload):
+        if payload.get("version") != FORMAT_VERSION:
+            raise ValueError("Versión de tabla de decisión no soportada")
+        self.payload = payload
+        self.fingerprint = payload["fingerprint"]
+        # True si ``load_or_compile`` tuvo que recompilar (artefacto ausente o desactualizado)
+        self.recompiled = False
+        self._schema = {
+            name: {f: (_TYPES[tp], mandatory) for f, (tp, mandatory) in fields.items()}
+            for name, fields in payload["schema"].items()
+        }
+        self._diagnoses = payload["diagnoses"]
+        self._types = set()
+        self._descriptions = set()
+        self._browsers = set()
+        self._connections = set()
+        self._cells = {}
+        for stype, desc, br, ct, activations, fallback in payload["cells"]:
+            self._types.add(stype)
+            self._descriptions.add((stype, desc))
+            self._browsers.add(br)
+            self._connections.add(ct)
+            acts = [(idx, bool(uses_sysinfo)) for idx, uses_sysinfo in activations]
+            single = tuple(self._resolve([(1, acts, fallback)], 1))
+            self._cells[(stype, desc, br, ct)] = (acts, fallback, single)
+
+    @classmethod
+    def load(cls, path=DEFAULT_PATH):
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def save(self, path=DEFAULT_PATH):
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.payload, f, ensure_ascii=False, separators=(",", ":"))
+        os.replace(tmp, path)
+
+    def is_fresh(self):
+        return self.fingerprint == rules_fingerprint()
+
+    def _valid(self, kind, payload, required=True):
+        if not isinstance(payload, dict):
+            return False
+        for key in payload:
+            # experta rechaza claves no textuales o con accesores anidados
+            if not isinstance(key, str) or "__" in key.strip("_") or key.startswith("_"):
+                return False
+        for name, (tp, mandatory) in self._schema[kind].items():
+            if name in payload:
+                if not isinstance(payload[name], tp):
+                    return False
+            elif mandatory and required:
+                return False
+        return True
+
+    def _key(self, symptom, browser, conn):
+        stype = symptom["type"] if symptom["type"] in self._types else OTHER
+        desc = symptom["description"]
+        if (stype, desc) not in self._descriptions:
+            desc = OTHER
+        if stype == OTHER:
+            desc = OTHER
+        return (stype, desc, browser, conn)
+
+    def _resolve(self, per_symptom, count):
+        """Índices de los diagnósticos de un caso con varios síntomas (ver ``resolve_agenda``)."""
+        sysinfo_id = count + 1
+        agenda = []
+        for fact_id, acts, fallback in per_symptom:
+            for idx, uses_sysinfo in acts:
+                key = (sysinfo_id, fact_id) if uses_sysinfo else (fact_id,)
+                agenda.append((key, 0, idx))
+            if fallback is not None:
+                agenda.append(((fact_id,), 1, fallback))
+        return resolve_agenda(agenda, lambda idx: self._diagnoses[idx]["diagnosis"])
+
+    def diagnose(self, symptoms_data):
+        """
+        Misma salida que ``EdTechExpertSystem.diagnose``. Devuelve ``None`` si
+        la entrada no puede responderse desde la tabla (por ejemplo, datos
+        inválidos que el motor rechazaría con una excepción).
+        """
+        if not isinstance(symptoms_data, dict):
+            return None
+        symptoms = symptoms_data.get("symptoms", [])
+        if not isinstance(symptoms, list):
+            return None
+        sysinfo = symptoms_data.get("system_info", {})
+        if not self._valid("system_info", sysinfo):
+            return None
+        if "server_status" in symptoms_data and not self._valid(
+            "server_status", symptoms_data["server_status"]
+        ):
+            return None
+        if not all(self._valid("symptom", s) for s in symptoms):
+            return None
+
+        browser = sysinfo.get("browser")
+        browser = browser if browser in self._browsers else OTHER
+        conn = sysinfo.get("connection_type")
+        conn = conn if conn in self._connections else OTHER
+
+        if len(symptoms) == 1:
+            idxs = self._cells[self._key(symptoms[0], browser, conn)][2]
+        else:
+            per_symptom = []
+            for i, symptom in enumerate(symptoms, start=1):
+                acts, fallback, _ = self._cells[self._key(symptom, browser, conn)]
+                per_symptom.append((i, acts, fallback))
+            idxs = self._resolve(per_symptom, len(symptoms))
+        return [dict(self._diagnoses[i]) for i in idxs]
+
+
+def load_or_compile(path=DEFAULT_PATH):
+    """Carga el artefacto si está al día con las reglas; si no, lo recompila y guarda."""
+    try:
+        table = DecisionTable.load(path)
+        if table.is_fresh():
+            return table
+    except (OSError, ValueError, KeyError):
+        pass
+    table = compile_table()
+    table.save(path)
+    table.recompiled = True
+    return table
+
+
+# ========== VERIFICACIÓN DIFERENCIAL ==========
+
+def _input_space(table, pairs=False):
+    symptom_keys = sorted(table._descriptions)
+    symptom_variants = []
+    for stype, desc in symptom_keys:
+        if stype == OTHER:
+            symptom_variants.append({"type": "unknown_type", "description": "x"})
+        elif desc == OTHER:
+            symptom_variants.append({"type": stype, "description": "unknown_issue"})
+        else:
+            symptom_variants.append({"type": stype, "description": desc})
+
+    browsers = sorted(b for b in table._browsers if b != OTHER) + ["Netscape", None]
+    connections = sorted(c for c in table._connections if c != OTHER) + ["dialup", None]
+
+    groups = [[s] for s in symptom_variants]
+    if pairs:
+        groups += [[a, b] for a, b in itertools.product(symptom_variants, repeat=2)]
+
+    for group, br, ct in itertools.product(groups, browsers, connections):
+        sysinfo = {k: v for k, v in (("browser", br), ("connection_type", ct)) if v is not None}
+        yield {"symptoms": group, "system_info": sysinfo, "server_status": {"is_online": True}}
+    yield {"symptoms": [symptom_variants[-1]]}
+
+
+def verify(table, pairs=False):
+    """Compara tabla y motor Rete sobre todo el espacio de entradas; devuelve las diferencias."""
+    from .expert_system import EdTechExpertSystem
+
+    engine = EdTechExpertSystem()
+    mismatches = []
+    checked = 0
+    for case in _input_space(table, pairs=pairs):
+        expected = engine.diagnose(case)
+        got = table.diagnose(case)
+        checked += 1
+        if got != expected:
+            mismatches.append({"case": case, "rete": expected, "table": got})
+    return checked, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="compila las reglas y guarda el artefacto")
+    build.add_argument("--output", default=DEFAULT_PATH)
+    check = sub.add_parser("verify", help="compara la tabla con el motor Rete")
+    check.add_argument("--pairs", action="store_true", help="incluye todos los pares de síntomas")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        table = compile_table()
+        table.save(args.output)
+        print(f"{len(table.payload['cells'])} celdas, {len(table.payload['diagnoses'])} "
+              f"diagnósticos -> {args.output}")
+        return 0
+
+    checked, mismatches = verify(compile_table(), pairs=args.pairs)
+    for m in mismatches[:20]:
+        print(json.dumps(m, ensure_ascii=False))
+    print(f"{checked} casos verificados, {len(mismatches)} diferencias")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
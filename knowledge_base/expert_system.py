@@ -1,20 +1,63 @@
-from experta import KnowledgeEngine
+import functools
+import time
+from experta import NOT, KnowledgeEngine, watchers
+from experta.agenda import Agenda
 from .facts import Symptom, SystemInfo, ServerStatus, Diagnosis
-from .facts import LOGIN_SYMPTOMS, VIDEO_SYMPTOMS, CHAT_SYMPTOMS, CONTENT_SYMPTOMS
+from .vocabulary import SYMPTOMS
 import json
-from .rules import LoginRules, VideoRules, ChatRules, ContentRules
+from .rules import FAMILIES, load_family
+from .rule_index import IndexedReteMatcher, compile_rules
 
-class EdTechExpertSystem(KnowledgeEngine, LoginRules, VideoRules, ChatRules, ContentRules):
-    """Expert system for diagnosing issues in educational technology platforms."""
+def _lap(trace, phase, start):
+    now = time.perf_counter()
+    trace["phases"][phase] = trace["phases"].get(phase, 0.0) + (now - start)
+    return now
+
+
+class _TracedAgenda(Agenda):
+    """Agenda que registra las reglas disparadas y el tamaño máximo alcanzado."""
+
+    def __init__(self, trace, activations):
+        super().__init__()
+        self.activations = activations
+        self._trace = trace
+
+    def get_next(self):
+        if len(self.activations) > self._trace["agenda_size"]:
+            self._trace["agenda_size"] = len(self.activations)
+        activation = super().get_next()
+        if activation is not None:
+            self._trace["fired"].append(activation.rule.__name__)
+        return activation
+
+
+class DiagnosticEngine(KnowledgeEngine):
+    """
+    Expert system for diagnosing issues in educational technology platforms.
+
+    The rules come from the family mixins in ``knowledge_base.rules``; use
+    ``engine_class`` to get an engine with all of them (``EdTechExpertSystem``)
+    or only the families a request needs. Rules are compiled by
+    ``knowledge_base.rule_index`` and matched with an alpha-indexed Rete.
+    """
+
+    __matcher__ = IndexedReteMatcher
     
     def __init__(self):
         super().__init__()
         self.diagnosis_result = None
+        self._trace = None
 
     def _collect_diagnoses(self):
         return [f for f in self.facts.values() if isinstance(f, Diagnosis)]
 
-    def diagnose(self, symptoms_data):
+    def get_activations(self):
+        added, removed = super().get_activations()
+        if self._trace is not None:
+            self._trace["activated"].extend(a.rule.__name__ for a in added)
+        return added, removed
+
+    def diagnose(self, symptoms_data, trace=None):
         """
         Run the expert system with the provided symptoms.
         
@@ -25,11 +68,34 @@ class EdTechExpertSystem(KnowledgeEngine, LoginRules, VideoRules, ChatRules, Con
                     "system_info": {"browser": "Chrome", "browser_version": "90.0"},
                     "server_status": {"is_online": True}
                 }
+            trace (dict, optional): When given, timings per phase ("engine.reset",
+                "engine.declare", "engine.run", "engine.collect") are added to
+                trace["phases"], the rules activated and fired are appended to
+                trace["activated"] / trace["fired"] and the peak agenda size is
+                stored in trace["agenda_size"].
         
         Returns:
             dict: Diagnosis result with problem cause and solution
         """
+        if trace is None:
+            return self._diagnose(symptoms_data)
+
+        trace.setdefault("phases", {})
+        trace.setdefault("activated", [])
+        trace.setdefault("fired", [])
+        trace.setdefault("agenda_size", 0)
+        self._trace = trace
+        try:
+            return self._diagnose(symptoms_data, trace)
+        finally:
+            self._trace = None
+
+    def _diagnose(self, symptoms_data, trace=None):
+        start = time.perf_counter() if trace is not None else None
         self.reset()
+        if trace is not None:
+            self.agenda = _TracedAgenda(trace, self.agenda.activations)
+            start = _lap(trace, "engine.reset", start)
         
         for symptom in symptoms_data.get("symptoms", []):
             self.declare(Symptom(**symptom))
@@ -43,8 +109,12 @@ class EdTechExpertSystem(KnowledgeEngine, LoginRules, VideoRules, ChatRules, Con
             self.declare(ServerStatus(**symptoms_data["server_status"]))
         else:
             self.declare(ServerStatus())
+        if trace is not None:
+            start = _lap(trace, "engine.declare", start)
 
         self.run()
+        if trace is not None:
+            start = _lap(trace, "engine.run", start)
         diagnosis =  self._collect_diagnoses()
 
         results = [
@@ -56,16 +126,65 @@ class EdTechExpertSystem(KnowledgeEngine, LoginRules, VideoRules, ChatRules, Con
             }
             for d in diagnosis
         ]
+        if trace is not None:
+            _lap(trace, "engine.collect", start)
         return results
 
-    
+    def diagnose_steps(self, symptoms_data):
+        """
+        Like ``diagnose``, but a generator: yields ``(diagnosis, is_fallback)``
+        for each Diagnosis fact as soon as the rule that declares it fires.
+
+        ``is_fallback`` is True for diagnoses declared by fallback rules
+        (``NOT(Diagnosis(...))``); a later rule may still find a better
+        diagnosis of the same type. The diagnoses come out in the same order
+        as ``diagnose`` returns them.
+        """
+        self.reset()
+        for symptom in symptoms_data.get("symptoms", []):
+            self.declare(Symptom(**symptom))
+        self.declare(SystemInfo(**symptoms_data.get("system_info", {})))
+        self.declare(ServerStatus(**symptoms_data.get("server_status", {})))
+
+        last_id = max(self.facts)
+        for activation in self._fire_each():
+            new_ids = [i for i in self.facts if i > last_id]
+            if not new_ids:
+                continue
+            last_id = max(new_ids)
+            fallback = _is_fallback(activation.rule)
+            for fact_id in new_ids:
+                fact = self.facts[fact_id]
+                if isinstance(fact, Diagnosis):
+                    yield {
+                        "diagnosis": fact.get("problem_type"),
+                        "cause": fact.get("cause"),
+                        "solution": fact.get("solution"),
+                        "confidence": float(fact.get("confidence") or 0.0)
+                    }, fallback
+
+    def _fire_each(self):
+        """Same loop as ``run``, yielding control after each activation fires."""
+        self.running = True
+        try:
+            while self.running:
+                added, removed = self.get_activations()
+                self.strategy.update_agenda(self.agenda, added, removed)
+                activation = self.agenda.get_next()
+                if activation is None:
+                    return
+                watchers.RULES.info(
+                    "FIRE %s: %s", activation.rule.__name__,
+                    ", ".join(str(f) for f in activation.facts))
+                activation.rule(
+                    self,
+                    **{k: v for k, v in activation.context.items() if not k.startswith('__')})
+                yield activation
+        finally:
+            self.running = False
+
     def get_available_symptoms(self):
-        return {
-            "login": LOGIN_SYMPTOMS,
-            "video": VIDEO_SYMPTOMS,
-            "chat": CHAT_SYMPTOMS,
-            "content": CONTENT_SYMPTOMS
-        }
+        return dict(SYMPTOMS)
 
     def run_all(self):
         super().run_all()
@@ -81,3 +200,46 @@ class EdTechExpertSystem(KnowledgeEngine, LoginRules, VideoRules, ChatRules, Con
             }
         
         return self
+
+
+def _is_fallback(rule):
+    """True for rules that only fire while there is no Diagnosis of their type."""
+    return any(isinstance(ce, NOT) and any(isinstance(inner, Diagnosis) for inner in ce)
+               for ce in rule)
+
+
+@functools.lru_cache(maxsize=None)
+def _engine_class(families, compiled):
+    if families == tuple(FAMILIES):
+        name = "EdTechExpertSystem"
+    else:
+        name = "EdTechExpertSystem[%s]" % "+".join(families)
+    mixins = tuple(load_family(f) for f in families)
+    if not compiled:
+        # Reglas tal como están escritas y matcher Rete de experta (verificación)
+        from experta.matchers import ReteMatcher
+
+        return type(name, (DiagnosticEngine,) + mixins,
+                    {"__module__": __name__, "__matcher__": ReteMatcher})
+    return compile_rules(type(name, (DiagnosticEngine,) + mixins, {"__module__": __name__}))
+
+
+def engine_class(families=None, compiled=True):
+    """
+    Clase de motor con sólo las reglas de ``families`` (None: todas).
+
+    Las clases se arman la primera vez que se piden y se reutilizan; cada
+    familia se importa recién cuando algún motor la necesita. Con
+    ``compiled=False`` el motor usa las reglas sin compilar y el matcher
+    original (para comparar resultados).
+    """
+    if families is None:
+        families = FAMILIES
+    return _engine_class(tuple(f for f in FAMILIES if f in families), compiled)
+
+
+def __getattr__(name):
+    # El motor completo se arma (importando todas las familias) sólo si se usa
+    if name == "EdTechExpertSystem":
+        return engine_class()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
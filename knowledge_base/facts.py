@@ -1,5 +1,8 @@
 from experta import Fact, Field
 
+# Síntomas y causas predefinidos (en vocabulary.py, que no importa experta)
+from .vocabulary import CAUSES, CHAT_SYMPTOMS, CONTENT_SYMPTOMS, LOGIN_SYMPTOMS, VIDEO_SYMPTOMS  # noqa: F401
+
 class Symptom(Fact):
     """Representa un síntoma o problema reportado por el usuario."""
     type = Field(str, mandatory=True)  # Tipo de síntoma (login, video, chat, etc.)
@@ -28,61 +31,3 @@ class Diagnosis(Fact):
     cause = Field(str, mandatory=True)
     solution = Field(str, mandatory=True)
     confidence = Field(float, default=0.0)  # 0.0 a 1.0
-
-# Síntomas predefinidos que el sistema puede reconocer
-LOGIN_SYMPTOMS = [
-    "cannot_login",
-    "forgot_password",
-    "account_locked",
-    "invalid_credentials",
-    "registration_failed"
-]
-
-VIDEO_SYMPTOMS = [
-    "video_not_loading",
-    "video_buffering",
-    "video_quality_poor",
-    "audio_issues",
-    "playback_controls_not_working"
-]
-
-CHAT_SYMPTOMS = [
-    "messages_not_sending",
-    "cannot_see_messages",
-    "notification_issues",
-    "emoji_not_working",
-    "chat_lag"
-]
-
-CONTENT_SYMPTOMS = [
-    "content_not_loading",
-    "missing_files",
-    "broken_links",
-    "formatting_issues",
-    "access_denied_to_content"
-]
-
-# Causas categorizadas por origen
-CAUSES = {
-    "server": [
-        "server_down",
-        "maintenance_in_progress",
-        "database_issues",
-        "high_traffic",
-        "api_failure"
-    ],
-    "browser": [
-        "incompatible_browser",
-        "outdated_browser",
-        "cache_issues",
-        "cookie_problems",
-        "extension_conflict"
-    ],
-    "user": [
-        "incorrect_credentials",
-        "network_issues",
-        "device_limitations",
-        "permission_issues",
-        "user_error"
-    ]
-}
@@ -0,0 +1,298 @@
+"""
+Compilación de las reglas para el matcher Rete de experta.
+
+Las reglas se escriben como siempre, con ``MATCH`` + ``TEST``:
+
+    SystemInfo(browser=MATCH.br),
+    TEST(lambda br: br in ("Chrome", "Firefox", "Edge", "Safari")),
+
+En experta cada ``TEST`` es un nodo del lado beta: la lambda se llama para
+cada combinación de hechos que llega al join. ``compile_rules`` reescribe
+esos pares en una restricción del propio patrón, ``SystemInfo(browser=P(
+Membership(...), __bind__="br"))``, que se evalúa una sola vez por hecho en
+la red alfa y ya no genera tokens para valores que no pasan.
+
+``IndexedReteMatcher`` agrega sobre la red alfa un índice por atributo:
+cuando varios hijos de un nodo comparan el mismo campo contra literales o
+conjuntos (``browser == "IE"``, ``browser in {...}``, ``description ==
+...``), un diccionario valor -> hijos reemplaza la prueba secuencial de cada
+uno, y el hecho sólo visita los candidatos.
+
+Prueba diferencial contra las reglas sin compilar y el matcher original:
+    python -m knowledge_base.rule_index verify [--pairs]
+"""
+import argparse
+import dis
+import json
+import sys
+
+from experta import TEST
+from experta.fact import Fact
+from experta.fieldconstraint import L, P, W
+from experta.matchers.rete import ReteMatcher
+from experta.matchers.rete.abstract import OneInputNode
+from experta.matchers.rete.check import FeatureCheck
+from experta.matchers.rete.mixins import AnyChild, NoMemory
+from experta.matchers.rete.nodes import BusNode, FeatureTesterNode
+
+# Instrucciones que no cambian el significado de la lambda
+_NOISE = frozenset({"RESUME", "NOP", "CACHE", "COPY_FREE_VARS", "EXTENDED_ARG"})
+
+# Hijos que compiten por el mismo atributo a partir de los cuales conviene indexar
+MIN_INDEXED_CHILDREN = 2
+
+
+class Membership(frozenset):
+    """Predicado ``valor in {...}`` sobre un conjunto congelado (sin marco de Python por llamada)."""
+
+    __call__ = frozenset.__contains__
+
+    _instances = {}
+
+    @classmethod
+    def of(cls, values):
+        """Predicado compartido por todas las reglas con el mismo conjunto (un único nodo alfa)."""
+        values = frozenset(values)
+        predicate = cls._instances.get(values)
+        if predicate is None:
+            predicate = cls._instances.setdefault(values, cls(values))
+        return predicate
+
+    def __repr__(self):
+        return "Membership(%r)" % sorted(self, key=repr)
+
+
+def membership_values(test):
+    """
+    Valores de un ``TEST(lambda x: x in (...))``, o None si la función tiene
+    otra forma (esas quedan como ``TEST``).
+    """
+    code = getattr(test, "__code__", None)
+    if code is None or code.co_argcount != 1 or code.co_kwonlyargcount \
+            or code.co_flags & (0x04 | 0x08) or getattr(test, "__closure__", None):
+        return None
+    ops = [i for i in dis.get_instructions(test) if i.opname not in _NOISE]
+    if len(ops) != 4:
+        return None
+    load, const, contains, ret = ops
+    if not (load.opname.startswith("LOAD_FAST") and load.argval == code.co_varnames[0]):
+        return None
+    if const.opname != "LOAD_CONST" or not isinstance(const.argval, (tuple, frozenset)):
+        return None
+    # CONTAINS_OP 0 desde Python 3.9; antes COMPARE_OP "in"
+    if (contains.opname, contains.argval) not in (("CONTAINS_OP", 0), ("COMPARE_OP", "in")):
+        return None
+    if ret.opname != "RETURN_VALUE":
+        return None
+    try:
+        return frozenset(const.argval)
+    except TypeError:
+        return None
+
+
+def _bindings(ce, name):
+    """Lugares donde ``ce`` liga ``name``: ``[(patrón, campo)]`` (en cualquier nivel)."""
+    if isinstance(ce, Fact):
+        found = [(ce, field) for field, constraint in ce.items()
+                 if getattr(constraint, "__bind__", None) == name]
+        if ce.__bind__ == name:
+            found.append((ce, None))
+        return found
+    if isinstance(ce, TEST):
+        return []
+    found = []
+    for inner in ce:
+        found.extend(_bindings(inner, name))
+    return found
+
+
+def compile_rule(rule):
+    """
+    ``rule`` con cada ``MATCH.x`` + ``TEST(lambda x: x in (...))`` del primer
+    nivel convertido en ``P(Membership(...), __bind__="x")`` sobre el patrón
+    que liga ``x``. Devuelve la misma regla si no hay nada que reescribir.
+    """
+    conditions = list(rule)
+    changed = False
+    for i, ce in enumerate(conditions):
+        if not isinstance(ce, TEST) or len(ce) != 1:
+            continue
+        values = membership_values(ce[0])
+        if values is None:
+            continue
+        name = ce[0].__code__.co_varnames[0]
+        sites = _bindings(rule, name)
+        # Sólo si la variable se liga una vez, con MATCH, en un patrón del primer nivel
+        if len(sites) != 1:
+            continue
+        pattern, field = sites[0]
+        j = next((k for k, other in enumerate(conditions) if other is pattern), None)
+        if field is None or j is None or j > i or type(pattern[field]) is not W:
+            continue
+        compiled = pattern.copy()
+        if pattern.__bind__ is not None:
+            compiled.__bind__ = pattern.__bind__
+        compiled[field] = P(Membership.of(values), __bind__=name)
+        conditions[j] = compiled
+        conditions[i] = None
+        changed = True
+    if not changed:
+        return rule
+    return rule.new_conditions(*(ce for ce in conditions if ce is not None))
+
+
+def compile_rules(engine_cls):
+    """Reemplaza en ``engine_cls`` cada regla heredada por su versión compilada."""
+    from experta.rule import Rule
+
+    for name in dir(engine_cls):
+        rule = getattr(engine_cls, name)
+        if isinstance(rule, Rule):
+            compiled = compile_rule(rule)
+            if compiled is not rule:
+                setattr(engine_cls, name, compiled)
+    return engine_cls
+
+
+def _index_keys(node):
+    """``(campo, valores)`` que discrimina un nodo alfa, o None si no es indexable."""
+    if type(node) is not FeatureTesterNode or not isinstance(node.matcher, FeatureCheck):
+        return None
+    what, how = node.matcher.what, node.matcher.how
+    # Campos con accesos anidados ("a__b") o especiales quedan sin indexar
+    if not isinstance(what, str) or "__" in what:
+        return None
+    if type(how) is L:
+        try:
+            hash(how.value)
+        except TypeError:
+            return None
+        return what, (how.value,)
+    if type(how) is P and isinstance(how.match, Membership):
+        return what, tuple(how.match)
+    return None
+
+
+class AttributeIndexNode(AnyChild, NoMemory, OneInputNode):
+    """
+    Nodo alfa que reparte un hecho entre sus hijos según el valor de un campo.
+
+    Cada hijo sigue haciendo su propia prueba (y ligando variables); el índice
+    sólo evita activar los que no pueden pasar. El orden relativo de los
+    hijos se conserva, así que la agenda recibe las activaciones en el mismo
+    orden que sin índice.
+    """
+
+    def __init__(self, what):
+        self.what = what
+        self._index = {}
+        super().__init__()
+
+    def add_indexed(self, child, values):
+        self.add_child(child.node, child.callback)
+        for value in values:
+            self._index.setdefault(value, []).append(child.callback)
+
+    def _activate(self, token):
+        fact = next(iter(token.data))
+        try:
+            value = fact[self.what]
+            callbacks = self._index.get(value, ())
+        except (KeyError, TypeError):
+            return
+        for callback in callbacks:
+            callback(token)
+
+    def activate(self, token):
+        # Los hijos copian el token al activarse: no hace falta copiarlo acá
+        return self._activate(token)
+
+    def __str__(self):  # pragma: no cover
+        return "%s: %s" % (self.__class__.__name__, self.what)
+
+
+def index_alpha_network(node):
+    """Agrega índices por atributo en la red alfa que cuelga de ``node``; devuelve cuántos."""
+    created = 0
+    if not isinstance(node, (BusNode, FeatureTesterNode)):
+        return created
+    groups = {}
+    for child in node.children:
+        keys = _index_keys(child.node)
+        if keys is not None:
+            groups.setdefault(keys[0], []).append(child)
+    indexed = {}
+    for what, children in groups.items():
+        if len(children) < MIN_INDEXED_CHILDREN:
+            continue
+        # Sólo se agrupan hijos consecutivos: así el orden de activación no cambia
+        positions = [node.children.index(c) for c in children]
+        if positions != list(range(positions[0], positions[0] + len(positions))):
+            continue
+        index = AttributeIndexNode(what)
+        for child in children:
+            index.add_indexed(child, _index_keys(child.node)[1])
+        indexed[positions[0]] = (index, set(positions))
+    if indexed:
+        skip = set().union(*(positions for _, positions in indexed.values()))
+        rebuilt = []
+        for position, child in enumerate(node.children):
+            if position in indexed:
+                index = indexed[position][0]
+                rebuilt.append(type(child)(index, index.activate))
+            elif position not in skip:
+                rebuilt.append(child)
+        node.children[:] = rebuilt
+        created += len(indexed)
+    for child in list(node.children):
+        target = child.node
+        if isinstance(target, AttributeIndexNode):
+            for grandchild in target.children:
+                created += index_alpha_network(grandchild.node)
+        else:
+            created += index_alpha_network(target)
+    return created
+
+
+class IndexedReteMatcher(ReteMatcher):
+    """``ReteMatcher`` con índices por atributo en la red alfa."""
+
+    def build_network(self):
+        super().build_network()
+        self.indexes = index_alpha_network(self.root_node)
+
+
+def verify(pairs=False):
+    """Compara el motor compilado con el original sobre el espacio de entradas de la tabla de decisión."""
+    from .decision_table import _input_space, compile_table
+    from .expert_system import engine_class
+
+    original = engine_class(compiled=False)()
+    compiled = engine_class()()
+    mismatches = []
+    checked = 0
+    for case in _input_space(compile_table(type(original)), pairs=pairs):
+        expected = original.diagnose(case)
+        got = compiled.diagnose(case)
+        checked += 1
+        if got != expected:
+            mismatches.append({"case": case, "original": expected, "compiled": got})
+    return checked, mismatches
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("verify", help="compara el motor compilado con el original")
+    check.add_argument("--pairs", action="store_true", help="incluye todos los pares de síntomas")
+    args = parser.parse_args(argv)
+
+    checked, mismatches = verify(pairs=args.pairs)
+    for m in mismatches[:20]:
+        print(json.dumps(m, ensure_ascii=False))
+    print(f"{checked} casos verificados, {len(mismatches)} diferencias")
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,50 @@
-from .login_rules import LoginRules
-from .video_rules import VideoRules
-from .chat_rules import ChatRules
-from .content_rules import ContentRules
+import importlib
 
-_all_ = ["LoginRules", "VideoRules", "ChatRules", "ContentRules"]
\ No newline at end of file
+# Familia de reglas (Symptom.type) -> (módulo, mixin). Cada mixin sólo tiene
+# reglas sobre síntomas de su propio tipo, así que un motor armado con un
+# subconjunto de familias diagnostica igual que el completo para esos tipos.
+FAMILIES = {
+    "login": ("login_rules", "LoginRules"),
+    "video": ("video_rules", "VideoRules"),
+    "chat": ("chat_rules", "ChatRules"),
+    "content": ("content_rules", "ContentRules"),
+}
+
+
+def load_family(family):
+    """Importa (sólo la primera vez) y devuelve el mixin de reglas de ``family``."""
+    module, name = FAMILIES[family]
+    return getattr(importlib.import_module(f".{module}", __name__), name)
+
+
+def families_for(symptoms_data):
+    """
+    Familias de reglas que necesita un caso (según ``Symptom.type``).
+
+    Devuelve None si la entrada no tiene la forma esperada: en ese caso se usa
+    el motor completo para que los errores sean los mismos de siempre.
+    """
+    if not isinstance(symptoms_data, dict):
+        return None
+    symptoms = symptoms_data.get("symptoms", [])
+    if not isinstance(symptoms, list):
+        return None
+    families = set()
+    for symptom in symptoms:
+        if not isinstance(symptom, dict):
+            return None
+        family = symptom.get("type")
+        if isinstance(family, str) and family in FAMILIES:
+            families.add(family)
+    return frozenset(families)
+
+
+def __getattr__(name):
+    # Importación diferida: ``from knowledge_base.rules import LoginRules`` sigue funcionando
+    for family, (_, mixin) in FAMILIES.items():
+        if mixin == name:
+            return load_family(family)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+_all_ = ["LoginRules", "VideoRules", "ChatRules", "ContentRules"]
@@ -0,0 +1,180 @@
+"""
+Diagnóstico incremental sobre una memoria de trabajo que se conserva entre llamadas.
+
+``diagnose`` hace ``reset()`` y vuelve a declarar todos los hechos en cada
+llamada. ``IncrementalDiagnosis`` mantiene el motor con los hechos del caso:
+al cambiar el caso sólo se declaran o retractan los ``Symptom`` /
+``SystemInfo`` / ``ServerStatus`` que cambiaron, la red Rete actualiza el
+conjunto de activaciones de forma incremental y sólo se ejecuta el lado
+derecho de las activaciones nuevas.
+
+Los ``Diagnosis`` no se declaran en el motor: el orden en que experta
+dispara las reglas (y con él qué fallbacks ``NOT(Diagnosis(...))`` quedan)
+depende de los IDs de los hechos, que en una sesión no son los de un
+diagnóstico desde cero. La agenda se resuelve con ``resolve_agenda`` usando
+los IDs que tendrían los hechos en ``diagnose(caso)``, así que el resultado
+es siempre el mismo que el de un diagnóstico completo del caso actual.
+"""
+import json
+
+from .decision_table import CompileError, _CompiledRule, resolve_agenda
+from .facts import ServerStatus, Symptom, SystemInfo
+
+
+def symptom_key(symptom):
+    """Identidad de un síntoma dentro de un caso (dos síntomas iguales son un solo hecho)."""
+    return json.dumps(symptom, sort_keys=True, ensure_ascii=False)
+
+
+def open_session(engine):
+    """
+    ``IncrementalDiagnosis`` sobre ``engine`` o, si alguna regla tiene una
+    forma que no sabe resolver fuera del motor, ``FullDiagnosis``.
+    """
+    try:
+        return IncrementalDiagnosis(engine)
+    except CompileError:
+        return FullDiagnosis(engine)
+
+
+class IncrementalDiagnosis:
+    """
+    Caso en curso sobre un motor dedicado (un ``DiagnosticEngine`` que no se
+    comparte mientras dure la sesión).
+
+        session = IncrementalDiagnosis(EdTechExpertSystem())
+        session.update({"symptoms": [...], "system_info": {...}})
+        session.update({"symptoms": [..., otro], "system_info": {...}})
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._rules = {rule.__name__: _CompiledRule(rule) for rule in engine.get_rules()}
+        engine.reset()
+        # Hechos declarados: síntomas en el orden del caso, SystemInfo y ServerStatus
+        self._symptoms = {}
+        self._order = []
+        self._system_info = None
+        self._server_status = None
+        self._system_info_data = None
+        self._server_status_data = None
+        # Lado derecho ya ejecutado por activación: {clave: diagnóstico}
+        self._fired = {}
+        self.declared = 0
+        self.retracted = 0
+
+    @property
+    def facts(self):
+        """Hechos del caso en la memoria de trabajo (sin InitialFact)."""
+        return len(self._order) + 2
+
+    def update(self, case):
+        """
+        Lleva la memoria de trabajo al caso ``case`` (misma forma que la
+        entrada de ``diagnose``) declarando y retractando sólo las diferencias.
+        Devuelve los diagnósticos, iguales a ``engine.diagnose(case)``.
+        """
+        symptoms = {}
+        order = []
+        for symptom in case.get("symptoms", []):
+            key = symptom_key(symptom)
+            if key not in symptoms:
+                symptoms[key] = symptom
+                order.append(key)
+        system_info = case.get("system_info", {})
+        server_status = case.get("server_status", {})
+
+        # Primero se construyen (y validan) los hechos nuevos: un caso inválido no modifica la sesión
+        added = {key: Symptom(**symptoms[key]) for key in order if key not in self._symptoms}
+        new_system_info = SystemInfo(**system_info) if system_info != self._system_info_data else None
+        new_server_status = ServerStatus(**server_status) if server_status != self._server_status_data else None
+        for fact in (*added.values(), new_system_info, new_server_status):
+            if fact is not None:
+                fact.validate()
+
+        for key in [k for k in self._order if k not in symptoms]:
+            self._retract(self._symptoms.pop(key))
+        for key, fact in added.items():
+            self._symptoms[key] = self._declare(fact)
+        if new_system_info is not None:
+            if self._system_info is not None:
+                self._retract(self._system_info)
+            self._system_info = self._declare(new_system_info)
+            self._system_info_data = dict(system_info)
+        if new_server_status is not None:
+            if self._server_status is not None:
+                self._retract(self._server_status)
+            self._server_status = self._declare(new_server_status)
+            self._server_status_data = dict(server_status)
+        self._order = order
+        return self.diagnoses()
+
+    def _declare(self, fact):
+        self.declared += 1
+        return self.engine.declare(fact)
+
+    def _retract(self, fact):
+        self.retracted += 1
+        self.engine.retract(fact)
+
+    def _canonical_ids(self):
+        """ID que tendría cada hecho declarado en ``diagnose(caso)``: {id en el motor: id canónico}."""
+        ids = {}
+        for position, key in enumerate(self._order, start=1):
+            ids[self._symptoms[key]["__factid__"]] = position
+        count = len(self._order)
+        if self._system_info is not None:
+            ids[self._system_info["__factid__"]] = count + 1
+        if self._server_status is not None:
+            ids[self._server_status["__factid__"]] = count + 2
+        return ids
+
+    def diagnoses(self):
+        """Diagnósticos del caso actual, en el mismo orden que ``diagnose``."""
+        ids = self._canonical_ids()
+        fired = {}
+        agenda = []
+        for activation in self.engine.agenda.activations:
+            facts = frozenset(f["__factid__"] for f in activation.facts)
+            bindings = {k: v for k, v in activation.context.items()
+                        if isinstance(k, str) and not k.startswith("__")}
+            key = (activation.rule.__name__, facts, frozenset(bindings.items()))
+            result = self._fired.get(key)
+            if result is None:
+                # Activación nueva: ejecutar el lado derecho una sola vez
+                result = self._rules[activation.rule.__name__].fire(bindings)
+            fired[key] = result
+            rule = self._rules[activation.rule.__name__]
+            agenda.append((
+                tuple(sorted((ids.get(f, 0) for f in facts), reverse=True)),
+                int(rule.fallback_for is not None),
+                tuple(result.items()),
+            ))
+        # Las activaciones que ya no existen se olvidan
+        self._fired = fired
+        return [dict(d) for d in resolve_agenda(agenda, lambda d: dict(d)["diagnosis"])]
+
+
+class FullDiagnosis:
+    """Misma interfaz que ``IncrementalDiagnosis``, rediagnosticando el caso completo en cada cambio."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._diagnoses = []
+        self._facts = 0
+        self.declared = 0
+        self.retracted = 0
+
+    @property
+    def facts(self):
+        return self._facts
+
+    def update(self, case):
+        self._diagnoses = self.engine.diagnose(case)
+        self.retracted += self._facts
+        self._facts = len({symptom_key(s) for s in case.get("symptoms", [])}) + 2
+        self.declared += self._facts
+        return self.diagnoses()
+
+    def diagnoses(self):
+        return [dict(d) for d in self._diagnoses]
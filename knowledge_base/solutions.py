@@ -0,0 +1,88 @@
+import ast
+import glob
+import hashlib
+import os
+import sys
+import threading
+
+# Largo del ID de una solución (prefijo hexadecimal del sha1 del texto)
+ID_LENGTH = 8
+
+
+def solution_id(text):
+    """
+    ID corto y estable de un texto de solución.
+
+    Se deriva del propio texto, así que todos los procesos (workers, CLI,
+    reinicios) asignan el mismo ID sin coordinarse.
+    """
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:ID_LENGTH]
+
+
+class SolutionTable:
+    """
+    Tabla de textos de solución internados por ID.
+
+    Cada regla emite uno de unas pocas decenas de textos fijos: el historial y
+    las respuestas guardan el ID y el texto se mantiene una sola vez en memoria.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._texts = {}
+
+    def intern(self, text):
+        """Registra ``text`` (si hace falta) y devuelve su ID."""
+        sid = solution_id(text)
+        current = self._texts.get(sid)
+        if current is None:
+            with self._lock:
+                current = self._texts.setdefault(sid, sys.intern(text))
+        if current != text:
+            raise ValueError(f"Colisión de IDs de solución: {sid}")
+        return sid
+
+    def add(self, sid, text):
+        """Incorpora un par ya persistido (por ejemplo, la tabla de un historial)."""
+        with self._lock:
+            self._texts.setdefault(sid, sys.intern(text))
+
+    def text(self, sid):
+        return self._texts.get(sid)
+
+    def items(self):
+        with self._lock:
+            return dict(self._texts)
+
+    def __contains__(self, sid):
+        return sid in self._texts
+
+    def __len__(self):
+        return len(self._texts)
+
+
+solutions = SolutionTable()
+
+
+def rule_solutions(rules_dir=None):
+    """
+    Textos de solución que declaran las reglas, en el orden en que aparecen.
+
+    Se leen del código fuente (argumento ``solution=`` de cada ``Diagnosis``)
+    sin importar experta ni las reglas.
+    """
+    if rules_dir is None:
+        rules_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "rules")
+    texts = []
+    for path in sorted(glob.glob(os.path.join(rules_dir, "*.py"))):
+        with open(path, "r", encoding="utf-8") as f:
+            tree = ast.parse(f.read(), filename=path)
+        for node in ast.walk(tree):
+            if not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)
+                    and node.func.id == "Diagnosis"):
+                continue
+            for keyword in node.keywords:
+                if keyword.arg == "solution" and isinstance(keyword.value, ast.Constant) \
+                        and isinstance(keyword.value.value, str) and keyword.value.value not in texts:
+                    texts.append(keyword.value.value)
+    return texts
@@ -0,0 +1,72 @@
+"""
+Síntomas y causas que reconoce la base de conocimiento.
+
+Se definen aparte de ``facts.py`` (que importa experta) para que el catálogo
+de la API pueda armarse sin importar experta ni construir un motor.
+"""
+
+# Síntomas predefinidos que el sistema puede reconocer
+LOGIN_SYMPTOMS = [
+    "cannot_login",
+    "forgot_password",
+    "account_locked",
+    "invalid_credentials",
+    "registration_failed"
+]
+
+VIDEO_SYMPTOMS = [
+    "video_not_loading",
+    "video_buffering",
+    "video_quality_poor",
+    "audio_issues",
+    "playback_controls_not_working"
+]
+
+CHAT_SYMPTOMS = [
+    "messages_not_sending",
+    "cannot_see_messages",
+    "notification_issues",
+    "emoji_not_working",
+    "chat_lag"
+]
+
+CONTENT_SYMPTOMS = [
+    "content_not_loading",
+    "missing_files",
+    "broken_links",
+    "formatting_issues",
+    "access_denied_to_content"
+]
+
+# Causas categorizadas por origen
+CAUSES = {
+    "server": [
+        "server_down",
+        "maintenance_in_progress",
+        "database_issues",
+        "high_traffic",
+        "api_failure"
+    ],
+    "browser": [
+        "incompatible_browser",
+        "outdated_browser",
+        "cache_issues",
+        "cookie_problems",
+        "extension_conflict"
+    ],
+    "user": [
+        "incorrect_credentials",
+        "network_issues",
+        "device_limitations",
+        "permission_issues",
+        "user_error"
+    ]
+}
+
+# Síntomas por tipo de problema (Symptom.type)
+SYMPTOMS = {
+    "login": LOGIN_SYMPTOMS,
+    "video": VIDEO_SYMPTOMS,
+    "chat": CHAT_SYMPTOMS,
+    "content": CONTENT_SYMPTOMS
+}
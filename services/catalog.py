@@ -0,0 +1,75 @@
+"""
+Catálogo de la base de conocimiento: síntomas, causas y textos de solución por ID.
+
+No cambia mientras no cambien las reglas, así que se arma una sola vez por
+proceso y se sirve con un ETag fuerte (hash del contenido). ``/api/catalog``
+se revalida cada ``CATALOG_MAX_AGE`` segundos; la URL con versión
+``/api/catalog/<versión>`` es inmutable y se cachea por un año.
+"""
+import hashlib
+import json
+import threading
+
+from knowledge_base.solutions import rule_solutions, solutions
+from knowledge_base.vocabulary import CAUSES, SYMPTOMS
+
+CATALOG_MAX_AGE = 300
+VERSIONED_MAX_AGE = 365 * 24 * 3600
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def _dumps(value):
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+class Catalog:
+    def __init__(self, symptoms, causes, texts):
+        self.solutions = {solutions.intern(text): text for text in texts}
+        data = {"symptoms": symptoms, "causes": causes, "solutions": self.solutions}
+        self.version = hashlib.sha1(_dumps(data).encode("utf-8")).hexdigest()[:16]
+        self.symptoms = symptoms
+        self.body = _dumps(dict(data, version=self.version)).encode("utf-8")
+
+
+def catalog():
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                # Sólo vocabulario y código fuente de las reglas: no importa experta ni arma un motor
+                _catalog = Catalog(dict(SYMPTOMS), CAUSES, rule_solutions())
+    return _catalog
+
+
+def _reference(diagnosis, known):
+    if diagnosis is None or not isinstance(diagnosis.get("solution"), str):
+        return diagnosis
+    sid = solutions.intern(diagnosis["solution"])
+    if sid not in known:
+        # Un texto fuera del catálogo se sigue enviando completo
+        return diagnosis
+    return {
+        "diagnosis": diagnosis["diagnosis"],
+        "cause": diagnosis["cause"],
+        "solution_id": sid,
+        "confidence": diagnosis["confidence"],
+    }
+
+
+def reference_solutions(result):
+    """
+    ``result`` de ``DiagnosisService.run`` / ``run_ranked`` con ``solution_id``
+    en lugar del texto de cada solución que figura en el catálogo.
+    """
+    known = catalog().solutions
+    if result is not None and "best" in result:
+        return {
+            "best": _reference(result["best"], known),
+            "diagnoses": {
+                problem_type: [_reference(d, known) for d in ranked]
+                for problem_type, ranked in result["diagnoses"].items()
+            },
+        }
+    return _reference(result, known)
@@ -1,24 +1,525 @@
-from knowledge_base.expert_system import EdTechExpertSystem
+import heapq
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+from knowledge_base.decision_table import DEFAULT_PATH as _DEFAULT_TABLE_PATH
+from knowledge_base.decision_table import load_or_compile, rules_fingerprint
+from knowledge_base.rules import families_for
+from services import metrics
+from services.diagnosis_sessions import DiagnosisSessions
+from services.engine_pool import EnginePool
 from services.history_service import HistoryService
+from services.process_executor import ProcessDiagnosisExecutor
+from services.result_cache import MISS, ResultCache, canonical_key
+
+logger = logging.getLogger(__name__)
+
+# Cantidad máxima de motores compilados que se mantienen vivos a la vez, por
+# combinación de familias de reglas
+_POOL_SIZE = int(os.environ.get("ENGINE_POOL_SIZE", "4"))
+
+# "rete": motor experta; "table": tabla de decisión precompilada (con el
+# motor como respaldo para entradas que la tabla no cubre)
+_MODE = os.environ.get("DIAGNOSIS_MODE", "rete")
+_TABLE_PATH = os.environ.get("DECISION_TABLE_PATH", _DEFAULT_TABLE_PATH)
+
+# Procesos worker para la inferencia (0: se ejecuta en el proceso del servidor)
+# y tiempo máximo de espera por diagnóstico antes de resolverlo en el proceso
+_WORKERS = int(os.environ.get("DIAGNOSIS_WORKERS", "0"))
+_WORKER_TIMEOUT = float(os.environ.get("DIAGNOSIS_TIMEOUT", "10"))
+
+# Caché de resultados: cantidad de casos distintos (0 la desactiva) y vigencia en segundos
+_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", "1024"))
+_CACHE_TTL = float(os.environ.get("RESULT_CACHE_TTL", "3600"))
+
+# Sesiones de diagnóstico incremental: cantidad máxima de sesiones vivas (cada
+# una conserva su propio motor), segundos de inactividad hasta que vencen y
+# síntomas por sesión
+_SESSIONS_MAX = int(os.environ.get("DIAGNOSIS_SESSIONS_MAX", "256"))
+_SESSION_TTL = float(os.environ.get("DIAGNOSIS_SESSION_TTL", "900"))
+_SESSION_MAX_SYMPTOMS = int(os.environ.get("DIAGNOSIS_SESSION_MAX_SYMPTOMS", "50"))
+
+# Registros de historial acumulados por lote antes de cada escritura agrupada
+_BATCH_FLUSH_SIZE = 1000
+
+# Un pool por combinación de familias (login, video, ...): cada caso usa un
+# motor con sólo las reglas de los tipos de síntoma que reporta
+_pools = {}
+_pools_lock = threading.Lock()
+_executor = ProcessDiagnosisExecutor(_WORKERS, _WORKER_TIMEOUT) if _WORKERS > 0 else None
+# Huella de las reglas con las que arranca el proceso: las reglas ya importadas
+# no se recargan, así que un cambio en disco no altera lo que se sirve
+_RULES_VERSION = rules_fingerprint()
+_cache = ResultCache(_CACHE_SIZE, _CACHE_TTL, version=_RULES_VERSION)
+_table = None
+_sessions = None
+_table_lock = threading.Lock()
+
+
+def _decision_table():
+    global _table
+    if _table is None:
+        with _table_lock:
+            if _table is None:
+                _table = load_or_compile(_TABLE_PATH)
+    return _table
+
+
+def _pool_for(families):
+    pool = _pools.get(families)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(families)
+            if pool is None:
+                # experta se importa recién cuando hace falta el primer motor
+                from knowledge_base.expert_system import engine_class
+
+                pool = _pools[families] = EnginePool(engine_class(families), size=_POOL_SIZE)
+    return pool
+
+
+def _session_engine():
+    # Una sesión puede sumar síntomas de cualquier tipo: motor con todas las familias
+    from knowledge_base.expert_system import engine_class
+
+    return engine_class()()
+
+
+def _diagnosis_sessions():
+    global _sessions
+    if _sessions is None:
+        with _pools_lock:
+            if _sessions is None:
+                _sessions = DiagnosisSessions(_session_engine, max_sessions=_SESSIONS_MAX,
+                                              idle_timeout=_SESSION_TTL,
+                                              max_symptoms=_SESSION_MAX_SYMPTOMS)
+    return _sessions
+
+
+def _best(diagnosis):
+    return max(diagnosis, key=lambda d: d["confidence"], default=None)
+
+
+# Fin de los eventos de ``_stream_inference``
+_STREAM_END = object()
+
+
+def _stream_inference(data, persist, put):
+    """
+    Inferencia de ``DiagnosisService.stream`` en un hilo propio: entrega cada
+    evento con ``put`` en cuanto su regla se dispara, o la excepción si la
+    inferencia falla, y termina con ``_STREAM_END``. El motor vuelve al pool
+    al terminar la inferencia, sin esperar a que el cliente lea los eventos.
+    """
+    best_diagnosis = None
+    try:
+        diagnosis = []
+        held = []
+        types_seen = set()
+        with _pool_for(families_for(data)).checkout() as engine:
+            for d, is_fallback in engine.diagnose_steps(data):
+                diagnosis.append(d)
+                if is_fallback:
+                    held.append(d)
+                    continue
+                types_seen.add(d["diagnosis"])
+                put(("diagnosis", d))
+        for d in held:
+            if d["diagnosis"] not in types_seen:
+                put(("diagnosis", d))
+        best_diagnosis = _best(diagnosis)
+        put(("best", best_diagnosis))
+    except Exception as e:
+        put(e)
+    finally:
+        # Se guarda aunque el cliente ya se haya desconectado
+        if persist and best_diagnosis is not None:
+            try:
+                HistoryService.append(best_diagnosis, case=data)
+            except Exception:
+                logger.exception("No se pudo guardar el diagnóstico en el historial")
+        put(_STREAM_END)
+
+
+def _confidence(d):
+    return d["confidence"]
+
+
+def _ranked(diagnosis, top_k):
+    """
+    Los ``top_k`` diagnósticos de mayor confianza de cada tipo de problema,
+    sin repetir (tipo, causa): de cada par queda el de mayor confianza.
+
+    Cada tipo se reduce con un heap acotado a ``top_k`` (``heapq.nlargest``)
+    en lugar de ordenar todos los hechos; ante empates se conserva el orden
+    en que los generó el motor, igual que ``_best``.
+    """
+    unique = {}
+    for d in diagnosis:
+        key = (d["diagnosis"], d["cause"])
+        current = unique.get(key)
+        if current is None or d["confidence"] > current["confidence"]:
+            unique[key] = d
+
+    by_type = {}
+    for (problem_type, _), d in unique.items():
+        by_type.setdefault(problem_type, []).append(d)
+    return {
+        "best": _best(diagnosis),
+        "diagnoses": {
+            problem_type: heapq.nlargest(top_k, candidates, key=_confidence)
+            for problem_type, candidates in by_type.items()
+        },
+    }
+
+
+def _cached_best(data, run_engine, trace=None, top_k=None):
+    """
+    Mejor diagnóstico de ``data``: tabla de decisión (en modo "table"), caché
+    de resultados y, si ninguna responde, ``run_engine(data, trace)``.
+
+    Con ``top_k`` devuelve en cambio el resultado de ``_ranked`` armado con
+    los mismos diagnósticos (una sola pasada del motor).
+    """
+    reduce = _best if top_k is None else lambda diagnosis: _ranked(diagnosis, top_k)
+    start = time.perf_counter() if trace is not None else None
+    if _MODE == "table":
+        # La tabla responde más rápido que la clave de caché y sin importar experta
+        diagnosis = _decision_table().diagnose(data)
+        if trace is not None:
+            start = metrics.lap(trace, "table", start)
+        if diagnosis is not None:
+            if trace is not None:
+                trace["source"] = "table"
+            return reduce(diagnosis)
+
+    key = canonical_key(data) if _cache.enabled else None
+    if key is not None and top_k is not None:
+        key = ("ranked", top_k, key)
+    if key is not None:
+        best_diagnosis = _cache.get(key)
+        if trace is not None:
+            start = metrics.lap(trace, "cache", start)
+        if best_diagnosis is not MISS:
+            if trace is not None:
+                trace["source"] = "cache"
+            return best_diagnosis
+
+    diagnosis = run_engine(data, trace)
+    if trace is not None:
+        metrics.lap(trace, "engine", start)
+        trace["source"] = "engine"
+    best_diagnosis = reduce(diagnosis)
+
+    if key is not None:
+        _cache.put(key, best_diagnosis)
+    return best_diagnosis
+
+
+def _run_in_process(data, trace=None):
+    start = time.perf_counter() if trace is not None else None
+    with _pool_for(families_for(data)).checkout() as engine:
+        if trace is not None:
+            # Espera por un motor libre o construcción de la red Rete
+            metrics.lap(trace, "engine.acquire", start)
+        return engine.diagnose(data, trace=trace)
+
+
+def _run_pooled(data, trace=None):
+    if _executor is not None:
+        # Las fases internas del motor sólo se miden cuando corre en este proceso
+        return _executor.diagnose(data, fallback=lambda d: _run_in_process(d, trace))
+    return _run_in_process(data, trace)
+
+
+def _record(trace, started):
+    """Cierra la traza de un diagnóstico y la incorpora a las métricas."""
+    trace["phases"]["total"] = time.perf_counter() - started
+    if metrics.ENABLED:
+        metrics.registry.record(trace)
+
+
+class DiagnosisBatch:
+    """
+    Diagnóstico de muchos casos reutilizando motores y con escrituras agrupadas.
+
+    Para cada combinación de familias de reglas se toma un motor del pool la
+    primera vez que un caso lo necesita y se devuelve al salir del bloque
+    ``with``; el historial se escribe cada ``_BATCH_FLUSH_SIZE`` casos y al
+    terminar.
+    """
+
+    def __init__(self, persist: bool = True):
+        self.persist = persist
+        self._engines = {}
+        self._pending = []
+
+    def _run_engine(self, data, trace=None):
+        if _executor is not None:
+            return _executor.diagnose(data, fallback=lambda d: self._run_local(d, trace))
+        return self._run_local(data, trace)
+
+    def _run_local(self, data, trace=None):
+        families = families_for(data)
+        engine = self._engines.get(families)
+        if engine is None:
+            engine = self._engines[families] = _pool_for(families).acquire()
+        try:
+            return engine.diagnose(data, trace=trace)
+        except BaseException:
+            del self._engines[families]
+            _pool_for(families).discard(engine)
+            raise
+
+    def run(self, data):
+        trace = metrics.new_trace() if metrics.ENABLED else None
+        started = time.perf_counter() if trace is not None else None
+        best_diagnosis = _cached_best(data, self._run_engine, trace)
+
+        if self.persist:
+            self._pending.append((best_diagnosis, data))
+            if len(self._pending) >= _BATCH_FLUSH_SIZE:
+                self.flush()
+        if trace is not None:
+            _record(trace, started)
+        return best_diagnosis
+
+    def flush(self):
+        pending, self._pending = self._pending, []
+        HistoryService.append_many([entry for entry, _ in pending], [case for _, case in pending])
+
+    def close(self):
+        try:
+            self.flush()
+        finally:
+            engines, self._engines = self._engines, {}
+            for families, engine in engines.items():
+                _pool_for(families).release(engine)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
 
 
 class DiagnosisService:
     @staticmethod
-    def run(data, persist: bool = True):
-        engine = EdTechExpertSystem()
+    def run(data, persist: bool = True, trace=None):
+        """
+        Diagnostica ``data`` y devuelve el diagnóstico de mayor confianza.
 
-        diagnosis = engine.diagnose(data)
-        best_diagnosis = max(diagnosis, key=lambda d: d["confidence"], default=None)
+        ``trace`` (de ``metrics.new_trace()``) recibe los tiempos por fase, las
+        reglas activadas/disparadas y el tamaño de la agenda; con
+        DIAGNOSIS_METRICS=1 se crea una traza aunque no se pase ninguna.
+        """
+        if trace is None and metrics.ENABLED:
+            trace = metrics.new_trace()
+        started = time.perf_counter() if trace is not None else None
+        best_diagnosis = _cached_best(data, _run_pooled, trace)
 
         if persist:
-            HistoryService.append(best_diagnosis)
+            history_start = time.perf_counter() if trace is not None else None
+            HistoryService.append(best_diagnosis, case=data)
+            if trace is not None:
+                metrics.lap(trace, "history", history_start)
+        if trace is not None:
+            _record(trace, started)
         return best_diagnosis
 
     @staticmethod
-    def list_symptoms():
-        engine = EdTechExpertSystem()
-        return {"symptoms": engine.get_available_symptoms()}
+    def run_ranked(data, top_k, persist: bool = True, trace=None):
+        """
+        Como ``run``, pero devuelve los ``top_k`` diagnósticos de cada tipo de
+        problema reportado, sin repetir (tipo, causa), de la misma inferencia:
+
+            {
+                "best": {"diagnosis": "login", "cause": "browser", ...},
+                "diagnoses": {"login": [{...}, ...], "video": [{...}]}
+            }
+
+        ``best`` es el mismo diagnóstico que devolvería ``run`` y es el que se
+        guarda en el historial.
+        """
+        if trace is None and metrics.ENABLED:
+            trace = metrics.new_trace()
+        started = time.perf_counter() if trace is not None else None
+        result = _cached_best(data, _run_pooled, trace, top_k=top_k)
+
+        if persist:
+            history_start = time.perf_counter() if trace is not None else None
+            HistoryService.append(result["best"], case=data)
+            if trace is not None:
+                metrics.lap(trace, "history", history_start)
+        if trace is not None:
+            _record(trace, started)
+        return result
+
+    @staticmethod
+    def stream(data, persist: bool = True):
+        """
+        Diagnostica ``data`` y devuelve sus eventos (generador de
+        ``(nombre, datos)``):
+
+            ("diagnosis", {"diagnosis": "login", "cause": "browser", ...})
+            ...
+            ("best", {...})
+
+        Cada diagnóstico sale en cuanto su regla lo declara. Los de las
+        reglas de respaldo (``NOT(Diagnosis(...))``) se retienen hasta el
+        final y sólo se envían si ninguna otra regla diagnosticó su tipo.
+        ``best`` es el mismo resultado que ``run``. Siempre usa el motor (sin
+        caché ni tabla de decisión) en este proceso.
+
+        La inferencia corre en un hilo propio que deja los eventos en una
+        cola: el motor vuelve al pool cuando termina la inferencia, aunque el
+        cliente todavía no haya leído los eventos, y ``best`` se guarda en el
+        historial al terminar aunque el cliente se haya desconectado.
+        """
+        events = queue.SimpleQueue()
+        threading.Thread(target=_stream_inference, args=(data, persist, events.put),
+                         name="diagnosis-stream", daemon=True).start()
+        while True:
+            event = events.get()
+            if event is _STREAM_END:
+                return
+            if isinstance(event, Exception):
+                raise event
+            yield event
+
+    @staticmethod
+    def start_session(data, top_k=None, persist: bool = True):
+        """
+        Abre una sesión de diagnóstico incremental con el caso ``data`` y
+        devuelve ``(session_id, resultado)``; el resultado tiene la misma
+        forma que el de ``run`` (o ``run_ranked`` con ``top_k``).
+
+        Lanza ``InvalidSessionChange`` si el caso supera los síntomas
+        permitidos por sesión.
+        """
+        session_id, diagnosis = _diagnosis_sessions().create(data)
+        return session_id, DiagnosisService._session_result(diagnosis, data, top_k, persist)
+
+    @staticmethod
+    def update_session(session_id, changes, top_k=None, persist: bool = True):
+        """
+        Aplica ``changes`` (síntomas a agregar/retractar, campos de
+        SystemInfo/ServerStatus) a la sesión y devuelve ``(caso, resultado)``
+        rediagnosticando sólo lo afectado por el cambio. El resultado es el
+        mismo que el de ``run`` sobre el caso nuevo.
+
+        Lanza ``SessionNotFound`` o ``InvalidSessionChange``.
+        """
+        case, diagnosis = _diagnosis_sessions().update(session_id, changes)
+        return case, DiagnosisService._session_result(diagnosis, case, top_k, persist)
+
+    @staticmethod
+    def get_session(session_id, top_k=None):
+        """``(caso, resultado)`` actuales de la sesión (sin guardar en el historial)."""
+        case, diagnosis = _diagnosis_sessions().get(session_id)
+        return case, DiagnosisService._session_result(diagnosis, case, top_k, persist=False)
+
+    @staticmethod
+    def end_session(session_id):
+        """Cierra la sesión; False si no existía o ya había vencido."""
+        return _diagnosis_sessions().delete(session_id)
+
+    @staticmethod
+    def _session_result(diagnosis, case, top_k, persist):
+        result = _best(diagnosis) if top_k is None else _ranked(diagnosis, top_k)
+        if persist:
+            HistoryService.append(result if top_k is None else result["best"], case=case)
+        return result
+
+    @staticmethod
+    def session_stats():
+        """Sesiones activas, creadas, cerradas, vencidas y desalojadas, y hechos declarados/retractados."""
+        return _diagnosis_sessions().stats()
+
+    @staticmethod
+    def warm_up():
+        """
+        Prepara el modo configurado antes de la primera petición.
+
+        En modo "table" carga el artefacto precompilado; experta sólo se
+        importa si hay que recompilarlo (ausente o desactualizado respecto de
+        las reglas). Devuelve un resumen para el log de arranque.
+        """
+        start = time.perf_counter()
+        report = {"mode": _MODE}
+        if _MODE == "table":
+            table = _decision_table()
+            report["table"] = "recompilada" if table.recompiled else "artefacto"
+        report["warm_up_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        report["experta"] = "experta" in sys.modules
+        return report
+
+    @staticmethod
+    def describe_startup(report):
+        """Texto de una línea con el resultado de ``warm_up`` para el log."""
+        parts = [f"modo={report['mode']}"]
+        if "table" in report:
+            parts.append(f"tabla={report['table']}")
+        parts.append(f"experta importado={'sí' if report['experta'] else 'no'}")
+        return ", ".join(parts)
+
+    @staticmethod
+    def batch(persist: bool = True):
+        """
+        Contexto para diagnosticar varios casos seguidos:
+
+            with DiagnosisService.batch() as batch:
+                results = [batch.run(case) for case in cases]
+        """
+        return DiagnosisBatch(persist)
+
+    @staticmethod
+    def pool_stats():
+        """Totales de todos los pools de motores (uno por combinación de familias)."""
+        with _pools_lock:
+            pools = list(_pools.values())
+        totals = {"pools": len(pools), "size": _POOL_SIZE, "created": 0, "idle": 0, "discarded": 0}
+        for pool in pools:
+            stats = pool.stats()
+            for name in ("created", "idle", "discarded"):
+                totals[name] += stats[name]
+        return totals
+
+    @staticmethod
+    def cache_stats():
+        """Aciertos, fallos y desalojos de la caché de resultados."""
+        return _cache.stats()
+
+    @staticmethod
+    def metrics_text():
+        """Métricas en formato de texto de Prometheus (pool, caché y, si está activa, instrumentación)."""
+        gauges = {}
+        for name, value in DiagnosisService.pool_stats().items():
+            gauges[f"engine_pool_{name}"] = ("Pool de motores de inferencia: " + name, value)
+        for name, value in _cache.stats().items():
+            gauges[f"result_cache_{name}"] = ("Caché de resultados: " + name, value)
+        if _executor is not None:
+            for name, value in _executor.stats().items():
+                gauges[f"process_executor_{name}"] = ("Pool de procesos: " + name, value)
+        if _sessions is not None:
+            for name, value in _sessions.stats().items():
+                gauges[f"diagnosis_sessions_{name}"] = ("Sesiones de diagnóstico: " + name, value)
+        writer_stats = HistoryService.writer_stats()
+        if writer_stats is not None:
+            for name, value in writer_stats.items():
+                if isinstance(value, (int, float)):
+                    gauges[f"history_writer_{name}"] = ("Escritura diferida del historial: " + name, value)
+        return metrics.registry.render(gauges)
+
+    @staticmethod
+    def executor_stats():
+        """Llamadas, timeouts y fallbacks del pool de procesos (None si está desactivado)."""
+        return _executor.stats() if _executor is not None else None
 
     @staticmethod
     def history():
-        return HistoryService.load()
\ No newline at end of file
+        return HistoryService.load()
@@ -0,0 +1,200 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+from services.validation import apply_session_changes
+
+
+class SessionNotFound(KeyError):
+    """La sesión no existe, se cerró o venció por inactividad."""
+
+
+class InvalidSessionChange(ValueError):
+    """Los cambios pedidos dejan un caso inválido; ``body`` es el cuerpo de error (HTTP 400)."""
+
+    def __init__(self, body):
+        super().__init__(body["error"])
+        self.body = body
+
+
+class _Session:
+    __slots__ = ("lock", "state", "case", "last_used", "closed")
+
+    def __init__(self, state, case, now):
+        self.lock = threading.Lock()
+        self.state = state
+        self.case = case
+        self.last_used = now
+        self.closed = False
+
+
+class DiagnosisSessions:
+    """
+    Sesiones de diagnóstico incremental: cada una conserva un motor con la
+    memoria de trabajo de su caso (``knowledge_base.session``), así que un
+    cambio en el caso sólo declara o retracta los hechos que cambiaron.
+
+    La memoria se acota con ``max_sessions`` sesiones vivas (al crear una más
+    se cierra la usada hace más tiempo) y ``max_symptoms`` síntomas por
+    sesión; las que no se usan durante ``idle_timeout`` segundos vencen. Los
+    motores de las sesiones cerradas se reutilizan (hasta ``spare_engines``)
+    porque construir la red Rete es lo más caro de abrir una sesión.
+
+    Las sesiones viven en la memoria del proceso: con varios workers, cada
+    sesión sólo existe en el que la creó.
+    """
+
+    def __init__(self, engine_factory, max_sessions=256, idle_timeout=900.0,
+                 max_symptoms=50, spare_engines=4, clock=time.monotonic):
+        if max_sessions < 1:
+            raise ValueError("max_sessions debe ser al menos 1")
+        self._engine_factory = engine_factory
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_symptoms = max_symptoms
+        self._spare_limit = spare_engines
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._sessions = OrderedDict()
+        self._spare = []
+        self._created = 0
+        self._closed = 0
+        self._expired = 0
+        self._evicted = 0
+        self._updates = 0
+        self._declared = 0
+        self._retracted = 0
+
+    def _close(self, session):
+        """Cierra una sesión ya quitada del diccionario y guarda su motor si está libre."""
+        session.closed = True
+        # Una sesión en uso por otro hilo conserva su estado hasta que ese hilo
+        # termina (sin reutilizar el motor); los que esperan su lock ven ``closed``.
+        # No se espera el lock acá para no frenar a las demás sesiones
+        if session.lock.acquire(blocking=False):
+            try:
+                if len(self._spare) < self._spare_limit:
+                    self._spare.append(session.state.engine)
+                session.state = None
+            finally:
+                session.lock.release()
+
+    def _expire(self, now):
+        """Cierra las sesiones vencidas (las menos usadas están al principio)."""
+        if not self.idle_timeout:
+            return
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if now - session.last_used < self.idle_timeout:
+                return
+            self._sessions.popitem(last=False)
+            self._close(session)
+            self._expired += 1
+
+    def _engine(self):
+        with self._lock:
+            if self._spare:
+                return self._spare.pop()
+        return self._engine_factory()
+
+    def create(self, case):
+        """
+        Abre una sesión con ``case`` (ya validado). Devuelve ``(session_id,
+        diagnósticos)``.
+        """
+        if len(case.get("symptoms", [])) > self.max_symptoms:
+            raise InvalidSessionChange(
+                {"error": f"Una sesión admite como máximo {self.max_symptoms} síntomas"})
+        # Importación diferida: experta se carga recién con la primera sesión
+        from knowledge_base.session import open_session
+
+        state = open_session(self._engine())
+        diagnoses = state.update(case)
+        session_id = secrets.token_urlsafe(16)
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            while len(self._sessions) >= self.max_sessions:
+                _, oldest = self._sessions.popitem(last=False)
+                self._close(oldest)
+                self._evicted += 1
+            self._sessions[session_id] = _Session(state, case, now)
+            self._created += 1
+            self._declared += state.declared
+        return session_id, diagnoses
+
+    def _session(self, session_id):
+        now = self._clock()
+        with self._lock:
+            self._expire(now)
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise SessionNotFound(session_id)
+            session.last_used = now
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def get(self, session_id):
+        """``(caso, diagnósticos)`` actuales de la sesión."""
+        session = self._session(session_id)
+        with session.lock:
+            if session.closed:
+                raise SessionNotFound(session_id)
+            return session.case, session.state.diagnoses()
+
+    def update(self, session_id, changes):
+        """
+        Aplica ``changes`` (ver ``apply_session_changes``) y devuelve ``(caso,
+        diagnósticos)``. Si los cambios dejan un caso inválido, la sesión
+        queda como estaba.
+        """
+        session = self._session(session_id)
+        with session.lock:
+            if session.closed:
+                raise SessionNotFound(session_id)
+            case, error = apply_session_changes(session.case, changes, self.max_symptoms)
+            if error:
+                raise InvalidSessionChange(error)
+            state = session.state
+            declared, retracted = state.declared, state.retracted
+            diagnoses = state.update(case)
+            session.case = case
+        with self._lock:
+            self._updates += 1
+            self._declared += state.declared - declared
+            self._retracted += state.retracted - retracted
+        return case, diagnoses
+
+    def delete(self, session_id):
+        """Cierra la sesión; False si no existía."""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return False
+            self._close(session)
+            self._closed += 1
+            return True
+
+    def sweep(self):
+        """Cierra las sesiones vencidas; devuelve cuántas quedan."""
+        with self._lock:
+            self._expire(self._clock())
+            return len(self._sessions)
+
+    def stats(self):
+        with self._lock:
+            self._expire(self._clock())
+            return {
+                "active": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "idle_timeout": self.idle_timeout,
+                "created": self._created,
+                "closed": self._closed,
+                "expired": self._expired,
+                "evicted": self._evicted,
+                "updates": self._updates,
+                "facts_declared": self._declared,
+                "facts_retracted": self._retracted,
+                "spare_engines": len(self._spare),
+            }
@@ -0,0 +1,113 @@
+import threading
+import time
+from contextlib import contextmanager
+
+
+class EnginePoolExhausted(RuntimeError):
+    """No hay motores libres dentro del tiempo de espera configurado."""
+
+
+class EnginePool:
+    """
+    Pool thread-safe de motores de inferencia reutilizables.
+
+    Construir un ``EdTechExpertSystem`` compila toda la red Rete a partir de
+    las reglas, por lo que cada motor se crea una sola vez y se reutiliza
+    entre peticiones. Cada worker toma un motor en exclusiva con
+    ``checkout()`` y lo devuelve al terminar; los motores que quedan en un
+    estado inválido (por ejemplo, tras una excepción) se descartan y se
+    reemplazan por uno nuevo la próxima vez que haga falta.
+    """
+
+    def __init__(self, factory, size: int = 4, timeout: float = 30.0):
+        if size < 1:
+            raise ValueError("El tamaño del pool debe ser al menos 1")
+        self._factory = factory
+        self._size = size
+        self._timeout = timeout
+        self._cond = threading.Condition()
+        self._idle = []
+        self._created = 0
+        self._discarded = 0
+
+    @property
+    def size(self):
+        return self._size
+
+    def acquire(self, timeout=None):
+        """Toma un motor en exclusiva; devolverlo con ``release`` o ``discard``."""
+        deadline = time.monotonic() + (self._timeout if timeout is None else timeout)
+        with self._cond:
+            while True:
+                if self._idle:
+                    # LIFO: el motor usado más recientemente está "caliente"
+                    return self._idle.pop()
+                if self._created < self._size:
+                    self._created += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise EnginePoolExhausted(
+                        f"No hay motores disponibles (tamaño del pool: {self._size})"
+                    )
+                self._cond.wait(remaining)
+
+        try:
+            return self._factory()
+        except BaseException:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+            raise
+
+    def discard(self, engine):
+        """Descarta un motor prestado que quedó en un estado inválido."""
+        with self._cond:
+            self._created -= 1
+            self._discarded += 1
+            self._cond.notify()
+
+    @staticmethod
+    def is_healthy(engine) -> bool:
+        """Un motor sano no está ejecutando y no tiene activaciones pendientes."""
+        return not engine.running and not engine.agenda.activations
+
+    def release(self, engine):
+        """Devuelve al pool un motor prestado con ``acquire``."""
+        try:
+            engine.reset()
+        except Exception:
+            self.discard(engine)
+            return
+        if not self.is_healthy(engine):
+            self.discard(engine)
+            return
+        with self._cond:
+            self._idle.append(engine)
+            self._cond.notify()
+
+    @contextmanager
+    def checkout(self, timeout=None):
+        """
+        Presta un motor en exclusiva al worker actual.
+
+        Uso:
+            with pool.checkout() as engine:
+                engine.diagnose(data)
+        """
+        engine = self.acquire(timeout)
+        try:
+            yield engine
+        except BaseException:
+            self.discard(engine)
+            raise
+        self.release(engine)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": self._size,
+                "created": self._created,
+                "idle": len(self._idle),
+                "discarded": self._discarded,
+            }
@@ -0,0 +1,101 @@
+"""
+Parámetros y respuestas de la API de historial.
+
+Compartido por la app Flask (``app.py``) y la ASGI (``asgi.py``) para que
+ambas acepten los mismos parámetros y devuelvan las mismas respuestas.
+"""
+import base64
+import hashlib
+import json
+
+from services.diagnosis_service import DiagnosisService
+from services.history_record import as_entry
+from services.history_service import HistoryService
+
+# Tamaño de página del historial
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 1000
+
+
+def parse_filters(args):
+    """Extrae los filtros de historial de la query string (ValueError si son inválidos)."""
+    filters = {
+        "problem_type": args.get("problem_type"),
+        "cause": args.get("cause"),
+        "since": args.get("since"),
+        "until": args.get("until"),
+    }
+    for name in ("min_confidence", "max_confidence"):
+        value = args.get(name)
+        filters[name] = float(value) if value is not None else None
+    return filters
+
+
+def encode_cursor(position, order):
+    raw = json.dumps({"p": position, "o": order}, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, order):
+    """Decodifica el cursor opaco de paginación (ValueError si es inválido)."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        position = data["p"]
+    except Exception:
+        raise ValueError("cursor inválido")
+    if data.get("o") != order or not _valid_position(position):
+        raise ValueError("cursor inválido")
+    return position
+
+
+def _valid_position(position):
+    """Id de SQLite o ``[archivo, offset]`` de JSON Lines (ver ``JsonLinesHistoryStore.page``)."""
+    if isinstance(position, list) and len(position) == 2:
+        key, position = position
+        if isinstance(key, bool) or not isinstance(key, (str, int)):
+            return False
+    return isinstance(position, int) and not isinstance(position, bool) and position >= 0
+
+
+def parse_listing(args):
+    """Filtros, orden y paginación de GET /api/diagnosis (ValueError si son inválidos)."""
+    filters = parse_filters(args)
+    order = args.get("order", "asc")
+    if order not in ("asc", "desc"):
+        raise ValueError(f"order debe ser 'asc' o 'desc': {order}")
+    limit = int(args.get("limit", DEFAULT_PAGE_SIZE))
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit debe estar entre 1 y {MAX_PAGE_SIZE}")
+    cursor = args.get("cursor")
+    return {
+        "filters": filters,
+        "order": order,
+        "paginate": "limit" in args or "cursor" in args,
+        "limit": limit,
+        "position": decode_cursor(cursor, order) if cursor else None,
+    }
+
+
+def listing_etag(token, query_items):
+    """ETag de una consulta: versión del historial + parámetros de la query string."""
+    query = "&".join(f"{k}={v}" for k, v in sorted(query_items))
+    return hashlib.sha1(f"{token}?{query}".encode("utf-8")).hexdigest()
+
+
+def listing_body(listing):
+    """Cuerpo de GET /api/diagnosis: lista de registros o página ``{items, next_cursor}``."""
+    filters, order = listing["filters"], listing["order"]
+    if listing["paginate"]:
+        items, next_position = HistoryService.page(
+            cursor=listing["position"], limit=listing["limit"], order=order, **filters
+        )
+        next_cursor = encode_cursor(next_position, order) if next_position is not None else None
+        return {"items": items, "next_cursor": next_cursor}
+    if any(v is not None for v in filters.values()):
+        body = HistoryService.query(**filters)
+    else:
+        body = [as_entry(item) for item in DiagnosisService.history()]
+    if order == "desc":
+        body.reverse()
+    return body
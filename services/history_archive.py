@@ -0,0 +1,151 @@
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta, timezone
+
+from services.history_record import as_entry
+from services.history_stats import add_entry, merge_totals, new_totals
+from services.history_store import file_lock
+
+logger = logging.getLogger(__name__)
+
+# Registros sin timestamp (por ejemplo, migrados de un historial viejo)
+UNKNOWN_DAY = "unknown"
+
+
+class HistoryArchive:
+    """
+    Compactación y retención de los segmentos rotados de un historial JSON Lines.
+
+    Cada segmento pendiente se comprime a ``.gz`` y sus registros se suman a
+    los resúmenes diarios del archivo (``<historial>.summary.json``), que es lo
+    que el dashboard sigue graficando aunque la retención borre el segmento.
+    La retención se aplica por segmento completo: por antigüedad del último
+    registro (``retention_days``) y por cantidad de registros retenidos
+    (``max_records``); ``0`` desactiva cada límite.
+    """
+
+    def __init__(self, store, retention_days=0, max_records=0):
+        self.store = store
+        self.retention_days = retention_days
+        self.max_records = max_records
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _save_summary(self, summary):
+        tmp = self.store.summary_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, separators=(",", ":"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.store.summary_path)
+
+    def _fold(self, path):
+        """Resúmenes diarios e info de un segmento pendiente."""
+        days = {}
+        info = {"records": 0, "first": None, "last": None}
+        for item in self.store.segment_records(path, False):
+            entry = as_entry(item)
+            timestamp = entry.get("timestamp") if isinstance(entry, dict) else None
+            day = timestamp[:10] if isinstance(timestamp, str) else UNKNOWN_DAY
+            add_entry(days.setdefault(day, new_totals()), entry)
+            info["records"] += 1
+            if isinstance(timestamp, str):
+                info["first"] = min(info["first"] or timestamp, timestamp)
+                info["last"] = max(info["last"] or timestamp, timestamp)
+        return days, info
+
+    def compact(self):
+        """Comprime los segmentos pendientes y aplica la retención. Devuelve los segmentos comprimidos."""
+        compacted = 0
+        # Un solo compactador a la vez, entre hilos y entre procesos
+        with file_lock(self.store.path + ".compact"):
+            for path, compressed in self.store.segments():
+                if compressed:
+                    continue
+                self._compact_segment(path)
+                compacted += 1
+            self._apply_retention()
+        return compacted
+
+    def _compact_segment(self, path):
+        target = path + ".gz"
+        name = os.path.basename(target)
+        if name in self.store.summary()["segments"]:
+            # Una compactación anterior se interrumpió después de guardar el resumen
+            with self.store.segments_lock():
+                os.remove(path)
+            return
+
+        days, info = self._fold(path)
+        tmp = target + ".tmp"
+        with open(path, "rb") as src, gzip.open(tmp, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        with open(tmp, "rb") as f:
+            os.fsync(f.fileno())
+
+        # Comprimido, resumen y borrado del pendiente son atómicos para read_since
+        with self.store.segments_lock():
+            os.replace(tmp, target)
+            summary = self.store.summary()
+            for day, totals in days.items():
+                merge_totals(summary["days"].setdefault(day, new_totals()), totals)
+            summary["segments"][name] = info
+            self._save_summary(summary)
+            os.remove(path)
+        logger.info("Segmento del historial compactado: %s (%d registros)", name, info["records"])
+
+    def _apply_retention(self):
+        if not self.retention_days and not self.max_records:
+            return
+        directory = os.path.dirname(self.store.path) or "."
+        with self.store.segments_lock():
+            summary = self.store.summary()
+            segments = summary["segments"]
+            expired = []
+            if self.retention_days:
+                limit = (datetime.now(timezone.utc) - timedelta(days=self.retention_days)).isoformat()
+                expired = [name for name, info in segments.items()
+                           if info["last"] is not None and info["last"] < limit]
+            if self.max_records:
+                retained = sorted(name for name in segments if name not in expired)
+                total = sum(segments[name]["records"] for name in retained)
+                while retained and total > self.max_records:
+                    name = retained.pop(0)
+                    total -= segments[name]["records"]
+                    expired.append(name)
+            if not expired:
+                return
+            for name in expired:
+                # Los resúmenes diarios del segmento se conservan
+                segments.pop(name)
+            self._save_summary(summary)
+            for name in expired:
+                try:
+                    os.remove(os.path.join(directory, name))
+                except FileNotFoundError:
+                    pass
+        logger.info("Retención del historial: %d segmentos eliminados", len(expired))
+
+    def start(self, interval=60.0):
+        """Compacta en un hilo de fondo al rotar el historial y cada ``interval`` segundos."""
+        if self._thread is not None:
+            return
+        self.store.on_rotate = self._wake.set
+        # La primera pasada toma los segmentos que quedaron pendientes de antes
+        self._wake.set()
+        self._thread = threading.Thread(target=self._run, args=(interval,),
+                                        name="history-compactor", daemon=True)
+        self._thread.start()
+
+    def _run(self, interval):
+        while True:
+            self._wake.wait(interval)
+            self._wake.clear()
+            try:
+                self.compact()
+            except Exception:
+                logger.exception("Error al compactar el historial")
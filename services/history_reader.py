@@ -0,0 +1,133 @@
+import gzip
+import json
+import mmap
+import os
+
+from services.history_record import decode
+
+
+def parse_line(line, offset, on_corrupt=None):
+    """
+    Registro de una línea del historial: ``(registro, True)``, o ``(None, False)``
+    si está vacía o corrupta (en ese caso se informa a ``on_corrupt``).
+    """
+    try:
+        # Decodificar antes evita que json.loads detecte la codificación en cada línea
+        text = line.decode("utf-8").strip()
+        if not text:
+            return None, False
+        return decode(json.loads(text)), True
+    except ValueError as e:
+        if on_corrupt is not None:
+            on_corrupt(offset, line.strip(), e)
+        return None, False
+
+
+def read_compressed(path, on_corrupt=None):
+    """Registros de un segmento gzip en orden: ``(offset sin comprimir, registro)``."""
+    offset = 0
+    with gzip.open(path, "rb") as f:
+        for line in f:
+            if line.endswith(b"\n"):
+                item, ok = parse_line(line, offset, on_corrupt)
+                if ok:
+                    yield offset, item
+            offset += len(line)
+
+
+class HistoryReader:
+    """
+    Lectura en streaming del historial JSON Lines sobre ``mmap``.
+
+    Los registros se decodifican de a uno a medida que se recorren, hacia
+    adelante o hacia atrás (los N más recientes sin leer el resto del
+    archivo), así que la memoria no depende del tamaño del historial. Una
+    línea corrupta se saltea y se informa con ``on_corrupt(offset, línea,
+    error)``; una última línea sin ``"\\n"`` es una escritura en curso y se
+    ignora. Se usa como contexto:
+
+        with HistoryReader(path) as reader:
+            for offset, next_offset, item in reader.forward():
+                ...
+    """
+
+    def __init__(self, path, on_corrupt=None):
+        self.path = path
+        self.on_corrupt = on_corrupt
+        self.inode = None
+        # Tamaño del archivo al abrirlo y fin de la última línea completa
+        self.size = 0
+        self.end = 0
+        self._file = None
+        self._map = None
+
+    def open(self):
+        """Abre y mapea el archivo (FileNotFoundError si no existe)."""
+        if self._file is not None:
+            return self
+        self._file = open(self.path, "rb")
+        try:
+            st = os.fstat(self._file.fileno())
+            self.inode = st.st_ino
+            self.size = st.st_size
+            if self.size:
+                self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+                self.end = self._map.rfind(b"\n") + 1
+        except BaseException:
+            self.close()
+            raise
+        return self
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _parse(self, start, line):
+        return parse_line(line, start, self.on_corrupt)
+
+    def forward(self, start=0):
+        """Registros desde ``start`` (inicio de línea): ``(offset, próximo_offset, registro)``."""
+        mapped = self._map
+        pos = start
+        if pos >= self.end:
+            return
+        mapped.seek(pos)
+        readline = mapped.readline
+        while pos < self.end:
+            line = readline()
+            next_pos = pos + len(line)
+            item, ok = self._parse(pos, line)
+            if ok:
+                yield pos, next_pos, item
+            pos = next_pos
+
+    def backward(self, end=None):
+        """Registros que terminan antes de ``end``, del más reciente al más antiguo: ``(offset, registro)``."""
+        pos = self.end if end is None else min(end, self.end)
+        while pos > 0:
+            start = self._map.rfind(b"\n", 0, pos - 1) + 1
+            item, ok = self._parse(start, self._map[start:pos - 1])
+            if ok:
+                yield start, item
+            pos = start
+
+    def recent(self, n):
+        """Los ``n`` registros más recientes, del más nuevo al más viejo."""
+        items = []
+        if n <= 0:
+            return items
+        for _, item in self.backward():
+            items.append(item)
+            if len(items) >= n:
+                break
+        return items
@@ -0,0 +1,162 @@
+import sys
+
+from knowledge_base.solutions import solutions
+
+# Campos de un registro del historial, en el orden en que se devuelven por la API
+FIELDS = ("diagnosis", "cause", "solution", "confidence", "timestamp")
+_REQUIRED = frozenset(FIELDS[:4])
+# ``case``: el caso de entrada canónico que produjo el diagnóstico (opcional)
+_ALLOWED = frozenset(FIELDS) | {"case"}
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+def canonical_case(data):
+    """
+    Caso de entrada reducido a lo que leen las reglas, en forma compacta:
+    ``((("login", "cannot_login"), ...), "Chrome", "wifi")``.
+
+    Igual que ``result_cache.canonical_key``: el orden de los síntomas se
+    conserva (la agenda depende de él) y sólo se colapsan los idénticos en
+    todos sus campos, como en la lista de hechos del motor. Acepta tanto el
+    cuerpo de /api/diagnose como la forma de ``case_data``. Devuelve None si
+    ``data`` no tiene esa forma.
+    """
+    try:
+        seen = set()
+        symptoms = []
+        for symptom in data.get("symptoms", []):
+            key = (symptom["type"], symptom["description"])
+            if not all(isinstance(v, str) for v in key):
+                return None
+            identity = frozenset(symptom.items())
+            if identity not in seen:
+                seen.add(identity)
+                symptoms.append((_intern(key[0]), _intern(key[1])))
+        sysinfo = data.get("system_info") or {}
+        browser, connection = sysinfo.get("browser"), sysinfo.get("connection_type")
+    except (AttributeError, KeyError, TypeError):
+        return None
+    if not all(v is None or isinstance(v, str) for v in (browser, connection)):
+        return None
+    return tuple(symptoms), _intern(browser), _intern(connection)
+
+
+def case_data(case):
+    """Caso compacto de ``canonical_case`` con la forma de entrada de /api/diagnose."""
+    symptoms, browser, connection = case
+    system_info = {}
+    if browser is not None:
+        system_info["browser"] = browser
+    if connection is not None:
+        system_info["connection_type"] = connection
+    return {
+        "symptoms": [{"type": t, "description": d} for t, d in symptoms],
+        "system_info": system_info,
+    }
+
+
+def _case_from_row(value):
+    """Caso compacto a partir de su forma en disco, ``[[["login","cannot_login"]],"Chrome","wifi"]``."""
+    try:
+        symptoms, browser, connection = value
+        return tuple((_intern(t), _intern(d)) for t, d in symptoms), _intern(browser), _intern(connection)
+    except (TypeError, ValueError):
+        return None
+
+
+class DiagnosisRecord:
+    """
+    Registro compacto del historial.
+
+    En lugar de un dict por diagnóstico con su propia copia del texto de la
+    solución, guarda cinco referencias: el tipo de problema y la causa
+    internados, el ID de la solución (ver ``knowledge_base.solutions``), la
+    confianza y el timestamp. En disco se serializa como una lista JSON:
+    ``["login","browser","3f2a9c1e",0.9,"2024-01-01T00:00:00+00:00"]``.
+
+    Si se conoce, el caso de entrada canónico (``canonical_case``) va como
+    sexto elemento, ``[[["login","cannot_login"]],"Chrome","wifi"]``, para
+    poder volver a diagnosticarlo (``python -m benchmarks replay``, ver
+    ``benchmarks/replay.py``).
+    """
+
+    __slots__ = ("diagnosis", "cause", "solution_id", "confidence", "timestamp", "case")
+
+    def __init__(self, diagnosis, cause, solution_id, confidence, timestamp=None, case=None):
+        self.diagnosis = _intern(diagnosis)
+        self.cause = _intern(cause)
+        self.solution_id = _intern(solution_id)
+        self.confidence = confidence
+        self.timestamp = timestamp
+        self.case = case
+
+    @classmethod
+    def from_entry(cls, entry):
+        """
+        Registro equivalente a ``entry`` (un dict de diagnóstico), o None si
+        ``entry`` tiene otra forma y debe guardarse tal cual.
+        """
+        if not isinstance(entry, dict) or not _REQUIRED <= entry.keys() <= _ALLOWED:
+            return None
+        diagnosis, cause, solution = entry["diagnosis"], entry["cause"], entry["solution"]
+        confidence, timestamp = entry["confidence"], entry.get("timestamp")
+        if not all(v is None or isinstance(v, str) for v in (diagnosis, cause, solution, timestamp)):
+            return None
+        if confidence is not None and (isinstance(confidence, bool) or not isinstance(confidence, (int, float))):
+            return None
+        case = None
+        if entry.get("case") is not None:
+            case = canonical_case(entry["case"])
+            if case is None:
+                return None
+        sid = solutions.intern(solution) if solution is not None else None
+        return cls(diagnosis, cause, sid, confidence, timestamp, case)
+
+    @classmethod
+    def from_row(cls, row):
+        if len(row) > len(FIELDS):
+            return cls(*row[:len(FIELDS)], case=_case_from_row(row[len(FIELDS)]))
+        return cls(*row)
+
+    def to_row(self):
+        row = [self.diagnosis, self.cause, self.solution_id, self.confidence, self.timestamp]
+        if self.case is not None:
+            row.append(self.case)
+        return row
+
+    @property
+    def solution(self):
+        return solutions.text(self.solution_id) if self.solution_id is not None else None
+
+    def as_dict(self):
+        """El registro con la forma de siempre (texto de la solución incluido)."""
+        entry = {
+            "diagnosis": self.diagnosis,
+            "cause": self.cause,
+            "solution": self.solution,
+            "confidence": self.confidence,
+        }
+        if self.timestamp is not None:
+            entry["timestamp"] = self.timestamp
+        if self.case is not None:
+            entry["case"] = case_data(self.case)
+        return entry
+
+    def __repr__(self):
+        return "DiagnosisRecord(%s)" % ", ".join(repr(v) for v in self.to_row())
+
+
+def decode(value):
+    """Registro compacto a partir de su forma en disco; otros valores se devuelven tal cual."""
+    if isinstance(value, list) and len(FIELDS) <= len(value) <= len(FIELDS) + 1:
+        return DiagnosisRecord.from_row(value)
+    record = DiagnosisRecord.from_entry(value)
+    return record if record is not None else value
+
+
+def as_entry(item):
+    """Forma de la API de un elemento del historial (registro compacto o valor crudo)."""
+    return item.as_dict() if isinstance(item, DiagnosisRecord) else item
@@ -1,30 +1,237 @@
-import os, json
+import os
+import threading
+from datetime import datetime, timezone
+
+from services.history_record import canonical_case, case_data
+from services.history_stats import HistoryStats
+from services.history_store import JsonLinesHistoryStore
+
+# "jsonl": archivo append-only; "sqlite": base SQLite local con índices
+_HISTORY_BACKEND = os.environ.get("HISTORY_BACKEND", "jsonl")
+_HISTORY_PATH = os.environ.get("HISTORY_PATH", "data/responses.jsonl")
+_HISTORY_DB_PATH = os.environ.get("HISTORY_DB_PATH", "data/history.sqlite3")
+# Historial en el formato anterior (array JSON), se migra en el primer uso
+_LEGACY_HISTORY_PATH = "data/responses.json"
+# "always": fsync en cada diagnóstico; "never": deja el flush al sistema operativo
+_HISTORY_FSYNC = os.environ.get("HISTORY_FSYNC", "always")
+# Rotación del historial JSON Lines en segmentos comprimidos (0 = sin rotación)
+_HISTORY_ROTATE_BYTES = int(os.environ.get("HISTORY_ROTATE_BYTES", "0"))
+# Retención de los segmentos: días y registros (0 = sin límite)
+_HISTORY_RETENTION_DAYS = int(os.environ.get("HISTORY_RETENTION_DAYS", "0"))
+_HISTORY_MAX_RECORDS = int(os.environ.get("HISTORY_MAX_RECORDS", "0"))
+_HISTORY_COMPACT_INTERVAL = float(os.environ.get("HISTORY_COMPACT_INTERVAL", "60"))
+# Escritura diferida en grupos: la respuesta de /api/diagnose no espera al disco
+_HISTORY_WRITE_BEHIND = os.environ.get("HISTORY_WRITE_BEHIND", "0") == "1"
+# "group": el diagnóstico no espera la escritura; "request": espera el commit de su grupo
+_HISTORY_DURABILITY = os.environ.get("HISTORY_DURABILITY", "group")
+_HISTORY_QUEUE_SIZE = int(os.environ.get("HISTORY_QUEUE_SIZE", "10000"))
+_HISTORY_BATCH_SIZE = int(os.environ.get("HISTORY_BATCH_SIZE", "500"))
+_HISTORY_FLUSH_INTERVAL = float(os.environ.get("HISTORY_FLUSH_INTERVAL", "0.05"))
+
+_store = None
+_store_lock = threading.Lock()
+_stats = HistoryStats()
+_archive = None
+_writer = None
+
+
+def _create_store():
+    global _archive
+    jsonl = JsonLinesHistoryStore(_HISTORY_PATH, fsync=_HISTORY_FSYNC, rotate_bytes=_HISTORY_ROTATE_BYTES)
+    jsonl.migrate_from(_LEGACY_HISTORY_PATH)
+    if _HISTORY_BACKEND == "jsonl":
+        if _HISTORY_ROTATE_BYTES:
+            from services.history_archive import HistoryArchive
+
+            _archive = HistoryArchive(jsonl, retention_days=_HISTORY_RETENTION_DAYS,
+                                      max_records=_HISTORY_MAX_RECORDS)
+            _archive.start(_HISTORY_COMPACT_INTERVAL)
+        return jsonl
+    if _HISTORY_BACKEND == "sqlite":
+        from services.sqlite_history_store import SqliteHistoryStore
+
+        store = SqliteHistoryStore(_HISTORY_DB_PATH, fsync=_HISTORY_FSYNC)
+        if store.count() == 0:
+            # Primer arranque con SQLite: importar el historial existente
+            store.append_many(jsonl.iter())
+        return store
+    raise ValueError(f"HISTORY_BACKEND inválido: {_HISTORY_BACKEND}")
+
+
+def _refresh_stats():
+    if _stats.loaded:
+        _stats.refresh(HistoryService.store())
 
-_HISTORY_PATH = "data/responses.json"
 
 class HistoryService:
     @staticmethod
-    def _ensure_dir():
-        d = os.path.dirname(_HISTORY_PATH)
-        if d and not os.path.exists(d):
-            os.makedirs(d, exist_ok=True)
+    def store():
+        global _store
+        if _store is None:
+            with _store_lock:
+                if _store is None:
+                    _store = _create_store()
+        return _store
+
+    @staticmethod
+    def configure(store, write_behind=None, **writer_options):
+        """
+        Reemplaza el backend del historial (benchmarks y herramientas de línea
+        de comandos). Lo pendiente de la escritura diferida anterior se escribe
+        en el backend anterior.
+        """
+        global _store, _stats, _writer, _HISTORY_WRITE_BEHIND
+        with _store_lock:
+            if _writer is not None:
+                _writer.close()
+                _writer = None
+            _store = store
+            _stats = HistoryStats()
+            if write_behind is not None:
+                _HISTORY_WRITE_BEHIND = write_behind
+            if _HISTORY_WRITE_BEHIND:
+                _writer = HistoryService._create_writer(store, **writer_options)
+
+    @staticmethod
+    def _create_writer(store, **options):
+        from services.history_writer import HistoryWriter
+
+        options.setdefault("durability", _HISTORY_DURABILITY)
+        options.setdefault("max_pending", _HISTORY_QUEUE_SIZE)
+        options.setdefault("max_batch", _HISTORY_BATCH_SIZE)
+        options.setdefault("flush_interval", _HISTORY_FLUSH_INTERVAL)
+        return HistoryWriter(store, on_flush=_refresh_stats, **options)
+
+    @staticmethod
+    def writer():
+        """Escritor diferido del historial (None si ``HISTORY_WRITE_BEHIND`` está desactivado)."""
+        global _writer
+        if _HISTORY_WRITE_BEHIND and _writer is None:
+            store = HistoryService.store()
+            with _store_lock:
+                if _writer is None:
+                    _writer = HistoryService._create_writer(store)
+        return _writer
+
+    @staticmethod
+    def start_writer():
+        """
+        Crea el escritor diferido al arrancar, desde el hilo principal, para
+        que SIGTERM escriba lo pendiente antes de terminar.
+        """
+        writer = HistoryService.writer()
+        if writer is not None:
+            writer.install_signal_handlers()
+        return writer
+
+    @staticmethod
+    def writer_stats():
+        """Cola y grupos escritos por la escritura diferida (None si está desactivada)."""
+        return _writer.stats() if _writer is not None else None
+
+    @staticmethod
+    def flush(timeout=None):
+        """Espera a que los appends diferidos estén escritos."""
+        return _writer.flush(timeout) if _writer is not None else True
+
+    @staticmethod
+    def _synced():
+        """Backend con los appends diferidos ya escritos, para que las lecturas los vean."""
+        HistoryService.flush()
+        return HistoryService.store()
+
+    @staticmethod
+    def compact():
+        """Compacta ya los segmentos rotados pendientes (None si la rotación está desactivada)."""
+        HistoryService.store()
+        return _archive.compact() if _archive is not None else None
+
+    @staticmethod
+    def iter():
+        return HistoryService._synced().iter()
+
+    @staticmethod
+    def records():
+        """Como ``iter``, pero con los diagnósticos como ``DiagnosisRecord`` (incluye el caso de entrada)."""
+        return HistoryService._synced().records()
 
     @staticmethod
     def load():
-        if not os.path.exists(_HISTORY_PATH):
-            return []
-        try:
-            with open(_HISTORY_PATH, "r", encoding="utf-8") as f:
-                data = json.load(f)
-            return data if isinstance(data, list) else [data]
-        except Exception:
-            return []
-
-    @staticmethod
-    def append(entry: dict):
-        HistoryService._ensure_dir()
-        data = HistoryService.load()
-        data.append(entry)
-        with open(_HISTORY_PATH, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
+        """Historial completo; los diagnósticos como ``DiagnosisRecord`` compactos."""
+        return HistoryService._synced().load()
+
+    @staticmethod
+    def recent(n):
+        """Los ``n`` diagnósticos más recientes (el más nuevo primero), sin recorrer el historial."""
+        return HistoryService._synced().recent(n)
+
+    @staticmethod
+    def query(limit=None, **filters):
+        """Historial filtrado por problem_type, cause, min/max_confidence y since/until."""
+        return HistoryService._synced().query(limit=limit, **filters)
+
+    @staticmethod
+    def page(cursor=None, limit=50, order="asc", **filters):
+        """Página de historial filtrado; devuelve ``(registros, próximo_cursor)``."""
+        return HistoryService._synced().page(cursor=cursor, limit=limit, order=order, **filters)
 
+    @staticmethod
+    def version():
+        """``(token, última_modificación)`` del historial, para GET condicionales."""
+        return HistoryService._synced().version()
+
+    @staticmethod
+    def aggregate(group_by, **filters):
+        """Cantidad y confianza promedio agrupadas por problem_type o cause."""
+        return HistoryService._synced().aggregate(group_by, **filters)
+
+    @staticmethod
+    def stats():
+        """Agregados del dashboard; sólo lee lo escrito desde la última consulta."""
+        _stats.refresh(HistoryService._synced())
+        return _stats.snapshot()
+
+    @staticmethod
+    def _stamp(entry, case=None):
+        if isinstance(entry, dict) and "timestamp" not in entry:
+            entry = dict(entry, timestamp=datetime.now(timezone.utc).isoformat(timespec="seconds"))
+        if case is not None and isinstance(entry, dict):
+            # Sólo lo que leen las reglas: alcanza para volver a diagnosticar el caso
+            canonical = canonical_case(case)
+            if canonical is not None:
+                entry = dict(entry, case=case_data(canonical))
+        return entry
+
+    @staticmethod
+    def append(entry: dict, case=None):
+        """Agrega un diagnóstico; ``case`` es el caso de entrada que lo produjo."""
+        entry = HistoryService._stamp(entry, case)
+        writer = HistoryService.writer()
+        if writer is not None:
+            writer.submit([entry])
+            return
+        store = HistoryService.store()
+        store.append(entry)
+        if _stats.loaded:
+            _stats.refresh(store)
+
+    @staticmethod
+    def append_many(entries, cases=None):
+        """
+        Agrega varios registros en una sola escritura (un lock y un fsync);
+        ``cases``, si se pasa, tiene el caso de entrada de cada uno.
+        """
+        if cases is None:
+            entries = [HistoryService._stamp(e) for e in entries]
+        else:
+            entries = [HistoryService._stamp(e, case) for e, case in zip(entries, cases)]
+        if not entries:
+            return
+        writer = HistoryService.writer()
+        if writer is not None:
+            writer.submit(entries)
+            return
+        store = HistoryService.store()
+        store.append_many(entries)
+        if _stats.loaded:
+            _stats.refresh(store)
@@ -0,0 +1,126 @@
+import threading
+
+# Mismos umbrales y categorías que muestra el dashboard
+HIGH_CONFIDENCE = 0.85
+MEDIUM_CONFIDENCE = 0.60
+PROBLEM_TYPES = ("login", "video", "chat", "content")
+CAUSES = ("server", "browser", "user", "network", "device", "permissions", "link")
+
+
+def new_totals():
+    """Agregados vacíos; se serializan a JSON tal cual (resúmenes diarios del archivo)."""
+    return {
+        "total": 0,
+        "confidence": {"high": 0, "medium": 0, "low": 0},
+        "problem_counts": {},
+        "cause_counts": {},
+        "confidence_sum": {},
+        "confidence_n": {},
+    }
+
+
+def add_entry(totals, entry):
+    """Suma un registro del historial a ``totals``."""
+    if not isinstance(entry, dict):
+        return
+    totals["total"] += 1
+    confidence = entry.get("confidence")
+    has_confidence = isinstance(confidence, (int, float))
+    if has_confidence:
+        buckets = totals["confidence"]
+        if confidence >= HIGH_CONFIDENCE:
+            buckets["high"] += 1
+        elif confidence >= MEDIUM_CONFIDENCE:
+            buckets["medium"] += 1
+        else:
+            buckets["low"] += 1
+
+    problem_type = entry.get("diagnosis")
+    if problem_type is not None:
+        counts = totals["problem_counts"]
+        counts[problem_type] = counts.get(problem_type, 0) + 1
+        if has_confidence:
+            totals["confidence_sum"][problem_type] = totals["confidence_sum"].get(problem_type, 0.0) + confidence
+            totals["confidence_n"][problem_type] = totals["confidence_n"].get(problem_type, 0) + 1
+
+    cause = entry.get("cause")
+    if cause is not None:
+        counts = totals["cause_counts"]
+        counts[cause] = counts.get(cause, 0) + 1
+
+
+def merge_totals(totals, other):
+    """Suma a ``totals`` otros agregados (por ejemplo, un resumen diario)."""
+    totals["total"] += other["total"]
+    for name in ("confidence", "problem_counts", "cause_counts", "confidence_sum", "confidence_n"):
+        target = totals[name]
+        for key, value in other[name].items():
+            target[key] = target.get(key, 0) + value
+
+
+class ArchivedTotals:
+    """
+    Agregados de registros que ya no están en el historial activo (resúmenes
+    diarios de segmentos compactados). ``read_since`` los devuelve entre los
+    registros de una lectura completa.
+    """
+
+    def __init__(self, totals):
+        self.totals = totals
+
+
+class HistoryStats:
+    """
+    Agregados del dashboard mantenidos de forma incremental.
+
+    El estado guarda un cursor sobre el historial (offset en JSON Lines, id en
+    SQLite); ``refresh`` sólo lee los registros posteriores al cursor, así que
+    después de la carga inicial cada actualización cuesta O(registros nuevos),
+    incluidos los escritos por otros procesos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cursor = None
+        self._reset()
+
+    def _reset(self):
+        self._totals = new_totals()
+        self._totals["problem_counts"] = dict.fromkeys(PROBLEM_TYPES, 0)
+        self._totals["cause_counts"] = dict.fromkeys(CAUSES, 0)
+        self._totals["confidence_sum"] = dict.fromkeys(PROBLEM_TYPES, 0.0)
+        self._totals["confidence_n"] = dict.fromkeys(PROBLEM_TYPES, 0)
+
+    def _add(self, entry):
+        if isinstance(entry, ArchivedTotals):
+            merge_totals(self._totals, entry.totals)
+        else:
+            add_entry(self._totals, entry)
+
+    @property
+    def loaded(self):
+        return self._cursor is not None
+
+    def refresh(self, store):
+        """Incorpora los registros escritos desde la última actualización."""
+        with self._lock:
+            entries, self._cursor, full = store.read_since(self._cursor)
+            if full:
+                # El historial se reescribió (o es la carga inicial): recalcular
+                self._reset()
+            for entry in entries:
+                self._add(entry)
+
+    def snapshot(self):
+        with self._lock:
+            totals = self._totals
+            return {
+                "total": totals["total"],
+                "confidence": dict(totals["confidence"]),
+                "problem_counts": dict(totals["problem_counts"]),
+                "cause_counts": dict(totals["cause_counts"]),
+                "avg_confidence": {
+                    t: (totals["confidence_sum"][t] / n if n else None)
+                    for t, n in totals["confidence_n"].items()
+                },
+            }
@@ -0,0 +1,586 @@
+import json
+import logging
+import os
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from knowledge_base.solutions import solutions
+from services.history_reader import HistoryReader, read_compressed
+from services.history_record import DiagnosisRecord
+from services.history_stats import ArchivedTotals
+
+logger = logging.getLogger(__name__)
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Políticas de durabilidad para cada escritura
+FSYNC_ALWAYS = "always"
+FSYNC_NEVER = "never"
+
+# Campos por los que se puede agrupar (nombre público -> clave del registro)
+GROUP_FIELDS = {"problem_type": "diagnosis", "cause": "cause"}
+
+# Sufijo de un segmento rotado: ``<archivo>.<fecha UTC>`` y ``.gz`` una vez compactado
+_SEGMENT_RE = re.compile(r"\.(\d{8}T\d{12}Z)(\.gz)?")
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def file_lock(path):
+    """
+    Lock exclusivo entre hilos y entre procesos sobre ``path + ".lock"``.
+
+    El lock de hilos evita que dos workers del mismo proceso compitan por el
+    lock del sistema operativo, que es por proceso en algunas plataformas.
+    """
+    with _thread_locks_guard:
+        thread_lock = _thread_locks.setdefault(path, threading.Lock())
+    with thread_lock:
+        fd = os.open(path + ".lock", os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+
+def matches_filters(entry, problem_type=None, cause=None, min_confidence=None,
+                    max_confidence=None, since=None, until=None):
+    """Aplica en memoria los mismos filtros que el backend SQLite resuelve con índices."""
+    if not isinstance(entry, dict):
+        return not any(v is not None for v in (problem_type, cause, min_confidence,
+                                               max_confidence, since, until))
+    if problem_type is not None and entry.get("diagnosis") != problem_type:
+        return False
+    if cause is not None and entry.get("cause") != cause:
+        return False
+    confidence = entry.get("confidence")
+    if min_confidence is not None and (confidence is None or confidence < min_confidence):
+        return False
+    if max_confidence is not None and (confidence is None or confidence > max_confidence):
+        return False
+    timestamp = entry.get("timestamp")
+    if since is not None and (timestamp is None or timestamp < since):
+        return False
+    if until is not None and (timestamp is None or timestamp > until):
+        return False
+    return True
+
+
+class JsonLinesHistoryStore:
+    """
+    Historial append-only en formato JSON Lines (un diagnóstico por línea).
+
+    Cada ``append`` es un único ``write()`` en modo O_APPEND bajo lock, por lo
+    que su costo no depende del tamaño del historial y dos peticiones
+    concurrentes no pueden pisarse las escrituras.
+
+    Los diagnósticos se guardan como registros compactos (``DiagnosisRecord``)
+    que refieren a la solución por ID; la tabla ID -> texto vive al lado, en
+    ``<archivo>.solutions``, y se escribe antes que el primer registro que usa
+    cada ID.
+
+    La lectura es en streaming sobre ``mmap`` (``HistoryReader``): una línea
+    corrupta se saltea y se informa una vez en el log, sin perder el resto.
+
+    Con ``rotate_bytes`` el archivo activo se renombra a un segmento
+    ``<archivo>.<fecha>`` al superar ese tamaño (un ``rename`` bajo el lock
+    de escritura); ``HistoryArchive`` lo comprime después en segundo plano y
+    suma sus registros a los resúmenes diarios de ``<archivo>.summary.json``.
+    El historial es entonces: resúmenes + segmentos retenidos + archivo activo.
+    """
+
+    def __init__(self, path: str, fsync: str = FSYNC_ALWAYS, rotate_bytes: int = 0):
+        if fsync not in (FSYNC_ALWAYS, FSYNC_NEVER):
+            raise ValueError(f"Política de fsync inválida: {fsync}")
+        self.path = path
+        self.fsync = fsync
+        self.rotate_bytes = rotate_bytes
+        self.summary_path = path + ".summary.json"
+        # Se llama (con el lock de escritura tomado) después de cada rotación
+        self.on_rotate = None
+        self.solutions_path = path + ".solutions"
+        self._solutions_lock = threading.Lock()
+        self._solutions_offset = 0
+        self._persisted_ids = set()
+        # Líneas corruptas ya informadas: {(inodo, offset): error}
+        self.corrupt = {}
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+
+    @staticmethod
+    def _dumps(value) -> bytes:
+        return (json.dumps(value, ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+
+    def _encode_many(self, entries):
+        """Líneas de ``entries`` y los IDs de solución que usan."""
+        lines = []
+        ids = set()
+        for entry in entries:
+            record = DiagnosisRecord.from_entry(entry)
+            if record is None:
+                lines.append(self._dumps(entry))
+                continue
+            lines.append(self._dumps(record.to_row()))
+            if record.solution_id is not None:
+                ids.add(record.solution_id)
+        return b"".join(lines), ids
+
+    def _sync_solutions(self):
+        """Incorpora a la tabla de soluciones los pares escritos desde la última lectura."""
+        with self._solutions_lock:
+            try:
+                f = open(self.solutions_path, "rb")
+            except FileNotFoundError:
+                return
+            with f:
+                if os.fstat(f.fileno()).st_size < self._solutions_offset:
+                    self._solutions_offset = 0
+                f.seek(self._solutions_offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    self._solutions_offset += len(line)
+                    try:
+                        sid, text = json.loads(line)
+                    except ValueError:
+                        continue
+                    solutions.add(sid, text)
+                    self._persisted_ids.add(sid)
+
+    def _persist_solutions(self, ids):
+        """Agrega a la tabla en disco los IDs que todavía no figuran (con el lock tomado)."""
+        missing = ids - self._persisted_ids
+        if missing:
+            # Otro proceso pudo haberlos registrado desde la última lectura
+            self._sync_solutions()
+            missing -= self._persisted_ids
+        if not missing:
+            return
+        payload = b"".join(self._dumps([sid, solutions.text(sid)]) for sid in sorted(missing))
+        fd = os.open(self.solutions_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, payload)
+            if self.fsync == FSYNC_ALWAYS:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._persisted_ids |= missing
+
+    def _write(self, payload: bytes, solution_ids=frozenset()):
+        with file_lock(self.path):
+            self._persist_solutions(solution_ids)
+            fd = os.open(self.path, os.O_RDWR | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                size = os.lseek(fd, 0, os.SEEK_END)
+                if size:
+                    os.lseek(fd, size - 1, os.SEEK_SET)
+                    if os.read(fd, 1) != b"\n":
+                        # Una escritura anterior quedó cortada: sin este "\n" el
+                        # registro nuevo se pegaría a ella y también se perdería
+                        payload = b"\n" + payload
+                os.write(fd, payload)
+                if self.fsync == FSYNC_ALWAYS:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            if self.rotate_bytes and size + len(payload) >= self.rotate_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        """Pasa el archivo activo a un segmento y deja uno nuevo vacío (con el lock tomado)."""
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        os.rename(self.path, f"{self.path}.{stamp}")
+        os.close(os.open(self.path, os.O_WRONLY | os.O_CREAT, 0o644))
+        if self.on_rotate is not None:
+            self.on_rotate()
+
+    def segments(self):
+        """
+        Segmentos rotados del más antiguo al más nuevo: ``[(ruta, comprimido)]``.
+
+        Mientras un segmento se comprime existen las dos versiones; vale la
+        comprimida.
+        """
+        directory = os.path.dirname(self.path) or "."
+        base = os.path.basename(self.path)
+        found = {}
+        for name in os.listdir(directory):
+            if not name.startswith(base):
+                continue
+            match = _SEGMENT_RE.fullmatch(name[len(base):])
+            if match is None:
+                continue
+            stamp, compressed = match.group(1), match.group(2) is not None
+            if compressed or stamp not in found:
+                found[stamp] = (os.path.join(directory, name), compressed)
+        return [found[stamp] for stamp in sorted(found)]
+
+    def segments_lock(self):
+        """Lock que ordena la compactación respecto de las lecturas completas de ``read_since``."""
+        return file_lock(self.path + ".segments")
+
+    def summary(self):
+        """Resúmenes del archivo: ``{"days": {fecha: agregados}, "segments": {nombre: info}}``."""
+        try:
+            with open(self.summary_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"days": {}, "segments": {}}
+
+    def _summary_token(self):
+        try:
+            st = os.stat(self.summary_path)
+        except FileNotFoundError:
+            return None
+        return f"{st.st_ino}-{st.st_size}-{st.st_mtime_ns}"
+
+    def append(self, entry):
+        self._write(*self._encode_many([entry]))
+
+    def append_many(self, entries):
+        payload, ids = self._encode_many(entries)
+        if payload:
+            self._write(payload, ids)
+
+    def _resolve(self, item):
+        """Valor decodificado de una línea; carga la tabla de soluciones si falta un ID."""
+        if isinstance(item, DiagnosisRecord) and item.solution_id is not None \
+                and item.solution_id not in solutions:
+            self._sync_solutions()
+        return item
+
+    def _entry(self, item):
+        item = self._resolve(item)
+        return item.as_dict() if isinstance(item, DiagnosisRecord) else item
+
+    def _report_corrupt(self, path, inode):
+        def report(offset, line, error):
+            key = (inode(), offset)
+            if key not in self.corrupt:
+                self.corrupt[key] = str(error)
+                logger.warning("Registro corrupto en %s (offset %d, se ignora): %s",
+                               path, offset, error)
+        return report
+
+    def _open(self, path=None):
+        """``HistoryReader`` abierto sobre el historial (o un segmento), o None si no existe."""
+        reader = HistoryReader(path or self.path)
+        reader.on_corrupt = self._report_corrupt(reader.path, lambda: reader.inode)
+        try:
+            return reader.open()
+        except FileNotFoundError:
+            return None
+
+    def segment_records(self, path, compressed):
+        """Registros de un segmento rotado (``DiagnosisRecord`` o valores crudos)."""
+        if compressed:
+            try:
+                inode = os.stat(path).st_ino
+                for _, item in read_compressed(path, self._report_corrupt(path, lambda: inode)):
+                    yield self._resolve(item)
+            except FileNotFoundError:
+                # La retención lo borró mientras se listaba
+                return
+            return
+        reader = self._open(path)
+        if reader is None:
+            return
+        with reader:
+            for _, _, item in reader.forward():
+                yield self._resolve(item)
+
+    def iter(self):
+        """Recorre el historial registro por registro sin cargarlo entero en memoria."""
+        for item in self.records():
+            yield item.as_dict() if isinstance(item, DiagnosisRecord) else item
+
+    def records(self):
+        """Como ``iter``, pero con los diagnósticos como ``DiagnosisRecord``."""
+        for path, compressed in self.segments():
+            yield from self.segment_records(path, compressed)
+        reader = self._open()
+        if reader is None:
+            return
+        with reader:
+            for _, _, item in reader.forward():
+                yield self._resolve(item)
+
+    def load(self):
+        """Historial completo en memoria, como registros compactos."""
+        return list(self.records())
+
+    def recent(self, n):
+        """Los ``n`` registros más recientes (el más nuevo primero), leídos desde el final."""
+        if n <= 0:
+            return []
+        return self.page(limit=n, order="desc")[0]
+
+    def read_since(self, cursor):
+        """
+        Registros completos escritos después de ``cursor``.
+
+        Devuelve ``(registros, nuevo_cursor, completo)``; ``completo`` indica
+        que se leyó desde el principio porque el cursor ya no es válido (o es
+        la primera lectura) y el llamador debe descartar su estado anterior.
+        Una lectura completa empieza con los resúmenes de los segmentos
+        compactados (``ArchivedTotals``) y sigue con los segmentos pendientes
+        y el archivo activo.
+        """
+        token = self._summary_token()
+        if cursor is not None and cursor[0] == token:
+            result = self._read_incremental(cursor)
+            if result is not None:
+                return result
+
+        with self.segments_lock():
+            token = self._summary_token()
+            entries = [ArchivedTotals(day) for day in self.summary()["days"].values()]
+            # El activo se abre antes de listar los segmentos: si rota en el
+            # medio, el segmento nuevo es este mismo archivo y no se lee dos veces
+            reader = self._open()
+            active = reader.inode if reader is not None else None
+            for path, compressed in self.segments():
+                if not compressed and os.stat(path).st_ino != active:
+                    entries.extend(self._entry(item) for item in self.segment_records(path, False))
+            if reader is None:
+                return entries, (token, None, 0), True
+            with reader:
+                entries.extend(self._entry(item) for _, _, item in reader.forward())
+                return entries, (token, reader.inode, reader.end), True
+
+    def _read_incremental(self, cursor):
+        """Continúa ``cursor`` en el archivo activo o, si rotó, en su segmento; None si no se puede."""
+        _, inode, offset = cursor
+        reader = self._open()
+        if reader is None:
+            return None
+        with reader:
+            if inode == reader.inode and offset <= reader.size:
+                # Sólo se consumen líneas completas; una escritura en curso se lee después
+                entries = [self._entry(item) for _, _, item in reader.forward(offset)]
+                return entries, (cursor[0], inode, max(offset, reader.end)), False
+
+            # El archivo rotó desde la última lectura: seguir en el segmento
+            # que era el activo y leer completos los posteriores
+            with self.segments_lock():
+                pending = [path for path, compressed in self.segments() if not compressed]
+                inodes = [os.stat(path).st_ino for path in pending]
+                if inode not in inodes:
+                    return None
+                entries = []
+                start = inodes.index(inode)
+                for i, path in enumerate(pending[start:], start):
+                    if inodes[i] == reader.inode:
+                        break
+                    segment = self._open(path)
+                    if segment is None:
+                        return None
+                    with segment:
+                        first = offset if i == start else 0
+                        entries.extend(self._entry(item) for _, _, item in segment.forward(first))
+                entries.extend(self._entry(item) for _, _, item in reader.forward())
+                return entries, (cursor[0], reader.inode, reader.end), False
+
+    def version(self):
+        """Identificador del estado actual del archivo y fecha de última modificación."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return "empty", None
+        return (
+            f"{st.st_ino}-{st.st_size}-{st.st_mtime_ns}-{self._summary_token()}",
+            datetime.fromtimestamp(st.st_mtime, timezone.utc),
+        )
+
+    def _files(self, reader):
+        """
+        Archivos del historial del más antiguo al más nuevo:
+        ``[(clave, ruta, comprimido, inodo, lector)]``.
+
+        La clave de un segmento es su fecha de rotación, que no cambia al
+        comprimirlo; la del archivo activo es su inodo, con el que se lo
+        sigue encontrando después de rotar mientras no se comprima. El activo
+        (``reader``) se abre antes de listar los segmentos, como en
+        ``read_since``, para no leerlo dos veces si rota en el medio.
+        """
+        active = reader.inode if reader is not None else None
+        files = []
+        for path, compressed in self.segments():
+            inode = None if compressed else os.stat(path).st_ino
+            if inode is not None and inode == active:
+                continue
+            stamp = _SEGMENT_RE.search(os.path.basename(path)).group(1)
+            files.append((stamp, path, compressed, inode, None))
+        if reader is not None:
+            files.append((active, self.path, False, active, reader))
+        return files
+
+    def _scan(self, path, compressed, order, bound=None, reader=None):
+        """
+        Registros de un archivo del historial en el orden pedido: ``(offset, registro)``.
+
+        ``bound`` es el offset donde empezar (``asc``, inclusive) o terminar
+        (``desc``, exclusivo).
+        """
+        if compressed:
+            try:
+                inode = os.stat(path).st_ino
+                records = read_compressed(path, self._report_corrupt(path, lambda: inode))
+                if order == "asc":
+                    for offset, item in records:
+                        if bound is None or offset >= bound:
+                            yield offset, item
+                    return
+                # Un gzip no se lee hacia atrás: el segmento (acotado por
+                # rotate_bytes) se carga entero
+                items = [(offset, item) for offset, item in records
+                         if bound is None or offset < bound]
+            except FileNotFoundError:
+                # La retención lo borró mientras se listaba
+                return
+            yield from reversed(items)
+            return
+
+        own = reader is None
+        if own:
+            reader = self._open(path)
+            if reader is None:
+                return
+        try:
+            if order == "asc":
+                for offset, _, item in reader.forward(bound or 0):
+                    yield offset, item
+            else:
+                yield from reader.backward(bound)
+        finally:
+            if own:
+                reader.close()
+
+    def _walk(self, files, cursor, order):
+        """Registros de ``files`` desde ``cursor`` en el orden pedido: ``([clave, offset], registro)``."""
+        if order == "desc":
+            files = files[::-1]
+        first, bound = 0, None
+        if cursor is not None:
+            key, bound = cursor
+            first = next((i for i, f in enumerate(files) if key in (f[0], f[3])), None)
+            if first is None:
+                raise ValueError("cursor inválido: el segmento ya no está disponible")
+        for i, (key, path, compressed, _, reader) in enumerate(files[first:], first):
+            for offset, item in self._scan(path, compressed, order, bound if i == first else None, reader):
+                yield [key, offset], item
+
+    def page(self, cursor=None, limit=50, order="asc", **filters):
+        """
+        Una página del historial filtrado, de los segmentos rotados al archivo
+        activo (o al revés con ``desc``). El cursor es ``[archivo, offset]``:
+        la clave del archivo (ver ``_files``) y el inicio del próximo registro
+        (``asc``) o del último devuelto (``desc``). Devuelve ``(registros,
+        próximo_cursor)``; ValueError si el archivo del cursor ya no está.
+        """
+        items = []
+        # Ordena la lectura respecto de la compactación, como read_since
+        with self.segments_lock():
+            reader = self._open()
+            records = self._walk(self._files(reader), cursor, order)
+            try:
+                for position, item in records:
+                    entry = self._entry(item)
+                    if not matches_filters(entry, **filters):
+                        continue
+                    items.append(entry)
+                    if len(items) >= limit:
+                        following = next(records, None)
+                        if following is None:
+                            return items, None
+                        return items, (following[0] if order == "asc" else position)
+                return items, None
+            finally:
+                records.close()
+                if reader is not None:
+                    reader.close()
+
+    def query(self, limit=None, **filters):
+        result = []
+        for entry in self.iter():
+            if matches_filters(entry, **filters):
+                result.append(entry)
+                if limit is not None and len(result) >= limit:
+                    break
+        return result
+
+    def aggregate(self, group_by, **filters):
+        key_name = GROUP_FIELDS[group_by]
+        groups = {}
+        for entry in self.iter():
+            if not isinstance(entry, dict) or not matches_filters(entry, **filters):
+                continue
+            key = entry.get(key_name)
+            if key is None:
+                continue
+            g = groups.setdefault(key, {"count": 0, "sum": 0.0, "n": 0})
+            g["count"] += 1
+            if entry.get("confidence") is not None:
+                g["sum"] += entry["confidence"]
+                g["n"] += 1
+        return {
+            key: {"count": g["count"], "avg_confidence": g["sum"] / g["n"] if g["n"] else None}
+            for key, g in groups.items()
+        }
+
+    def migrate_from(self, legacy_path: str) -> int:
+        """
+        Migra una única vez el historial antiguo (un array JSON) a JSON Lines.
+
+        El archivo original se renombra a ``<nombre>.migrated`` para que la
+        migración no se repita. Devuelve la cantidad de registros migrados.
+        Si el archivo no es JSON válido se informa en el log y se deja como
+        está (se vuelve a intentar en el próximo arranque).
+        """
+        if not os.path.exists(legacy_path):
+            return 0
+        with file_lock(self.path):
+            if not os.path.exists(legacy_path):
+                return 0
+            try:
+                with open(legacy_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except ValueError as e:
+                logger.warning("No se pudo migrar el historial antiguo %s (se conserva sin cambios): %s",
+                               legacy_path, e)
+                return 0
+            entries = data if isinstance(data, list) else [data]
+
+            payload, ids = self._encode_many(entries)
+            self._persist_solutions(ids)
+            tmp = self.path + ".tmp"
+            with open(tmp, "wb") as out:
+                out.write(payload)
+                if os.path.exists(self.path):
+                    with open(self.path, "rb") as current:
+                        out.write(current.read())
+                out.flush()
+                os.fsync(out.fileno())
+            os.replace(tmp, self.path)
+            os.replace(legacy_path, legacy_path + ".migrated")
+        return len(entries)
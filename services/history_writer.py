@@ -0,0 +1,245 @@
+import atexit
+import logging
+import os
+import signal
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# "request": cada append espera a que su grupo esté escrito (y con fsync);
+# "group": el append vuelve enseguida y el grupo se escribe en segundo plano
+DURABILITY_REQUEST = "request"
+DURABILITY_GROUP = "group"
+
+
+class _Ticket:
+    """Espera de un append con durabilidad por petición hasta que su grupo se escribe."""
+
+    __slots__ = ("done", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.error = None
+
+
+class HistoryWriter:
+    """
+    Escritura diferida (write-behind) del historial con commit en grupo.
+
+    Los appends se encolan y un hilo los escribe de a grupos con
+    ``store.append_many``: un lock y un fsync por grupo en lugar de uno por
+    diagnóstico. Un grupo se escribe al juntar ``max_batch`` registros o a
+    los ``flush_interval`` segundos del primero pendiente (con durabilidad
+    ``request``, en cuanto el hilo está libre: los appends que llegan
+    mientras se escribe un grupo forman el siguiente).
+
+    La cola es acotada: con ``max_pending`` registros pendientes, ``submit``
+    bloquea hasta que haya lugar. ``flush`` espera a que todo lo encolado
+    hasta ese momento esté escrito; se llama al salir (``atexit``) y al
+    recibir SIGTERM. Un grupo que falla se reintenta mientras el escritor
+    está abierto; al cerrar se pierde sólo ese grupo (se cuenta en
+    ``failed``) y se sigue con el resto de la cola.
+    """
+
+    def __init__(self, store, durability=DURABILITY_GROUP, max_pending=10000,
+                 max_batch=500, flush_interval=0.05, on_flush=None):
+        if durability not in (DURABILITY_REQUEST, DURABILITY_GROUP):
+            raise ValueError(f"Durabilidad inválida: {durability}")
+        if max_pending < 1 or max_batch < 1:
+            raise ValueError("max_pending y max_batch deben ser al menos 1")
+        self.store = store
+        self.durability = durability
+        self.max_pending = max_pending
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        # Se llama desde el hilo escritor después de cada grupo escrito
+        self.on_flush = on_flush
+        self._cond = threading.Condition()
+        self._queue = deque()
+        # Registros encolados, escritos y perdidos por errores desde el inicio (para ``flush``)
+        self._submitted = 0
+        self._written = 0
+        self._failed = 0
+        self._oldest = None
+        self._flush_requested = False
+        self._closed = False
+        self._groups = 0
+        self._blocked = 0
+        self._errors = 0
+        self._thread = threading.Thread(target=self._run, name="history-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def submit(self, entries):
+        """
+        Encola ``entries``. Con durabilidad ``request`` vuelve cuando están
+        escritos (y propaga el error si la escritura falló).
+        """
+        entries = list(entries)
+        if not entries:
+            return
+        ticket = _Ticket() if self.durability == DURABILITY_REQUEST else None
+        with self._cond:
+            if self._closed:
+                # Después del cierre no queda hilo escritor: escribir directamente
+                ticket = None
+            else:
+                if len(self._queue) + len(entries) > self.max_pending and self._queue:
+                    self._blocked += 1
+                    while len(self._queue) + len(entries) > self.max_pending and self._queue \
+                            and not self._closed:
+                        self._cond.wait()
+                if not self._closed:
+                    if self._oldest is None:
+                        self._oldest = time.monotonic()
+                    # El ticket va con el último registro: el grupo que lo escribe cierra la espera
+                    for entry in entries[:-1]:
+                        self._queue.append((entry, None))
+                    self._queue.append((entries[-1], ticket))
+                    self._submitted += len(entries)
+                    self._cond.notify_all()
+                    entries = None
+        if entries is not None:
+            self.store.append_many(entries)
+            return
+        if ticket is not None:
+            ticket.done.wait()
+            if ticket.error is not None:
+                raise ticket.error
+
+    def _due(self):
+        if not self._queue:
+            return False
+        if self._closed or self._flush_requested or len(self._queue) >= self.max_batch:
+            return True
+        if self.durability == DURABILITY_REQUEST:
+            return True
+        return time.monotonic() - self._oldest >= self.flush_interval
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._due():
+                    if self._closed and not self._queue:
+                        return
+                    timeout = None
+                    if self._queue:
+                        timeout = max(0.0, self._oldest + self.flush_interval - time.monotonic())
+                    self._cond.wait(timeout)
+                batch = [self._queue.popleft() for _ in range(min(self.max_batch, len(self._queue)))]
+                self._oldest = time.monotonic() if self._queue else None
+                if not self._queue:
+                    self._flush_requested = False
+                # Hay lugar en la cola: liberar a quienes esperaban
+                self._cond.notify_all()
+            self._write(batch)
+
+    def _write(self, batch):
+        tickets = [ticket for _, ticket in batch if ticket is not None]
+        try:
+            self.store.append_many([entry for entry, _ in batch])
+        except Exception as e:
+            with self._cond:
+                self._errors += 1
+            if tickets:
+                # Quien espera recibe el error, como con la escritura síncrona
+                logger.exception("Error al escribir un grupo del historial")
+                for ticket in tickets:
+                    ticket.error = e
+            else:
+                with self._cond:
+                    if not self._closed:
+                        # Nadie espera estos registros: reintentarlos en el próximo grupo
+                        logger.exception("Error al escribir un grupo del historial; se reintenta")
+                        self._queue.extendleft(reversed(batch))
+                        self._oldest = time.monotonic()
+                        self._cond.wait(max(self.flush_interval, 0.1))
+                        return
+                # Al cerrar no se reintenta indefinidamente: se pierde sólo este
+                # grupo y el resto de la cola se sigue escribiendo
+                logger.error("Error al escribir un grupo del historial al cerrar; se pierden %d registros",
+                             len(batch), exc_info=True)
+            with self._cond:
+                self._failed += len(batch)
+                self._cond.notify_all()
+            return
+        else:
+            with self._cond:
+                self._groups += 1
+            if self.on_flush is not None:
+                try:
+                    self.on_flush()
+                except Exception:
+                    logger.exception("Error en el callback posterior a la escritura del historial")
+        finally:
+            for ticket in tickets:
+                ticket.done.set()
+        with self._cond:
+            self._written += len(batch)
+            self._cond.notify_all()
+
+    def _processed(self):
+        return self._written + self._failed
+
+    def flush(self, timeout=None):
+        """
+        Espera a que esté procesado (escrito o perdido por un error, ver
+        ``stats``) todo lo encolado hasta ahora; False si vence ``timeout``.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            target = self._submitted
+            if self._processed() >= target:
+                return True
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._processed() < target and self._thread.is_alive():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return self._processed() >= target
+
+    def close(self, timeout=None):
+        """Escribe lo pendiente y detiene el hilo escritor."""
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "durability": self.durability,
+                "pending": len(self._queue),
+                "groups": self._groups,
+                "written": self._written,
+                "failed": self._failed,
+                "blocked": self._blocked,
+                "errors": self._errors,
+            }
+
+    def install_signal_handlers(self, signals=(signal.SIGTERM,)):
+        """
+        Escribe lo pendiente al recibir ``signals`` antes de seguir con el
+        handler anterior. Sólo se puede desde el hilo principal; si no, no
+        hace nada (queda el ``atexit``).
+        """
+        if threading.current_thread() is not threading.main_thread():
+            return
+        for signum in signals:
+            previous = signal.getsignal(signum)
+
+            def handler(received, frame, previous=previous):
+                self.close(timeout=5.0)
+                if callable(previous):
+                    previous(received, frame)
+                elif previous != signal.SIG_IGN:
+                    signal.signal(received, signal.SIG_DFL)
+                    os.kill(os.getpid(), received)
+
+            signal.signal(signum, handler)
@@ -0,0 +1,550 @@
+"""
+Rutas de la API HTTP, independientes del servidor.
+
+Cada handler recibe un ``ApiRequest`` y devuelve un ``ApiResponse``;
+``app.py`` (Flask/WSGI) y ``asgi.py`` sólo traducen sus peticiones y
+respuestas y registran las rutas de ``ROUTES``, así que una ruta nueva se
+escribe una sola vez y ambos puntos de entrada validan y responden igual.
+
+Los handlers son síncronos y pueden bloquear (inferencia, E/S del
+historial): ``asgi.py`` los ejecuta en el pool de hilos que indica cada
+ruta.
+"""
+import itertools
+import json
+import logging
+
+from werkzeug.datastructures import Headers, MultiDict
+from werkzeug.http import http_date, parse_date, parse_etags, quote_etag
+
+from services import metrics, sse
+from services.catalog import CATALOG_MAX_AGE, VERSIONED_MAX_AGE, catalog, reference_solutions
+from services.diagnosis_service import DiagnosisService
+from services.diagnosis_sessions import InvalidSessionChange, SessionNotFound
+from services.history_api import listing_body, listing_etag, parse_filters, parse_listing
+from services.history_service import HistoryService
+from services.validation import parse_solution_format, parse_top_k, validate_case
+
+logger = logging.getLogger(__name__)
+
+NDJSON_MIMETYPES = ("application/x-ndjson", "application/jsonl")
+
+
+class ApiRequest:
+    """
+    Petición ya recibida por el servidor: método, query string (``args``,
+    un ``MultiDict``), headers, parámetros de la ruta y el cuerpo como
+    iterable de bytes (se lee recién cuando el handler lo pide).
+    """
+
+    def __init__(self, method, args=None, headers=None, body=(), params=None):
+        self.method = method
+        self.args = args if args is not None else MultiDict()
+        self.headers = headers if headers is not None else Headers()
+        self.params = params or {}
+        self._body = body
+        self._data = None
+
+    @property
+    def mimetype(self):
+        return self.headers.get("Content-Type", "").split(";")[0].strip().lower()
+
+    def get_data(self):
+        if self._data is None:
+            self._data = b"".join(self._body)
+        return self._data
+
+    def get_json(self):
+        """Como ``request.get_json(silent=True)`` de Flask: None si no es JSON válido."""
+        mimetype = self.mimetype
+        if mimetype != "application/json" and not mimetype.endswith("+json"):
+            return None
+        try:
+            return json.loads(self.get_data())
+        except ValueError:
+            return None
+
+    def lines(self):
+        """Líneas del cuerpo a medida que llegan (para NDJSON)."""
+        pending = b""
+        for chunk in self._body:
+            pending += chunk
+            *complete, pending = pending.split(b"\n")
+            yield from complete
+        if pending:
+            yield pending
+
+
+class ApiResponse:
+    """
+    Respuesta de un handler. ``body`` se envía como JSON salvo que sea
+    ``str``/``bytes``; ``stream`` (iterable de ``str``) reemplaza al cuerpo
+    en las respuestas que se envían por partes.
+    """
+
+    def __init__(self, body=None, status=200, mimetype="application/json", headers=(), stream=None):
+        self.body = body
+        self.status = status
+        self.mimetype = mimetype
+        self.headers = list(headers)
+        self.stream = stream
+
+
+def _error(body, status):
+    return ApiResponse(body, status=status)
+
+
+def _server_error(e, message, *args):
+    logger.exception(message, *args)
+    return _error({"error": str(e)}, 500)
+
+
+# ========== DIAGNÓSTICO ==========
+
+def diagnose(request):
+    """
+    Endpoint principal para ejecutar el diagnóstico del sistema experto.
+
+    Recibe:
+        JSON con estructura:
+        {
+            "symptoms": [{"type": "login", "description": "cannot_login", ...}],
+            "system_info": {"browser": "Chrome", "connection_type": "wifi", ...},
+            "server_status": {"is_online": true, ...}
+        }
+
+    Retorna:
+        JSON con el diagnóstico:
+        {
+            "diagnosis": "login",
+            "cause": "browser",
+            "solution": "...",
+            "confidence": 0.95
+        }
+
+        Con ``?top_k=N`` (1 a 10) devuelve además los N diagnósticos de mayor
+        confianza de cada tipo de problema, sin repetir (tipo, causa):
+        {
+            "best": {"diagnosis": "login", "cause": "browser", ...},
+            "diagnoses": {"login": [{...}, ...], "video": [{...}]}
+        }
+
+        Con ``?solutions=id`` cada diagnóstico trae ``solution_id`` (ver
+        /api/catalog) en lugar del texto de la solución.
+    """
+    try:
+        # 1. Obtener datos JSON de la petición
+        data = request.get_json()
+
+        # 2. Validar síntomas, navegador, tipo de conexión y parámetros
+        error = validate_case(data)
+        if error:
+            return _error(error, 400)
+        top_k, error = parse_top_k(request.args.get("top_k"))
+        if error:
+            return _error(error, 400)
+        solution_format, error = parse_solution_format(request.args.get("solutions"))
+        if error:
+            return _error(error, 400)
+
+        # 3. Ejecutar el sistema experto y guardar en historial
+        trace = metrics.new_trace() if metrics.TIMING_HEADER else None
+        if top_k is None:
+            result = DiagnosisService.run(data, persist=True, trace=trace)
+        else:
+            result = DiagnosisService.run_ranked(data, top_k, persist=True, trace=trace)
+        if solution_format == "id":
+            result = reference_solutions(result)
+
+        # 4. Log del resultado para depuración
+        logger.debug("Diagnóstico: %s", result)
+
+        # 5. Retornar diagnóstico en formato JSON
+        headers = []
+        if trace is not None:
+            headers.append((metrics.TIMING_HEADER_NAME, metrics.timing_header(trace)))
+        return ApiResponse(result, headers=headers)
+
+    except Exception as e:
+        # Manejo de errores: log y respuesta HTTP 500
+        return _server_error(e, "Error en /api/diagnose")
+
+
+def diagnose_stream(request):
+    """
+    Diagnóstico en streaming con Server-Sent Events.
+
+    Recibe el mismo caso que /api/diagnose (y ``?solutions=id``). Envía un
+    evento por diagnóstico a medida que se disparan las reglas y, al final,
+    el mismo resultado que /api/diagnose:
+        event: diagnosis
+        data: {"diagnosis": "video", "cause": "network", ...}
+
+        event: best
+        data: {"diagnosis": "login", "cause": "browser", ...}
+
+    El diagnóstico genérico de un tipo (regla de respaldo) sólo se envía si
+    ninguna otra regla diagnosticó ese tipo. Un error durante la inferencia
+    se informa con ``event: error``.
+    """
+    data = request.get_json()
+    error = validate_case(data)
+    if error:
+        return _error(error, 400)
+    solution_format, error = parse_solution_format(request.args.get("solutions"))
+    if error:
+        return _error(error, 400)
+
+    def generate():
+        events = DiagnosisService.stream(data, persist=True)
+        try:
+            for name, payload in events:
+                if solution_format == "id":
+                    payload = reference_solutions(payload)
+                yield sse.event(name, payload)
+        except Exception as e:
+            logger.exception("Error en /api/diagnose/stream")
+            yield sse.event("error", {"error": str(e)})
+        finally:
+            events.close()
+
+    return ApiResponse(mimetype=sse.MIMETYPE, headers=sse.HEADERS, stream=generate())
+
+
+def _batch_cases(request):
+    """
+    Casos de un lote: array JSON, {"cases": [...]} o NDJSON (una línea por caso).
+
+    Con NDJSON el cuerpo se lee de forma incremental. Cada elemento es
+    ("caso", None) o (None, "error de parseo").
+    """
+    if request.mimetype in NDJSON_MIMETYPES:
+        for raw in request.lines():
+            line = raw.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line), None
+            except ValueError as e:
+                yield None, f"JSON inválido: {e}"
+        return
+
+    data = request.get_json()
+    if isinstance(data, dict):
+        data = data.get("cases")
+    if not isinstance(data, list):
+        raise ValueError("Debe enviar una lista de casos, {'cases': [...]} o NDJSON")
+    for case in data:
+        yield case, None
+
+
+def diagnose_batch(request):
+    """
+    Diagnóstico masivo (p. ej. para re-procesar tickets de soporte).
+
+    Recibe una lista de casos con la misma estructura que /api/diagnose, como
+    array JSON, {"cases": [...]} o NDJSON (Content-Type: application/x-ndjson).
+
+    Retorna NDJSON en streaming, una línea por caso y en el mismo orden:
+        {"index": 0, "status": 200, "result": {"diagnosis": "login", ...}}
+        {"index": 1, "status": 400, "error": "Navegador inválido: Netscape", "allowed": [...]}
+
+    Todos los casos comparten los motores de inferencia y el historial se
+    escribe agrupado en lugar de una escritura por caso.
+    """
+    cases = _batch_cases(request)
+    try:
+        # Parsear el primer elemento ahora para responder 400 si el cuerpo es inválido
+        first = next(cases, None)
+    except ValueError as e:
+        return _error({"error": str(e)}, 400)
+
+    def generate():
+        with DiagnosisService.batch(persist=True) as batch:
+            items = itertools.chain([first], cases) if first is not None else cases
+            for index, (case, parse_error) in enumerate(items):
+                if parse_error:
+                    item = {"status": 400, "error": parse_error}
+                else:
+                    error = validate_case(case)
+                    if error:
+                        item = dict(error, status=400)
+                    else:
+                        try:
+                            item = {"status": 200, "result": batch.run(case)}
+                        except Exception as e:
+                            logger.exception("Error en /api/diagnose/batch (caso %d)", index)
+                            item = {"status": 500, "error": str(e)}
+                yield json.dumps(dict(item, index=index), ensure_ascii=False) + "\n"
+
+    return ApiResponse(mimetype="application/x-ndjson", stream=generate())
+
+
+# ========== SESIONES ==========
+
+_SESSION_NOT_FOUND = {"error": "Sesión inexistente o expirada"}
+
+
+def _session_params(request):
+    """(top_k, formato de soluciones, None) o (None, None, respuesta de error 400)."""
+    top_k, error = parse_top_k(request.args.get("top_k"))
+    if error:
+        return None, None, _error(error, 400)
+    solution_format, error = parse_solution_format(request.args.get("solutions"))
+    if error:
+        return None, None, _error(error, 400)
+    return top_k, solution_format, None
+
+
+def _session_response(session_id, case, result, solution_format, status=200):
+    if solution_format == "id":
+        result = reference_solutions(result)
+    return ApiResponse({"session_id": session_id, "case": case, "result": result}, status=status)
+
+
+def create_session(request):
+    """
+    Abre una sesión de diagnóstico incremental.
+
+    Recibe el mismo caso que /api/diagnose (y los mismos ``top_k`` y
+    ``solutions``). Retorna 201:
+        {"session_id": "...", "case": {...}, "result": {"diagnosis": "login", ...}}
+
+    El servidor conserva la memoria de trabajo del motor: los cambios
+    posteriores (PATCH /api/sessions/<id>) sólo declaran o retractan los
+    hechos afectados. Las sesiones vencen tras DIAGNOSIS_SESSION_TTL segundos
+    sin uso.
+    """
+    try:
+        data = request.get_json()
+        error = validate_case(data)
+        if error:
+            return _error(error, 400)
+        top_k, solution_format, error = _session_params(request)
+        if error:
+            return error
+        session_id, result = DiagnosisService.start_session(data, top_k, persist=True)
+        return _session_response(session_id, data, result, solution_format, status=201)
+    except InvalidSessionChange as e:
+        return _error(e.body, 400)
+    except Exception as e:
+        return _server_error(e, "Error en /api/sessions")
+
+
+def diagnosis_session(request):
+    """
+    GET: caso y diagnóstico actuales de la sesión.
+
+    PATCH: cambia el caso y lo vuelve a diagnosticar, por ejemplo:
+        {"add": [{"type": "video", "description": "buffering"}],
+         "retract": [{"type": "login", "description": "cannot_login"}],
+         "system_info": {"connection_type": "cellular"}}
+    ``system_info`` / ``server_status`` se combinan con los actuales (null
+    borra un campo). El diagnóstico es el mismo que daría /api/diagnose con
+    el caso resultante y se guarda en el historial.
+
+    DELETE: cierra la sesión (204).
+
+    404 si la sesión no existe o venció.
+    """
+    session_id = request.params["session_id"]
+    try:
+        if request.method == "DELETE":
+            if not DiagnosisService.end_session(session_id):
+                return _error(_SESSION_NOT_FOUND, 404)
+            return ApiResponse(b"", status=204, mimetype=None)
+        top_k, solution_format, error = _session_params(request)
+        if error:
+            return error
+        if request.method == "GET":
+            case, result = DiagnosisService.get_session(session_id, top_k)
+        else:
+            changes = request.get_json()
+            case, result = DiagnosisService.update_session(session_id, changes, top_k, persist=True)
+        return _session_response(session_id, case, result, solution_format)
+    except SessionNotFound:
+        return _error(_SESSION_NOT_FOUND, 404)
+    except InvalidSessionChange as e:
+        return _error(e.body, 400)
+    except Exception as e:
+        return _server_error(e, "Error en /api/sessions/<id>")
+
+
+# ========== HISTORIAL ==========
+
+def _validators(etag, last_modified):
+    headers = [("ETag", quote_etag(etag))]
+    if last_modified is not None:
+        headers.append(("Last-Modified", http_date(last_modified)))
+    # El historial cambia con cada diagnóstico: siempre revalidar
+    headers.append(("Cache-Control", "no-cache"))
+    return headers
+
+
+def _not_modified(request, etag, last_modified):
+    """True si el cliente ya tiene esta versión del historial."""
+    if request.headers.get("If-None-Match"):
+        return parse_etags(request.headers["If-None-Match"]).contains(etag)
+    since = parse_date(request.headers.get("If-Modified-Since"))
+    return bool(since and last_modified and last_modified.replace(microsecond=0) <= since)
+
+
+def get_history(request):
+    """
+    Endpoint para obtener el historial de diagnósticos previos.
+
+    Parámetros opcionales (query string):
+        problem_type, cause, min_confidence, max_confidence, since, until:
+            filtros sobre el historial
+        limit, cursor, order ("asc" o "desc"): paginación
+
+    Retorna:
+        Sin paginación, JSON con lista de diagnósticos anteriores:
+        [
+            {"diagnosis": "login", "cause": "browser", "timestamp": "...", ...},
+            {"diagnosis": "video", "cause": "network", "timestamp": "...", ...}
+        ]
+        Con "limit" o "cursor", una página:
+        {"items": [...], "next_cursor": "..." | null}
+
+    Soporta GET condicional (ETag / Last-Modified): si el historial no cambió
+    responde 304 sin cuerpo.
+    """
+    try:
+        listing = parse_listing(request.args)
+    except ValueError as e:
+        return _error({"error": f"Parámetro inválido: {e}"}, 400)
+
+    try:
+        token, last_modified = HistoryService.version()
+        etag = listing_etag(token, request.args.items(multi=True))
+        if _not_modified(request, etag, last_modified):
+            return ApiResponse(b"", status=304, mimetype=None, headers=_validators(etag, last_modified))
+
+        try:
+            body = listing_body(listing)
+        except ValueError as e:
+            # El cursor apunta a un segmento del historial que ya no está disponible
+            return _error({"error": f"Parámetro inválido: {e}"}, 400)
+        return ApiResponse(body, headers=_validators(etag, last_modified))
+    except Exception as e:
+        # Manejo de errores
+        return _server_error(e, "Error al obtener historial")
+
+
+def aggregate_history(request):
+    """
+    Cantidad de diagnósticos y confianza promedio agrupados en el servidor.
+
+    Parámetros: group_by ("problem_type" o "cause") y los mismos filtros que /api/diagnosis.
+
+    Retorna:
+        {"group_by": "cause", "groups": {"browser": {"count": 3, "avg_confidence": 0.9}, ...}}
+    """
+    group_by = request.args.get("group_by", "problem_type")
+    if group_by not in ("problem_type", "cause"):
+        return _error({"error": f"group_by inválido: {group_by}", "allowed": ["cause", "problem_type"]}, 400)
+    try:
+        filters = parse_filters(request.args)
+    except ValueError as e:
+        return _error({"error": f"Filtro inválido: {e}"}, 400)
+
+    try:
+        groups = HistoryService.aggregate(group_by, **filters)
+        return ApiResponse({"group_by": group_by, "groups": groups})
+    except Exception as e:
+        return _server_error(e, "Error al agregar historial")
+
+
+def history_stats(request):
+    """
+    Agregados del dashboard calculados en el servidor.
+
+    Retorna:
+        {
+            "total": 12,
+            "confidence": {"high": 7, "medium": 4, "low": 1},
+            "problem_counts": {"login": 5, "video": 3, ...},
+            "cause_counts": {"browser": 6, "network": 2, ...},
+            "avg_confidence": {"login": 0.88, "video": 0.8, ...}
+        }
+    """
+    try:
+        return ApiResponse(HistoryService.stats())
+    except Exception as e:
+        return _server_error(e, "Error al calcular estadísticas")
+
+
+# ========== CATÁLOGO Y MÉTRICAS ==========
+
+def _cacheable(version, max_age, immutable=False):
+    cache_control = f"public, max-age={max_age}" + (", immutable" if immutable else "")
+    return [("ETag", quote_etag(version)), ("Cache-Control", cache_control)]
+
+
+def get_catalog(request):
+    """
+    Catálogo de la base de conocimiento, para resolver los ``solution_id``:
+        {
+            "version": "9b1c...",
+            "symptoms": {"login": ["cannot_login", ...], ...},
+            "causes": {"browser": ["incompatible_browser", ...], ...},
+            "solutions": {"2f376362": "No podés iniciar sesión...", ...}
+        }
+
+    ``/api/catalog/<version>`` es inmutable (se cachea por un año); con otra
+    versión responde 404 indicando la vigente.
+    """
+    version = request.params.get("version")
+    try:
+        current = catalog()
+    except Exception as e:
+        return _server_error(e, "Error al armar el catálogo")
+    if version is not None and version != current.version:
+        return _error({"error": f"Versión de catálogo desconocida: {version}",
+                       "version": current.version}, 404)
+    max_age = CATALOG_MAX_AGE if version is None else VERSIONED_MAX_AGE
+    headers = _cacheable(current.version, max_age, version is not None)
+    if parse_etags(request.headers.get("If-None-Match")).contains(current.version):
+        return ApiResponse(b"", status=304, mimetype=None, headers=headers)
+    return ApiResponse(current.body, headers=headers)
+
+
+def get_symptoms(request):
+    """Síntomas reconocidos por tipo de problema: {"symptoms": {"login": [...], ...}}."""
+    try:
+        current = catalog()
+    except Exception as e:
+        return _server_error(e, "Error al listar síntomas")
+    headers = _cacheable(current.version, CATALOG_MAX_AGE)
+    if parse_etags(request.headers.get("If-None-Match")).contains(current.version):
+        return ApiResponse(b"", status=304, mimetype=None, headers=headers)
+    return ApiResponse({"symptoms": current.symptoms}, headers=headers)
+
+
+def prometheus_metrics(request):
+    """
+    Métricas en formato de texto de Prometheus: pool de motores, caché de
+    resultados y, con DIAGNOSIS_METRICS=1, tiempos por fase, reglas
+    activadas/disparadas y tamaño de la agenda.
+    """
+    return ApiResponse(DiagnosisService.metrics_text(), mimetype="text/plain; version=0.0.4")
+
+
+# Rutas de la API: (regla, métodos, handler, pool de hilos en ASGI). Las
+# reglas usan la sintaxis de Flask; ``<nombre>`` llega en ``request.params``.
+# Las que diagnostican corren en el pool de inferencia y el resto en el de E/S.
+ROUTES = (
+    ("/api/diagnose", ("POST",), diagnose, "inference"),
+    ("/api/diagnose/stream", ("POST",), diagnose_stream, "inference"),
+    ("/api/diagnose/batch", ("POST",), diagnose_batch, "inference"),
+    ("/api/sessions", ("POST",), create_session, "inference"),
+    ("/api/sessions/<session_id>", ("GET", "PATCH", "DELETE"), diagnosis_session, "inference"),
+    ("/api/diagnosis", ("GET",), get_history, "io"),
+    ("/api/diagnosis/aggregate", ("GET",), aggregate_history, "io"),
+    ("/api/diagnosis/stats", ("GET",), history_stats, "io"),
+    ("/api/catalog", ("GET",), get_catalog, "io"),
+    ("/api/catalog/<version>", ("GET",), get_catalog, "io"),
+    ("/api/symptoms", ("GET",), get_symptoms, "io"),
+    ("/metrics", ("GET",), prometheus_metrics, "io"),
+)
@@ -0,0 +1,150 @@
+import bisect
+import os
+import threading
+import time
+
+# Instrumentación opcional: con DIAGNOSIS_METRICS=1 cada diagnóstico registra
+# tiempos por fase, reglas activadas/disparadas y tamaño de la agenda.
+# Desactivada, el costo es una comparación ``trace is None`` por fase.
+ENABLED = os.environ.get("DIAGNOSIS_METRICS", "0").lower() in ("1", "true", "yes")
+# Agrega el header X-Diagnosis-Timing a /api/diagnose; las trazas de esas
+# peticiones sólo se suman a /metrics si además DIAGNOSIS_METRICS está activa
+TIMING_HEADER = os.environ.get("DIAGNOSIS_TIMING_HEADER", "0").lower() in ("1", "true", "yes")
+
+TIMING_HEADER_NAME = "X-Diagnosis-Timing"
+
+_SECONDS_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128)
+
+_HELP = {
+    "diagnosis_requests_total": ("counter", "Diagnósticos resueltos, por origen del resultado"),
+    "diagnosis_phase_seconds": ("histogram", "Duración de cada fase del diagnóstico"),
+    "diagnosis_rule_activations_total": ("counter", "Activaciones agregadas a la agenda, por regla"),
+    "diagnosis_rule_fires_total": ("counter", "Reglas disparadas, por regla"),
+    "diagnosis_agenda_size": ("histogram", "Tamaño máximo de la agenda durante un diagnóstico"),
+}
+
+
+def new_trace():
+    """Traza de un diagnóstico; el motor completa las fases ``engine.*`` y las reglas."""
+    return {"phases": {}, "activated": [], "fired": [], "agenda_size": 0, "source": None}
+
+
+def lap(trace, phase, start):
+    """Suma a ``phase`` el tiempo desde ``start`` y devuelve el instante actual."""
+    now = time.perf_counter()
+    phases = trace["phases"]
+    phases[phase] = phases.get(phase, 0.0) + (now - start)
+    return now
+
+
+def timing_header(trace):
+    """Valor del header con el formato de Server-Timing: ``fase;dur=ms, ...``."""
+    parts = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in trace["phases"].items()]
+    if trace.get("source"):
+        parts.append(f'source;desc="{trace["source"]}"')
+    return ", ".join(parts)
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    body = ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels)
+    return "{" + body + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class MetricsRegistry:
+    """Contadores e histogramas en memoria, expuestos en formato de texto de Prometheus."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+
+    def inc(self, name, labels=(), value=1):
+        with self._lock:
+            key = (name, labels)
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, labels=(), buckets=_SECONDS_BUCKETS):
+        with self._lock:
+            key = (name, labels)
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(buckets)
+            histogram.observe(value)
+
+    def record(self, trace):
+        """Incorpora la traza de un diagnóstico terminado."""
+        if trace.get("source"):
+            self.inc("diagnosis_requests_total", (("source", trace["source"]),))
+        for phase, seconds in trace["phases"].items():
+            self.observe("diagnosis_phase_seconds", seconds, (("phase", phase),))
+        for rule in trace["activated"]:
+            self.inc("diagnosis_rule_activations_total", (("rule", rule),))
+        for rule in trace["fired"]:
+            self.inc("diagnosis_rule_fires_total", (("rule", rule),))
+        if trace["fired"] or trace["activated"]:
+            self.observe("diagnosis_agenda_size", trace["agenda_size"], buckets=_SIZE_BUCKETS)
+
+    def render(self, gauges=None):
+        """
+        Texto de exposición de Prometheus. ``gauges`` agrega valores
+        instantáneos: ``{nombre: (ayuda, valor)}``.
+        """
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted(self._histograms.items(), key=lambda kv: kv[0])
+            snapshots = [(key, list(h.buckets), list(h.counts), h.sum, h.count) for key, h in histograms]
+
+        lines = []
+        declared = set()
+
+        def declare(name, kind, help_text):
+            if name not in declared:
+                declared.add(name)
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for name, (help_text, value) in sorted((gauges or {}).items()):
+            if value is None:
+                continue
+            declare(name, "gauge", help_text)
+            lines.append(f"{name} {_number(value)}")
+
+        for (name, labels), value in counters:
+            kind, help_text = _HELP.get(name, ("counter", name))
+            declare(name, kind, help_text)
+            lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+        for (name, labels), buckets, counts, total, count in snapshots:
+            kind, help_text = _HELP.get(name, ("histogram", name))
+            declare(name, kind, help_text)
+            cumulative = 0
+            for bound, n in zip(list(buckets) + ["+Inf"], counts):
+                cumulative += n
+                le = bound if bound == "+Inf" else _number(bound)
+                lines.append(f"{name}_bucket{_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,136 @@
+import atexit
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+logger = logging.getLogger(__name__)
+
+# Motores del proceso worker, uno por combinación de familias de reglas
+_worker_engines = {}
+
+
+def _init_worker():
+    # Importar experta y el motor al arrancar, no en el primer diagnóstico
+    import knowledge_base.expert_system  # noqa: F401
+
+
+def _worker_diagnose(data):
+    from knowledge_base.expert_system import engine_class
+    from knowledge_base.rules import families_for
+
+    families = families_for(data)
+    engine = _worker_engines.get(families)
+    if engine is None:
+        engine = _worker_engines[families] = engine_class(families)()
+    return engine.diagnose(data)
+
+
+class ProcessDiagnosisExecutor:
+    """
+    Ejecuta ``EdTechExpertSystem.diagnose`` en un pool de procesos.
+
+    La inferencia de experta es Python puro y dentro de un mismo proceso
+    queda serializada por el GIL; con procesos, las peticiones concurrentes
+    aprovechan varios núcleos. Cada worker compila un motor por combinación
+    de familias de reglas la primera vez que la necesita y lo reutiliza
+    (``diagnose`` ya hace ``reset`` en cada llamada).
+
+    Si el pool no responde dentro de ``timeout`` segundos o se rompe (por
+    ejemplo, un worker terminado por el sistema), la llamada se resuelve con
+    ``fallback`` en el proceso actual y el pool se recrea. Tras un timeout
+    los workers del pool anterior se terminan: si no, el que quedó ocupado
+    con la petición vencida seguiría sin atender otras y unos pocos
+    timeouts bloquearían todo el pool.
+    """
+
+    def __init__(self, workers: int, timeout: float = 10.0):
+        if workers < 1:
+            raise ValueError("La cantidad de workers debe ser al menos 1")
+        self.workers = workers
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._executor = None
+        self._calls = 0
+        self._fallbacks = 0
+        self._timeouts = 0
+        self._restarts = 0
+        atexit.register(self.shutdown)
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # "spawn": hacer fork de un servidor con hilos puede heredar locks tomados
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def _restart(self, executor, terminate=False):
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            self._restarts += 1
+        # Los procesos se toman antes de shutdown, que puede vaciar el diccionario
+        processes = list((executor._processes or {}).values()) if terminate else []
+        executor.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+
+    def diagnose(self, data, fallback, timeout=None):
+        """
+        Diagnostica ``data`` en un worker; ``fallback(data)`` se usa si el
+        pool no está disponible. Los errores de la propia inferencia (por
+        ejemplo, datos inválidos) se propagan sin reintentar.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            self._calls += 1
+        executor = None
+        try:
+            executor = self._get_executor()
+            future = executor.submit(_worker_diagnose, data)
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                logger.warning(
+                    "El pool de procesos no respondió en %.1fs; se diagnostica en el proceso", timeout
+                )
+                with self._lock:
+                    self._timeouts += 1
+                if not future.cancel():
+                    # La petición ya está en un worker: se recrea el pool terminando sus procesos
+                    self._restart(executor, terminate=True)
+        except BrokenProcessPool as e:
+            logger.warning("Pool de procesos roto (%s); se recrea y se diagnostica en el proceso", e)
+            if executor is not None:
+                self._restart(executor)
+        except OSError as e:
+            # No se pudieron crear los procesos (límites del sistema, entorno sin fork/spawn)
+            logger.warning("Pool de procesos no disponible (%s); se diagnostica en el proceso", e)
+        with self._lock:
+            self._fallbacks += 1
+        return fallback(data)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "timeout": self.timeout,
+                "calls": self._calls,
+                "fallbacks": self._fallbacks,
+                "timeouts": self._timeouts,
+                "restarts": self._restarts,
+            }
@@ -0,0 +1,119 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+# Valor devuelto por ``ResultCache.get`` cuando la clave no está (None es un resultado válido)
+MISS = object()
+
+
+def canonical_key(data):
+    """
+    Clave de caché de un caso: sólo los campos que leen las reglas.
+
+    Las reglas consultan ``type`` y ``description`` de cada síntoma y
+    ``browser`` / ``connection_type`` de SystemInfo. El orden de los síntomas
+    se conserva porque la agenda de experta (y con ella el diagnóstico
+    elegido ante empates) depende del orden en que se declaran los hechos;
+    los síntomas idénticos se colapsan igual que en la lista de hechos.
+
+    Devuelve None si el motor rechazaría la entrada: esos casos no se cachean
+    para que sigan fallando igual que sin caché.
+    """
+    # Importación diferida: experta se carga sólo cuando hace falta el motor
+    from knowledge_base.facts import ServerStatus, Symptom, SystemInfo
+
+    try:
+        symptoms = data.get("symptoms", [])
+        facts = [Symptom(**s) for s in symptoms]
+        sysinfo = data.get("system_info", {})
+        facts.append(SystemInfo(**sysinfo))
+        if "server_status" in data:
+            facts.append(ServerStatus(**data["server_status"]))
+        for fact in facts:
+            fact.validate()
+
+        seen = set()
+        key = []
+        for symptom in symptoms:
+            identity = frozenset(symptom.items())
+            if identity in seen:
+                continue
+            seen.add(identity)
+            key.append((symptom["type"], symptom["description"]))
+    except Exception:
+        return None
+    return (tuple(key), sysinfo.get("browser"), sysinfo.get("connection_type"))
+
+
+class ResultCache:
+    """
+    Caché LRU con vencimiento (TTL) de resultados de diagnóstico.
+
+    ``version`` identifica la base de conocimiento con la que se calcularon
+    los resultados (la huella de las reglas cargadas en el proceso) y forma
+    parte de cada clave: un resultado nunca se sirve para otras reglas.
+
+    Guarda una copia profunda de cada resultado y devuelve otra en cada
+    acierto: quien modifica lo que recibe (por ejemplo, el diagnóstico
+    ``best`` de un resultado con ranking) no altera lo que ven los
+    aciertos siguientes.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600.0, version=None):
+        if maxsize < 0:
+            raise ValueError("El tamaño de la caché no puede ser negativo")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version = version
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def enabled(self):
+        return self.maxsize > 0
+
+    def get(self, key):
+        key = (self.version, key)
+        now = time.monotonic()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None or (self.ttl and item[1] <= now):
+                if item is not None:
+                    del self._entries[key]
+                self._misses += 1
+                return MISS
+            self._entries.move_to_end(key)
+            self._hits += 1
+            value = item[0]
+        return copy.deepcopy(value)
+
+    def put(self, key, value):
+        if not self.enabled:
+            return
+        value = copy.deepcopy(value)
+        key = (self.version, key)
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
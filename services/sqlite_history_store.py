@@ -0,0 +1,235 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+
+from knowledge_base.solutions import solutions
+from services.history_record import DiagnosisRecord, decode
+from services.history_store import FSYNC_ALWAYS, FSYNC_NEVER
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT,
+    problem_type TEXT,
+    cause TEXT,
+    confidence REAL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_history_problem_type ON history (problem_type);
+CREATE INDEX IF NOT EXISTS idx_history_cause ON history (cause);
+CREATE INDEX IF NOT EXISTS idx_history_confidence ON history (confidence);
+CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp);
+CREATE TABLE IF NOT EXISTS solutions (
+    id TEXT PRIMARY KEY,
+    text TEXT NOT NULL
+);
+"""
+
+# Columnas por las que se puede agrupar (nombre público -> columna)
+GROUP_COLUMNS = {"problem_type": "problem_type", "cause": "cause"}
+
+
+class SqliteHistoryStore:
+    """
+    Historial en SQLite (modo WAL) con índices para las consultas del dashboard.
+
+    Cada hilo usa su propia conexión, creada la primera vez que la necesita;
+    WAL permite que los lectores no bloqueen a la escritura en curso. Como en
+    JSON Lines, ``payload`` guarda el registro compacto y los textos de
+    solución van una sola vez a la tabla ``solutions``.
+    """
+
+    def __init__(self, path: str, fsync: str = FSYNC_ALWAYS):
+        if fsync not in (FSYNC_ALWAYS, FSYNC_NEVER):
+            raise ValueError(f"Política de fsync inválida: {fsync}")
+        self.path = path
+        self.fsync = fsync
+        d = os.path.dirname(path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        self._persisted_ids = set()
+        self._conn().executescript(_SCHEMA)
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "PRAGMA synchronous=%s" % ("FULL" if self.fsync == FSYNC_ALWAYS else "NORMAL")
+            )
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        self._local = threading.local()
+
+    @staticmethod
+    def _row(entry, record):
+        e = entry if isinstance(entry, dict) else {}
+        payload = record.to_row() if record is not None else entry
+        return (
+            e.get("timestamp"),
+            e.get("diagnosis"),
+            e.get("cause"),
+            e.get("confidence"),
+            json.dumps(payload, ensure_ascii=False, separators=(",", ":")),
+        )
+
+    def append(self, entry):
+        self.append_many([entry])
+
+    def append_many(self, entries):
+        rows = []
+        ids = set()
+        for entry in entries:
+            record = DiagnosisRecord.from_entry(entry)
+            rows.append(self._row(entry, record))
+            if record is not None and record.solution_id is not None:
+                ids.add(record.solution_id)
+        ids -= self._persisted_ids
+        conn = self._conn()
+        with conn:
+            if ids:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO solutions (id, text) VALUES (?, ?)",
+                    [(sid, solutions.text(sid)) for sid in sorted(ids)],
+                )
+            conn.executemany(
+                "INSERT INTO history (timestamp, problem_type, cause, confidence, payload) "
+                "VALUES (?, ?, ?, ?, ?)",
+                rows,
+            )
+        self._persisted_ids |= ids
+
+    def _sync_solutions(self):
+        for sid, text in self._conn().execute("SELECT id, text FROM solutions"):
+            solutions.add(sid, text)
+            self._persisted_ids.add(sid)
+
+    def _record(self, payload):
+        """Registro compacto (o valor crudo) guardado en ``payload``."""
+        item = decode(json.loads(payload))
+        if isinstance(item, DiagnosisRecord) and item.solution_id is not None \
+                and item.solution_id not in solutions:
+            self._sync_solutions()
+        return item
+
+    def _entry(self, payload):
+        item = self._record(payload)
+        return item.as_dict() if isinstance(item, DiagnosisRecord) else item
+
+    def count(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM history").fetchone()[0]
+
+    @staticmethod
+    def _where(filters):
+        clauses, params = [], []
+        if filters.get("problem_type") is not None:
+            clauses.append("problem_type = ?")
+            params.append(filters["problem_type"])
+        if filters.get("cause") is not None:
+            clauses.append("cause = ?")
+            params.append(filters["cause"])
+        if filters.get("min_confidence") is not None:
+            clauses.append("confidence >= ?")
+            params.append(filters["min_confidence"])
+        if filters.get("max_confidence") is not None:
+            clauses.append("confidence <= ?")
+            params.append(filters["max_confidence"])
+        if filters.get("since") is not None:
+            clauses.append("timestamp >= ?")
+            params.append(filters["since"])
+        if filters.get("until") is not None:
+            clauses.append("timestamp <= ?")
+            params.append(filters["until"])
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    def iter(self):
+        for (payload,) in self._conn().execute("SELECT payload FROM history ORDER BY id"):
+            yield self._entry(payload)
+
+    def records(self):
+        """Como ``iter``, pero con los diagnósticos como ``DiagnosisRecord``."""
+        for (payload,) in self._conn().execute("SELECT payload FROM history ORDER BY id"):
+            yield self._record(payload)
+
+    def load(self):
+        """Historial completo en memoria, como registros compactos."""
+        return list(self.records())
+
+    def recent(self, n):
+        """Los ``n`` registros más recientes, el más nuevo primero."""
+        rows = self._conn().execute(
+            "SELECT payload FROM history ORDER BY id DESC LIMIT ?", (max(int(n), 0),)
+        )
+        return [self._entry(p) for (p,) in rows]
+
+    def read_since(self, cursor):
+        """Registros con id posterior a ``cursor``; ver ``JsonLinesHistoryStore.read_since``."""
+        full = cursor is None
+        rows = self._conn().execute(
+            "SELECT id, payload FROM history WHERE id > ? ORDER BY id", (cursor or 0,)
+        ).fetchall()
+        new_cursor = rows[-1][0] if rows else (cursor or 0)
+        return [self._entry(p) for _, p in rows], new_cursor, full
+
+    def version(self):
+        """Identificador del estado actual de la tabla y fecha del último registro."""
+        conn = self._conn()
+        lo, hi = conn.execute("SELECT MIN(id), MAX(id) FROM history").fetchone()
+        if hi is None:
+            return "empty", None
+        (timestamp,) = conn.execute("SELECT timestamp FROM history WHERE id = ?", (hi,)).fetchone()
+        try:
+            last_modified = datetime.fromisoformat(timestamp) if timestamp else None
+        except ValueError:
+            last_modified = None
+        return f"{lo}-{hi}", last_modified
+
+    def page(self, cursor=None, limit=50, order="asc", **filters):
+        """Una página del historial filtrado; el cursor es el id del último registro devuelto."""
+        where, params = self._where(filters)
+        if cursor is not None:
+            where += (" AND " if where else " WHERE ") + ("id > ?" if order == "asc" else "id < ?")
+            params.append(cursor)
+        direction = "ASC" if order == "asc" else "DESC"
+        rows = self._conn().execute(
+            f"SELECT id, payload FROM history{where} ORDER BY id {direction} LIMIT ?",
+            params + [limit + 1],
+        ).fetchall()
+        items = [self._entry(p) for _, p in rows[:limit]]
+        next_cursor = rows[limit - 1][0] if len(rows) > limit else None
+        return items, next_cursor
+
+    def query(self, limit=None, **filters):
+        where, params = self._where(filters)
+        sql = "SELECT payload FROM history" + where + " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(int(limit))
+        return [self._entry(p) for (p,) in self._conn().execute(sql, params)]
+
+    def aggregate(self, group_by, **filters):
+        column = GROUP_COLUMNS[group_by]
+        where, params = self._where(filters)
+        rows = self._conn().execute(
+            f"SELECT {column}, COUNT(*), AVG(confidence) FROM history{where} GROUP BY {column}",
+            params,
+        )
+        return {
+            key: {"count": count, "avg_confidence": avg}
+            for key, count, avg in rows
+            if key is not None
+        }
@@ -0,0 +1,12 @@
+import json
+
+# Tipo de contenido de una respuesta Server-Sent Events
+MIMETYPE = "text/event-stream"
+
+# Headers para que proxies (nginx) no acumulen los eventos antes de enviarlos
+HEADERS = (("Cache-Control", "no-cache"), ("X-Accel-Buffering", "no"))
+
+
+def event(name, data):
+    """Un evento SSE con ``data`` serializado como JSON en una sola línea."""
+    return f"event: {name}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
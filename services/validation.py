@@ -0,0 +1,122 @@
+# Valores válidos para validación de entrada
+VALID_BROWSERS = {"Chrome", "Firefox", "Edge", "Safari", "IE", "Other"}
+VALID_CONNECTIONS = {"wifi", "ethernet", "cellular", "slow_wifi"}
+# Máximo de diagnósticos por tipo de problema que se pueden pedir con top_k
+MAX_TOP_K = 10
+# "text": solución completa; "id": ``solution_id`` del catálogo (/api/catalog)
+SOLUTION_FORMATS = ("text", "id")
+
+
+def validate_case(data):
+    """
+    Valida un caso de diagnóstico tal como lo recibe la API.
+
+    Retorna None si el caso es válido, o el cuerpo de error a devolver con
+    HTTP 400, por ejemplo:
+        {"error": "Navegador inválido: Netscape", "allowed": [...]}
+    """
+    # 1. Validar que existan los campos obligatorios
+    if not data or not isinstance(data, dict) or "symptoms" not in data:
+        return {"error": "Debe enviar 'symptoms' y 'system_info'"}
+
+    # 2. Extraer síntomas e información del sistema
+    symptoms = data.get("symptoms")
+    sysinfo = data.get("system_info", {})
+
+    # 3. Validar que symptoms sea una lista no vacía
+    if not isinstance(symptoms, list) or not symptoms:
+        return {"error": "'symptoms' debe ser lista no vacía"}
+    if not isinstance(sysinfo, dict):
+        return {"error": "'system_info' debe ser un objeto"}
+
+    # 4. Validar navegador y tipo de conexión
+    browser = sysinfo.get("browser")
+    conn = sysinfo.get("connection_type")
+    if browser not in VALID_BROWSERS:
+        return {"error": f"Navegador inválido: {browser}", "allowed": sorted(VALID_BROWSERS)}
+    if conn not in VALID_CONNECTIONS:
+        return {"error": f"Conexión inválida: {conn}", "allowed": sorted(VALID_CONNECTIONS)}
+    return None
+
+
+def parse_top_k(value):
+    """
+    Interpreta el parámetro ``top_k`` de /api/diagnose.
+
+    Retorna ``(top_k, None)`` (``top_k`` es None si no se pidió) o
+    ``(None, error)`` con el cuerpo de error a devolver con HTTP 400.
+    """
+    if value is None:
+        return None, None
+    try:
+        top_k = int(value)
+    except (TypeError, ValueError):
+        return None, {"error": f"'top_k' inválido: {value}"}
+    if not 1 <= top_k <= MAX_TOP_K:
+        return None, {"error": f"'top_k' debe estar entre 1 y {MAX_TOP_K}"}
+    return top_k, None
+
+
+def parse_solution_format(value):
+    """
+    Interpreta el parámetro ``solutions`` de /api/diagnose (por defecto "text").
+
+    Retorna ``(formato, None)`` o ``(None, error)`` con el cuerpo de error.
+    """
+    if value is None:
+        return "text", None
+    if value not in SOLUTION_FORMATS:
+        return None, {"error": f"'solutions' inválido: {value}", "allowed": list(SOLUTION_FORMATS)}
+    return value, None
+
+
+def apply_session_changes(case, changes, max_symptoms):
+    """
+    Aplica a ``case`` los cambios de un PATCH /api/sessions/<id>:
+
+        {
+            "add": [{"type": "video", "description": "buffering"}],
+            "retract": [{"type": "login", "description": "cannot_login"}],
+            "system_info": {"connection_type": "cellular"},
+            "server_status": {"is_online": false}
+        }
+
+    ``system_info`` y ``server_status`` se combinan con los actuales (un
+    valor null borra el campo). Retorna ``(caso nuevo, None)`` o
+    ``(None, error)`` con el cuerpo de error a devolver con HTTP 400; el
+    caso nuevo pasa por ``validate_case``.
+    """
+    allowed = {"add", "retract", "system_info", "server_status"}
+    if not isinstance(changes, dict) or not changes or set(changes) - allowed:
+        return None, {"error": "Debe enviar cambios ('add', 'retract', 'system_info' o 'server_status')",
+                      "allowed": sorted(allowed)}
+
+    added = changes.get("add", [])
+    retracted = changes.get("retract", [])
+    for name, value in (("add", added), ("retract", retracted)):
+        if not isinstance(value, list) or not all(isinstance(s, dict) for s in value):
+            return None, {"error": f"'{name}' debe ser una lista de síntomas"}
+
+    symptoms = list(case.get("symptoms", []))
+    for symptom in retracted:
+        if symptom not in symptoms:
+            return None, {"error": "Síntoma no presente en la sesión", "symptom": symptom}
+        symptoms = [s for s in symptoms if s != symptom]
+    symptoms.extend(s for s in added if s not in symptoms)
+    if len(symptoms) > max_symptoms:
+        return None, {"error": f"Una sesión admite como máximo {max_symptoms} síntomas"}
+
+    updated = {"symptoms": symptoms}
+    for name in ("system_info", "server_status"):
+        current = case.get(name)
+        patch = changes.get(name)
+        if patch is not None and not isinstance(patch, dict):
+            return None, {"error": f"'{name}' debe ser un objeto"}
+        if patch:
+            current = {k: v for k, v in {**(current or {}), **patch}.items() if v is not None}
+        if current is not None:
+            updated[name] = current
+    error = validate_case(updated)
+    if error:
+        return None, error
+    return updated, None
@@ -1,12 +1,24 @@
 // Dashboard para visualización de diagnósticos
 let problemTypeChart, confidenceChart;
+// Diagnósticos cargados, del más reciente al más antiguo
 let diagnosisHistory = [];
+// Cursor de la próxima página del historial (null si no hay más)
+let historyCursor = null;
+const HISTORY_PAGE_SIZE = 10;
+// Agregados calculados por el servidor (/api/diagnosis/stats)
+let diagnosisStats = null;
 
 // Inicializar dashboard al cargar la página
 document.addEventListener('DOMContentLoaded', function() {
     initializeCharts();
     loadHistory();
+    loadStats();
     updateDashboard();
+
+    const loadMoreButton = document.getElementById('history-load-more');
+    if (loadMoreButton) {
+        loadMoreButton.addEventListener('click', () => loadHistory(historyCursor));
+    }
 });
 
 // Inicializar gráficos con Chart.js
@@ -134,19 +146,39 @@ function initializeCharts() {
     });
 }
 
-// Cargar historial desde el servidor
-async function loadHistory() {
+// Cargar una página del historial desde el servidor (más recientes primero)
+async function loadHistory(cursor = null) {
     try {
-        const response = await fetch('/api/diagnosis');
+        const params = new URLSearchParams({ limit: HISTORY_PAGE_SIZE, order: 'desc' });
+        if (cursor) {
+            params.set('cursor', cursor);
+        }
+        const response = await fetch('/api/diagnosis?' + params.toString());
         if (response.ok) {
-            diagnosisHistory = await response.json();
-            updateDashboard();
+            const page = await response.json();
+            diagnosisHistory = cursor ? diagnosisHistory.concat(page.items) : page.items;
+            historyCursor = page.next_cursor;
+            updateHistoryTable();
         }
     } catch (error) {
         console.error('Error al cargar historial:', error);
     }
 }
 
+// Cargar estadísticas agregadas desde el servidor
+async function loadStats() {
+    try {
+        const response = await fetch('/api/diagnosis/stats');
+        if (response.ok) {
+            diagnosisStats = await response.json();
+            updateStatistics();
+            updateCharts();
+        }
+    } catch (error) {
+        console.error('Error al cargar estadísticas:', error);
+    }
+}
+
 // Actualizar dashboard con nuevos datos
 function updateDashboard() {
     updateStatistics();
@@ -156,84 +188,37 @@ function updateDashboard() {
 
 // Actualizar estadísticas generales
 function updateStatistics() {
-    const total = diagnosisHistory.length;
-    const highConf = diagnosisHistory.filter(d => d.confidence >= 0.85).length;
-    const mediumConf = diagnosisHistory.filter(d => d.confidence >= 0.60 && d.confidence < 0.85).length;
-    const lowConf = diagnosisHistory.filter(d => d.confidence < 0.60).length;
+    const stats = diagnosisStats || { total: 0, confidence: { high: 0, medium: 0, low: 0 } };
 
-    document.getElementById('total-diagnoses').textContent = total;
-    document.getElementById('high-confidence').textContent = highConf;
-    document.getElementById('medium-confidence').textContent = mediumConf;
-    document.getElementById('low-confidence').textContent = lowConf;
+    document.getElementById('total-diagnoses').textContent = stats.total;
+    document.getElementById('high-confidence').textContent = stats.confidence.high;
+    document.getElementById('medium-confidence').textContent = stats.confidence.medium;
+    document.getElementById('low-confidence').textContent = stats.confidence.low;
 }
 
 // Actualizar gráficos
 function updateCharts() {
-    // Contar problemas por tipo
-    const problemCounts = {
-        login: 0,
-        video: 0,
-        chat: 0,
-        content: 0
-    };
-
-    // Contar causas
-    const causeCounts = {
-        server: 0,
-        browser: 0,
-        user: 0,
-        network: 0,
-        device: 0,
-        permissions: 0,
-        link: 0
-    };
-
-    // Sumar confianza por tipo para calcular promedio
-    const confidenceSum = {
-        login: 0,
-        video: 0,
-        chat: 0,
-        content: 0
-    };
-
-    const confidenceCount = {
-        login: 0,
-        video: 0,
-        chat: 0,
-        content: 0
-    };
-
-    diagnosisHistory.forEach(diagnosis => {
-        // Contar tipos de problemas
-        if (problemCounts.hasOwnProperty(diagnosis.diagnosis)) {
-            problemCounts[diagnosis.diagnosis]++;
-            confidenceSum[diagnosis.diagnosis] += diagnosis.confidence;
-            confidenceCount[diagnosis.diagnosis]++;
-        }
-
-        // Contar causas
-        if (causeCounts.hasOwnProperty(diagnosis.cause)) {
-            causeCounts[diagnosis.cause]++;
-        }
-    });
+    if (!diagnosisStats) return;
+    const problemCounts = diagnosisStats.problem_counts;
+    const causeCounts = diagnosisStats.cause_counts;
 
     // Actualizar gráfico de tipos de problemas
     problemTypeChart.data.datasets[0].data = [
-        problemCounts.login,
-        problemCounts.video,
-        problemCounts.chat,
-        problemCounts.content
+        problemCounts.login || 0,
+        problemCounts.video || 0,
+        problemCounts.chat || 0,
+        problemCounts.content || 0
     ];
     problemTypeChart.update();
 
     // Actualizar gráfico de causas identificadas (barras)
     confidenceChart.data.datasets[0].data = [
-        causeCounts.server,
-        causeCounts.browser,
-        causeCounts.user,
-        causeCounts.network,
-        causeCounts.device,
-        causeCounts.permissions
+        causeCounts.server || 0,
+        causeCounts.browser || 0,
+        causeCounts.user || 0,
+        causeCounts.network || 0,
+        causeCounts.device || 0,
+        causeCounts.permissions || 0
     ];
     confidenceChart.update();
 }
@@ -247,13 +232,11 @@ function updateHistoryTable() {
         return;
     }
 
-    // Mostrar últimos 10 diagnósticos
-    const recentDiagnoses = diagnosisHistory.slice(-10).reverse();
-    
-    tbody.innerHTML = recentDiagnoses.map(diagnosis => {
+    tbody.innerHTML = diagnosisHistory.map(diagnosis => {
         const confidenceClass = getConfidenceClass(diagnosis.confidence);
         const confidencePercentage = Math.round(diagnosis.confidence * 100);
-        const timestamp = new Date().toLocaleString('es-AR', {
+        const date = diagnosis.timestamp ? new Date(diagnosis.timestamp) : new Date();
+        const timestamp = date.toLocaleString('es-AR', {
             day: '2-digit',
             month: '2-digit',
             hour: '2-digit',
@@ -269,12 +252,18 @@ function updateHistoryTable() {
             </tr>
         `;
     }).join('');
+
+    const loadMoreButton = document.getElementById('history-load-more');
+    if (loadMoreButton) {
+        loadMoreButton.classList.toggle('d-none', !historyCursor);
+    }
 }
 
 // Agregar nuevo diagnóstico al historial
 function addDiagnosis(diagnosis) {
-    diagnosisHistory.push(diagnosis);
-    updateDashboard();
+    diagnosisHistory.unshift(diagnosis);
+    updateHistoryTable();
+    loadStats();
 }
 
 // Obtener clase CSS según nivel de confianza
@@ -103,63 +103,24 @@ document.getElementById('diagnosis-form').addEventListener('submit', function(e)
         }
     };
     
-    // Enviar solicitud al servidor
-    fetch('/api/diagnose', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json'
-        },
-        body: JSON.stringify(data)
-    })
-    .then(response => response.json())
-    .then(result => {
-        // Ocultar indicador de carga
-        document.querySelector('.loading').style.display = 'none';
-        
-        // Expandir la card y mostrar resultados
-        const expertSystemContainer = document.getElementById('expert-system-container');
-        const formColumn = document.getElementById('form-column');
-        const resultColumn = document.getElementById('result-column');
-        
-        // Expandir el contenedor principal
-        expertSystemContainer.classList.remove('col-lg-6', 'col-xl-5');
-        expertSystemContainer.classList.add('col-lg-10', 'col-xl-9');
-        
-        // Cambiar el tamaño de las columnas
-        formColumn.classList.remove('col-lg-12');
-        formColumn.classList.add('col-lg-6');
-        
-        // Mostrar columna de resultados con animación
-        resultColumn.classList.remove('d-none');
-        resultColumn.classList.add('fade-in');
-        
-        // Actualizar contenido de resultados
-        document.getElementById('diagnosis-title').textContent = 
-            `Diagnóstico: ${getProblemTypeText(result.diagnosis)}`;
-        document.getElementById('diagnosis-cause').textContent = 
-            getCauseText(result.cause);
-        document.getElementById('diagnosis-solution').textContent = 
-            result.solution;
-        
-        // Actualizar indicador de confianza
-        const confidencePercentage = Math.round(result.confidence * 100);
-        document.getElementById('confidence-percentage').textContent = 
-            `${confidencePercentage}%`;
-        document.getElementById('confidence-bar').style.width = 
-            `${confidencePercentage}%`;
-        
-        // Cambiar color del indicador según nivel de confianza
-        const confidenceBar = document.getElementById('confidence-bar');
-        if (confidencePercentage < 40) {
-            confidenceBar.style.background = 'linear-gradient(90deg, #ff6b6b, #dc3545)'; // Rojo
-            document.getElementById('confidence-percentage').className = 'fw-bold text-danger';
-        } else if (confidencePercentage < 70) {
-            confidenceBar.style.background = 'linear-gradient(90deg, #ffd166, #ffc107)'; // Amarillo
-            document.getElementById('confidence-percentage').className = 'fw-bold text-warning';
-        } else {
-            confidenceBar.style.background = 'linear-gradient(90deg, #06d6a0, #198754)'; // Verde
-            document.getElementById('confidence-percentage').className = 'fw-bold text-success';
+    // Enviar solicitud al servidor: los diagnósticos llegan por Server-Sent Events
+    // a medida que se disparan las reglas y el último evento ("best") es el resultado final
+    let shown = null;
+    streamDiagnosis(data, (event, result) => {
+        if (event === 'error') {
+            throw new Error(result.error);
+        }
+        if (event === 'diagnosis') {
+            addStreamedDiagnosis(result);
+            // Mostrar el mejor diagnóstico recibido hasta ahora
+            if (shown === null || result.confidence > shown.confidence) {
+                shown = result;
+                showDiagnosis(result);
+            }
+            return;
         }
+        shown = result;
+        showDiagnosis(result);
         
         // Actualizar dashboard con el nuevo diagnóstico
         if (typeof window.updateDashboardWithNewDiagnosis === 'function') {
@@ -190,6 +151,129 @@ document.getElementById('diagnosis-form').addEventListener('submit', function(e)
     });
 });
 
+// Enviar el caso a /api/diagnose/stream y llamar a onEvent(evento, datos) por cada evento SSE
+async function streamDiagnosis(data, onEvent) {
+    const response = await fetch('/api/diagnose/stream', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+            'Accept': 'text/event-stream'
+        },
+        body: JSON.stringify(data)
+    });
+    if (!response.ok) {
+        const body = await response.json().catch(() => ({}));
+        throw new Error(body.error || `HTTP ${response.status}`);
+    }
+    
+    // Limpiar los diagnósticos de la consulta anterior
+    document.getElementById('diagnosis-stream').innerHTML = '';
+    
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) {
+            break;
+        }
+        buffer += decoder.decode(value, { stream: true });
+        
+        // Los eventos se separan con una línea en blanco
+        let separator;
+        while ((separator = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, separator);
+            buffer = buffer.slice(separator + 2);
+            let event = 'message';
+            let payload = '';
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event:')) {
+                    event = line.slice(6).trim();
+                } else if (line.startsWith('data:')) {
+                    payload += line.slice(5).trim();
+                }
+            });
+            if (payload) {
+                onEvent(event, JSON.parse(payload));
+            }
+        }
+    }
+}
+
+// Mostrar la columna de resultados (la primera vez que llega un diagnóstico)
+function showResultColumn() {
+    const resultColumn = document.getElementById('result-column');
+    if (!resultColumn.classList.contains('d-none')) {
+        return;
+    }
+    
+    // Ocultar indicador de carga
+    document.querySelector('.loading').style.display = 'none';
+    
+    // Expandir la card y mostrar resultados
+    const expertSystemContainer = document.getElementById('expert-system-container');
+    const formColumn = document.getElementById('form-column');
+    
+    // Expandir el contenedor principal
+    expertSystemContainer.classList.remove('col-lg-6', 'col-xl-5');
+    expertSystemContainer.classList.add('col-lg-10', 'col-xl-9');
+    
+    // Cambiar el tamaño de las columnas
+    formColumn.classList.remove('col-lg-12');
+    formColumn.classList.add('col-lg-6');
+    
+    // Mostrar columna de resultados con animación
+    resultColumn.classList.remove('d-none');
+    resultColumn.classList.add('fade-in');
+}
+
+// Actualizar el diagnóstico principal y el indicador de confianza
+function showDiagnosis(result) {
+    showResultColumn();
+    
+    // Actualizar contenido de resultados
+    document.getElementById('diagnosis-title').textContent = 
+        `Diagnóstico: ${getProblemTypeText(result.diagnosis)}`;
+    document.getElementById('diagnosis-cause').textContent = 
+        getCauseText(result.cause);
+    document.getElementById('diagnosis-solution').textContent = 
+        result.solution;
+    
+    // Actualizar indicador de confianza
+    const confidencePercentage = Math.round(result.confidence * 100);
+    document.getElementById('confidence-percentage').textContent = 
+        `${confidencePercentage}%`;
+    document.getElementById('confidence-bar').style.width = 
+        `${confidencePercentage}%`;
+    
+    // Cambiar color del indicador según nivel de confianza
+    const confidenceBar = document.getElementById('confidence-bar');
+    if (confidencePercentage < 40) {
+        confidenceBar.style.background = 'linear-gradient(90deg, #ff6b6b, #dc3545)'; // Rojo
+        document.getElementById('confidence-percentage').className = 'fw-bold text-danger';
+    } else if (confidencePercentage < 70) {
+        confidenceBar.style.background = 'linear-gradient(90deg, #ffd166, #ffc107)'; // Amarillo
+        document.getElementById('confidence-percentage').className = 'fw-bold text-warning';
+    } else {
+        confidenceBar.style.background = 'linear-gradient(90deg, #06d6a0, #198754)'; // Verde
+        document.getElementById('confidence-percentage').className = 'fw-bold text-success';
+    }
+}
+
+// Agregar un diagnóstico recibido a la lista de diagnósticos encontrados
+function addStreamedDiagnosis(result) {
+    const item = document.createElement('li');
+    item.className = 'list-group-item d-flex justify-content-between align-items-center fade-in';
+    item.textContent = `${getProblemTypeText(result.diagnosis)}: ${getCauseText(result.cause)}`;
+    
+    const badge = document.createElement('span');
+    badge.className = 'badge bg-primary rounded-pill';
+    badge.textContent = `${Math.round(result.confidence * 100)}%`;
+    item.appendChild(badge);
+    
+    document.getElementById('diagnosis-stream').appendChild(item);
+}
+
 // Función para obtener texto descriptivo del tipo de problema
 function getProblemTypeText(problemType) {
     const types = {
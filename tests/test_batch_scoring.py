@@ -0,0 +1,24 @@
+import csv
+import io
+
+from knowledge_base.batch_scoring import BatchScorer, score_csv, verify
+
+
+def test_batch_matches_engine():
+    rows, mismatches, _, _ = verify(rows=2000, seed=0)
+    assert rows > 2000
+    assert mismatches == []
+
+
+def test_score_csv(tmp_path):
+    path = tmp_path / "tickets.csv"
+    path.write_text("id,type,description,browser,connection_type\n"
+                    "1,video,buffering,Chrome,wifi\n"
+                    "2,login,forgot_password,,\n", encoding="utf-8")
+    output = io.StringIO()
+    score_csv(str(path), output)
+    scored = list(csv.DictReader(io.StringIO(output.getvalue())))
+    result = BatchScorer().score(["video", "login"], ["buffering", "forgot_password"],
+                                 ["Chrome", None], ["wifi", None])
+    assert [row["id"] for row in scored] == ["1", "2"]
+    assert [row["problem_type"] for row in scored] == list(result["problem_type"])
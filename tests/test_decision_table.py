@@ -0,0 +1,35 @@
+import random
+
+import pytest
+
+from knowledge_base.decision_table import DecisionTable, _input_space, compile_table, verify
+
+
+@pytest.fixture(scope="module")
+def table():
+    return compile_table()
+
+
+def test_table_matches_rete_engine(table):
+    checked, mismatches = verify(table)
+    assert checked > 0
+    assert mismatches == []
+
+
+def test_table_matches_rete_engine_on_symptom_pairs(table):
+    # El espacio completo de pares tarda minutos (``verify --pairs``); acá una muestra fija
+    from knowledge_base.expert_system import EdTechExpertSystem
+
+    pairs = [case for case in _input_space(table, pairs=True) if len(case["symptoms"]) == 2]
+    engine = EdTechExpertSystem()
+    for case in random.Random(0).sample(pairs, 500):
+        assert table.diagnose(case) == engine.diagnose(case), case
+
+
+def test_saved_table_roundtrip(table, tmp_path):
+    path = str(tmp_path / "decision_table.json")
+    table.save(path)
+    loaded = DecisionTable.load(path)
+    assert loaded.is_fresh()
+    case = {"symptoms": [{"type": "login", "description": "forgot_password"}], "system_info": {}}
+    assert loaded.diagnose(case) == table.diagnose(case)
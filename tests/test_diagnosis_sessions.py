@@ -0,0 +1,55 @@
+import threading
+
+import pytest
+
+from knowledge_base.expert_system import engine_class
+from services.diagnosis_sessions import DiagnosisSessions, SessionNotFound
+
+CASE = {"symptoms": [{"type": "login", "description": "forgot_password"}], "system_info": {}}
+
+
+@pytest.fixture
+def sessions():
+    return DiagnosisSessions(lambda: engine_class()(), max_sessions=1)
+
+
+def test_close_keeps_state_of_session_in_use(sessions):
+    session_id, diagnoses = sessions.create(CASE)
+    session = sessions._session(session_id)
+    with session.lock:
+        # Otra sesión desaloja a esta mientras un hilo la usa
+        sessions.create(CASE)
+        assert session.closed
+        assert session.state.diagnoses() == diagnoses
+    assert sessions.stats()["spare_engines"] == 0
+
+
+def test_waiting_request_sees_closed_session(sessions, monkeypatch):
+    session_id, _ = sessions.create(CASE)
+    session = sessions._session(session_id)
+    found = threading.Event()
+    errors = []
+
+    def lookup(sid, _session=sessions._session):
+        result = _session(sid)
+        found.set()
+        return result
+
+    def get():
+        try:
+            sessions.get(session_id)
+        except SessionNotFound as e:
+            errors.append(e)
+
+    monkeypatch.setattr(sessions, "_session", lookup)
+    with session.lock:
+        # La petición ya encontró la sesión y espera su lock cuando se cierra
+        waiting = threading.Thread(target=get)
+        waiting.start()
+        assert found.wait(5)
+        sessions.delete(session_id)
+    waiting.join()
+    assert len(errors) == 1
+    assert session.state is not None
+    with pytest.raises(SessionNotFound):
+        sessions.update(session_id, {})
@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+
+from knowledge_base.rules import families_for
+from services import diagnosis_service, history_service
+from services.diagnosis_service import DiagnosisService
+from services.history_service import HistoryService
+from services.history_store import JsonLinesHistoryStore
+
+CASE = {
+    "symptoms": [{"type": "video", "description": "buffering"}],
+    "system_info": {"connection_type": "wifi"},
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    previous, write_behind = history_service._store, history_service._HISTORY_WRITE_BEHIND
+    store = JsonLinesHistoryStore(str(tmp_path / "history.jsonl"))
+    HistoryService.configure(store, write_behind=False)
+    yield store
+    HistoryService.configure(previous, write_behind=write_behind)
+
+
+def test_stream_matches_run(store):
+    events = list(DiagnosisService.stream(CASE, persist=False))
+    assert events[-1] == ("best", DiagnosisService.run(CASE, persist=False))
+    assert [name for name, _ in events[:-1]] == ["diagnosis"] * (len(events) - 1)
+
+
+def test_disconnect_releases_engine_and_saves_history(store):
+    pool = diagnosis_service._pool_for(families_for(CASE))
+    events = DiagnosisService.stream(CASE)
+    assert next(events)[0] == "diagnosis"
+    # El cliente se desconecta antes de recibir "best"
+    events.close()
+    for thread in threading.enumerate():
+        if thread.name == "diagnosis-stream":
+            thread.join(5)
+    stats = pool.stats()
+    assert stats["idle"] == stats["created"] - stats["discarded"]
+    assert [entry["diagnosis"] for entry in store.iter()] == ["video"]
+
+
+def test_stream_reports_inference_errors(store):
+    events = DiagnosisService.stream({"symptoms": [{"type": "video"}]})
+    with pytest.raises(Exception):
+        list(events)
+    assert store.load() == []
@@ -0,0 +1,18 @@
+import pytest
+
+from services.history_record import canonical_case
+from services.result_cache import canonical_key
+
+SYSTEM_INFO = {"browser": "Chrome", "connection_type": "wifi"}
+
+
+@pytest.mark.parametrize("symptoms", [
+    [{"type": "video", "description": "buffering"}, {"type": "video", "description": "buffering"}],
+    [{"type": "login", "description": "cannot_login", "severity": "high"},
+     {"type": "login", "description": "cannot_login", "severity": "low"},
+     {"type": "login", "description": "cannot_login", "severity": "high"}],
+    [{"type": "chat", "description": "messages_not_sending"}, {"type": "login", "description": "forgot_password"}],
+])
+def test_canonical_case_matches_cache_key(symptoms):
+    data = {"symptoms": symptoms, "system_info": SYSTEM_INFO}
+    assert canonical_case(data) == canonical_key(data)
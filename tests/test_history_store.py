@@ -0,0 +1,81 @@
+import pytest
+
+from services.history_archive import HistoryArchive
+from services.history_store import JsonLinesHistoryStore
+
+
+def _entry(i):
+    return {
+        "diagnosis": "video" if i % 2 else "login",
+        "cause": f"causa {i}",
+        "solution": "Reiniciar el navegador",
+        "confidence": 0.5,
+        "timestamp": f"2024-01-01T00:00:{i:02d}",
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = JsonLinesHistoryStore(str(tmp_path / "history.jsonl"), rotate_bytes=300)
+    for i in range(10):
+        store.append(_entry(i))
+    assert store.segments()
+    return store
+
+
+def _causes(store, cursor=None, **options):
+    """Causas de todas las páginas desde ``cursor``."""
+    causes = []
+    while True:
+        items, cursor = store.page(cursor=cursor, **options)
+        causes.extend(item["cause"] for item in items)
+        if cursor is None:
+            return causes
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("limit", [1, 3, 50])
+def test_page_walks_rotated_segments(store, compact, limit):
+    if compact:
+        HistoryArchive(store).compact()
+        assert all(compressed for _, compressed in store.segments())
+    expected = [f"causa {i}" for i in range(10)]
+    assert [entry["cause"] for entry in store.query()] == expected
+    assert _causes(store, limit=limit) == expected
+    assert _causes(store, limit=limit, order="desc") == expected[::-1]
+    assert _causes(store, limit=limit, problem_type="video") == expected[1::2]
+
+
+def test_cursor_survives_rotation(store):
+    items, cursor = store.page(limit=4)
+    for i in range(10, 15):
+        store.append(_entry(i))
+    rest = _causes(store, cursor, limit=4)
+    assert [item["cause"] for item in items] + rest == [f"causa {i}" for i in range(15)]
+
+
+def test_recent_includes_rotated_segments(store):
+    assert [entry["cause"] for entry in store.recent(4)] == [f"causa {i}" for i in (9, 8, 7, 6)]
+    assert len(store.recent(100)) == 10
+    assert store.recent(0) == []
+
+
+def test_migrate_from_legacy_array(tmp_path):
+    legacy = tmp_path / "responses.json"
+    legacy.write_text('[{"diagnosis": "login", "cause": "user", "solution": "s", "confidence": 0.9}]',
+                      encoding="utf-8")
+    store = JsonLinesHistoryStore(str(tmp_path / "history.jsonl"))
+    assert store.migrate_from(str(legacy)) == 1
+    assert [entry["cause"] for entry in store.iter()] == ["user"]
+    assert not legacy.exists()
+    assert (tmp_path / "responses.json.migrated").exists()
+
+
+def test_migrate_from_keeps_unparseable_legacy_file(tmp_path, caplog):
+    legacy = tmp_path / "responses.json"
+    legacy.write_text('[{"diagnosis": "login", ', encoding="utf-8")
+    store = JsonLinesHistoryStore(str(tmp_path / "history.jsonl"))
+    assert store.migrate_from(str(legacy)) == 0
+    assert legacy.exists()
+    assert not (tmp_path / "responses.json.migrated").exists()
+    assert str(legacy) in caplog.text
@@ -0,0 +1,28 @@
+from services.history_writer import HistoryWriter
+
+
+class FlakyStore:
+    """Falla al escribir los registros marcados con ``"fail"``."""
+
+    def __init__(self):
+        self.entries = []
+
+    def append_many(self, entries):
+        if any(entry.get("fail") for entry in entries):
+            raise OSError("disco lleno")
+        self.entries.extend(entries)
+
+
+def test_close_drops_only_the_failed_batch(caplog):
+    store = FlakyStore()
+    writer = HistoryWriter(store, max_batch=2, flush_interval=60)
+    writer.submit([{"n": 0, "fail": True}, {"n": 1}, {"n": 2}, {"n": 3}, {"n": 4}])
+    writer.close(timeout=5)
+
+    assert [entry["n"] for entry in store.entries] == [2, 3, 4]
+    stats = writer.stats()
+    assert stats["written"] == 3
+    assert stats["failed"] == 2
+    assert stats["pending"] == 0
+    assert "se pierden 2 registros" in caplog.text
+    assert writer.flush(timeout=1)
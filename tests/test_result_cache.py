@@ -0,0 +1,29 @@
+from services.result_cache import MISS, ResultCache
+
+
+def _ranked():
+    best = {"diagnosis": "login", "cause": "user", "solution": "s", "confidence": 0.9}
+    return {"best": best, "diagnoses": {"login": [dict(best)]}}
+
+
+def test_hit_is_isolated_from_caller_changes():
+    cache = ResultCache(maxsize=4, ttl=0)
+    result = _ranked()
+    cache.put("case", result)
+    # Cambiar lo que se guardó no altera la entrada
+    result["best"]["confidence"] = 0.1
+
+    hit = cache.get("case")
+    assert hit == _ranked()
+    hit["best"]["timestamp"] = "2024-01-01T00:00:00+00:00"
+    hit["diagnoses"]["login"].append({"diagnosis": "login"})
+
+    assert cache.get("case") == _ranked()
+
+
+def test_version_is_part_of_the_key():
+    cache = ResultCache(maxsize=4, ttl=0, version="a")
+    cache.put("case", None)
+    assert cache.get("case") is None
+    cache.version = "b"
+    assert cache.get("case") is MISS
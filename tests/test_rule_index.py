@@ -0,0 +1,21 @@
+import random
+
+from knowledge_base.decision_table import _input_space, compile_table
+from knowledge_base.expert_system import engine_class
+from knowledge_base.rule_index import verify
+
+
+def test_compiled_rules_match_original():
+    checked, mismatches = verify()
+    assert checked > 0
+    assert mismatches == []
+
+
+def test_compiled_rules_match_original_on_symptom_pairs():
+    # El espacio completo de pares tarda minutos (``verify --pairs``); acá una muestra fija
+    original = engine_class(compiled=False)()
+    compiled = engine_class()()
+    pairs = [case for case in _input_space(compile_table(type(original)), pairs=True)
+             if len(case["symptoms"]) == 2]
+    for case in random.Random(0).sample(pairs, 300):
+        assert compiled.diagnose(case) == original.diagnose(case), case